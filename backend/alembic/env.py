@@ -23,6 +23,7 @@ from app.models import (
     Milestone,
     RecurringAction,
     RecurringActionLog,
+    RecurringActionMonth,
     OneTimeAction,
 )
 
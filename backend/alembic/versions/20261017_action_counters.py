@@ -0,0 +1,80 @@
+"""Add completed_count and expected_count to recurring_actions with backfill
+
+Revision ID: 20261017_action_counters
+Revises: 20260312_user_oauth
+Create Date: 2026-10-17
+
+"""
+import json
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.recurrence import count_weekday_occurrences
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_action_counters'
+down_revision: Union[str, None] = '20260312_user_oauth'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column('recurring_actions', sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('recurring_actions', sa.Column('expected_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill completed_count: выполненные логи в effective-периоде действия
+    op.execute("""
+        UPDATE recurring_actions
+        SET completed_count = (
+            SELECT COUNT(l.id)
+            FROM recurring_action_logs l
+            JOIN milestones m ON m.id = recurring_actions.milestone_id
+            WHERE l.recurring_action_id = recurring_actions.id
+              AND l.completed = true
+              AND l.date >= COALESCE(recurring_actions.start_date, m.start_date)
+              AND l.date <= COALESCE(recurring_actions.end_date, m.end_date)
+        )
+    """)
+
+    # Backfill expected_count: дни недели в effective-периоде (формула, пачками)
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.text("""
+            SELECT a.id, a.weekdays,
+                   COALESCE(a.start_date, m.start_date) AS start_date,
+                   COALESCE(a.end_date, m.end_date) AS end_date
+            FROM recurring_actions a
+            JOIN milestones m ON m.id = a.milestone_id
+            WHERE a.id > :last_id
+            ORDER BY a.id
+            LIMIT :limit
+        """), {"last_id": last_id, "limit": BATCH_SIZE}).all()
+        if not rows:
+            break
+        updates = []
+        for action_id, weekdays, start_date, end_date in rows:
+            if isinstance(weekdays, str):
+                weekdays = json.loads(weekdays)
+            if isinstance(start_date, str):  # SQLite отдаёт даты строками
+                start_date, end_date = date.fromisoformat(start_date), date.fromisoformat(end_date)
+            updates.append({
+                "id": action_id,
+                "expected": count_weekday_occurrences(start_date, end_date, weekdays or []),
+            })
+        conn.execute(
+            sa.text("UPDATE recurring_actions SET expected_count = :expected WHERE id = :id"),
+            updates,
+        )
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    op.drop_column('recurring_actions', 'expected_count')
+    op.drop_column('recurring_actions', 'completed_count')
@@ -0,0 +1,70 @@
+"""Add recurring_action_months (monthly completion bitmaps) with backfill from logs
+
+Revision ID: 20261017_completion_bitmap
+Revises: 20261017_weekday_mask
+Create Date: 2026-10-17
+
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_completion_bitmap'
+down_revision: Union[str, None] = '20261017_weekday_mask'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+
+def upgrade() -> None:
+    op.create_table(
+        'recurring_action_months',
+        sa.Column(
+            'recurring_action_id', sa.Integer(),
+            sa.ForeignKey('recurring_actions.id', ondelete='CASCADE'), nullable=False,
+        ),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('bits', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('recurring_action_id', 'month'),
+    )
+
+    # Backfill: выполненные логи → бит (день - 1) в строке (действие, year * 12 + month - 1)
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        action_ids = conn.execute(sa.text("""
+            SELECT id FROM recurring_actions
+            WHERE id > :last_id
+            ORDER BY id
+            LIMIT :limit
+        """), {"last_id": last_id, "limit": BATCH_SIZE}).scalars().all()
+        if not action_ids:
+            break
+        months = defaultdict(int)
+        rows = conn.execute(
+            sa.text("""
+                SELECT recurring_action_id, date FROM recurring_action_logs
+                WHERE completed = true AND recurring_action_id IN :ids
+            """).bindparams(sa.bindparam("ids", expanding=True)),
+            {"ids": action_ids},
+        )
+        for action_id, log_date in rows:
+            if isinstance(log_date, str):  # SQLite отдаёт даты строками
+                log_date = date.fromisoformat(log_date)
+            months[(action_id, log_date.year * 12 + log_date.month - 1)] |= 1 << (log_date.day - 1)
+        if months:
+            conn.execute(
+                sa.text("INSERT INTO recurring_action_months (recurring_action_id, month, bits) VALUES (:a, :m, :b)"),
+                [{"a": action_id, "m": month, "b": bits} for (action_id, month), bits in months.items()],
+            )
+        last_id = action_ids[-1]
+
+
+def downgrade() -> None:
+    op.drop_table('recurring_action_months')
@@ -0,0 +1,96 @@
+"""Composite and partial indexes for goal tree, calendar and log access paths
+
+Revision ID: 20261017_query_indexes
+Revises: 20261017_user_data_version
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_query_indexes'
+down_revision: Union[str, None] = '20261017_user_data_version'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _dedupe_recurring_action_logs() -> None:
+    """Оставить один лог на (recurring_action_id, date): самый ранний, completed — если выполнен хоть один."""
+    conn = op.get_bind()
+    affected = [
+        row[0] for row in conn.execute(sa.text("""
+            SELECT DISTINCT recurring_action_id
+            FROM recurring_action_logs
+            GROUP BY recurring_action_id, date
+            HAVING COUNT(*) > 1
+        """))
+    ]
+    if not affected:
+        return
+
+    op.execute("""
+        UPDATE recurring_action_logs
+        SET completed = true
+        WHERE id IN (
+            SELECT MIN(id)
+            FROM recurring_action_logs
+            GROUP BY recurring_action_id, date
+            HAVING COUNT(*) > 1 AND MAX(CASE WHEN completed THEN 1 ELSE 0 END) = 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM recurring_action_logs
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM recurring_action_logs GROUP BY recurring_action_id, date
+        )
+    """)
+
+    # Дубликаты завышали completed_count — пересчитываем затронутые действия
+    conn.execute(
+        sa.text("""
+            UPDATE recurring_actions
+            SET completed_count = (
+                SELECT COUNT(l.id)
+                FROM recurring_action_logs l
+                JOIN milestones m ON m.id = recurring_actions.milestone_id
+                WHERE l.recurring_action_id = recurring_actions.id
+                  AND l.completed = true
+                  AND l.date >= COALESCE(recurring_actions.start_date, m.start_date)
+                  AND l.date <= COALESCE(recurring_actions.end_date, m.end_date)
+            )
+            WHERE id IN :ids
+        """).bindparams(sa.bindparam("ids", expanding=True)),
+        {"ids": affected},
+    )
+
+
+def upgrade() -> None:
+    op.create_index('ix_goals_user_archived_start', 'goals', ['user_id', 'is_archived', 'start_date'])
+    op.create_index('ix_milestones_goal_id', 'milestones', ['goal_id'])
+    op.create_index(
+        'ix_recurring_actions_milestone_active',
+        'recurring_actions',
+        ['milestone_id'],
+        postgresql_where=sa.text('is_deleted = false'),
+        sqlite_where=sa.text('is_deleted = 0'),
+    )
+    op.create_index('ix_one_time_actions_milestone_deadline', 'one_time_actions', ['milestone_id', 'deadline'])
+
+    _dedupe_recurring_action_logs()
+    with op.batch_alter_table('recurring_action_logs') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_recurring_action_logs_action_date', ['recurring_action_id', 'date']
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('recurring_action_logs') as batch_op:
+        batch_op.drop_constraint('uq_recurring_action_logs_action_date', type_='unique')
+    op.drop_index('ix_one_time_actions_milestone_deadline', table_name='one_time_actions')
+    op.drop_index('ix_recurring_actions_milestone_active', table_name='recurring_actions')
+    op.drop_index('ix_milestones_goal_id', table_name='milestones')
+    op.drop_index('ix_goals_user_archived_start', table_name='goals')
@@ -0,0 +1,26 @@
+"""Add data_version to users (ETag / response cache invalidation)
+
+Revision ID: 20261017_user_data_version
+Revises: 20261017_action_counters
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_user_data_version'
+down_revision: Union[str, None] = '20261017_action_counters'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'data_version')
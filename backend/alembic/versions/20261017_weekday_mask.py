@@ -0,0 +1,79 @@
+"""Store recurring_actions.weekdays as a 7-bit SMALLINT mask (weekday_mask)
+
+Revision ID: 20261017_weekday_mask
+Revises: 20261017_query_indexes
+Create Date: 2026-10-17
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.recurrence import mask_to_weekdays, weekdays_to_mask
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_weekday_mask'
+down_revision: Union[str, None] = '20261017_query_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def _iter_batches(conn, column: str):
+    """(id, значение column) из recurring_actions пачками по BATCH_SIZE."""
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.text(f"""
+            SELECT id, {column} FROM recurring_actions
+            WHERE id > :last_id
+            ORDER BY id
+            LIMIT :limit
+        """), {"last_id": last_id, "limit": BATCH_SIZE}).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column(
+        'recurring_actions',
+        sa.Column('weekday_mask', sa.SmallInteger(), nullable=False, server_default='0'),
+    )
+
+    # Backfill: JSON-список [1,3,5] → маска (бит 0 = Пн)
+    conn = op.get_bind()
+    for rows in _iter_batches(conn, 'weekdays'):
+        updates = []
+        for action_id, weekdays in rows:
+            if isinstance(weekdays, str):
+                weekdays = json.loads(weekdays)
+            updates.append({"id": action_id, "mask": weekdays_to_mask(weekdays or [])})
+        conn.execute(
+            sa.text("UPDATE recurring_actions SET weekday_mask = :mask WHERE id = :id"),
+            updates,
+        )
+
+    with op.batch_alter_table('recurring_actions') as batch_op:
+        batch_op.drop_column('weekdays')
+
+
+def downgrade() -> None:
+    op.add_column(
+        'recurring_actions',
+        sa.Column('weekdays', sa.JSON(), nullable=False, server_default='[]'),
+    )
+
+    conn = op.get_bind()
+    for rows in _iter_batches(conn, 'weekday_mask'):
+        conn.execute(
+            sa.text("UPDATE recurring_actions SET weekdays = :weekdays WHERE id = :id"),
+            [{"id": action_id, "weekdays": json.dumps(mask_to_weekdays(mask))} for action_id, mask in rows],
+        )
+
+    with op.batch_alter_table('recurring_actions') as batch_op:
+        batch_op.drop_column('weekday_mask')
@@ -0,0 +1,299 @@
+"""
+Запись логов регулярных действий (RecurringActionLog) атомарными upsert'ами.
+
+Вместо SELECT + INSERT/UPDATE через ORM лог пишется одним
+INSERT ... ON CONFLICT (recurring_action_id, date) DO UPDATE — это одна
+поездка в БД, а двойной клик не создаёт дубликатов (уникальный индекс
+uq_recurring_action_logs_action_date).
+
+- PostgreSQL: один оператор; RETURNING отдаёт строку и признак вставки
+  (xmax = 0), из которых выводится дельта completed_count.
+- SQLite: INSERT ... ON CONFLICT DO NOTHING RETURNING, затем условный
+  UPDATE ... RETURNING. Записи в SQLite сериализуются блокировкой базы,
+  поэтому пара операторов так же атомарна.
+
+DO UPDATE срабатывает только если значение меняется — по возвращённой
+строке однозначно видно, что произошло, без чтения старого значения.
+
+Пачка логов (upsert_logs) пишется так же — одним многострочным INSERT.
+
+Запись идёт мимо ORM, поэтому сервис сам обновляет completed_count действий
+(один UPDATE completed_count + CASE ... RETURNING на все затронутые действия,
+как app/counters.py), битовые карты выполнений (app/completion_bitmap.py, если
+включены) и версию данных пользователя (app/data_version.py).
+"""
+
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, literal_column, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from . import completion_bitmap, data_version, models
+from .counters import effective_period
+
+_logs = models.RecurringActionLog.__table__
+_actions = models.RecurringAction.__table__
+_log_key = tuple_(_logs.c.recurring_action_id, _logs.c.date)
+
+
+def _completed_delta(inserted: bool, completed: bool) -> int:
+    """Дельта completed_count для изменившейся строки лога."""
+    if completed:
+        return 1
+    return 0 if inserted else -1
+
+
+def _result(row, inserted: bool, delta: int) -> dict:
+    return {
+        "id": row.id,
+        "recurring_action_id": row.recurring_action_id,
+        "date": row.date,
+        "completed": row.completed,
+        "inserted": inserted,
+        "completed_delta": delta,
+    }
+
+
+def _returning(statement):
+    return statement.returning(
+        _logs.c.id, _logs.c.recurring_action_id, _logs.c.date, _logs.c.completed
+    )
+
+
+def _upsert_postgresql(db: Session, values: list[dict], merge: bool) -> list[tuple]:
+    statement = pg_insert(_logs).values(values)
+    new_value = (_logs.c.completed | statement.excluded.completed) if merge else statement.excluded.completed
+    statement = statement.on_conflict_do_update(
+        index_elements=[_logs.c.recurring_action_id, _logs.c.date],
+        set_={"completed": new_value},
+        where=_logs.c.completed.is_distinct_from(new_value),
+    )
+    rows = db.execute(
+        _returning(statement).returning(literal_column("xmax = 0").label("inserted"))
+    )
+    return [(row, row.inserted) for row in rows]
+
+
+def _upsert_sqlite(db: Session, values: list[dict], merge: bool) -> list[tuple]:
+    statement = sqlite_insert(_logs).values(values).on_conflict_do_nothing(
+        index_elements=[_logs.c.recurring_action_id, _logs.c.date]
+    )
+    written = [(row, True) for row in db.execute(_returning(statement))]
+    inserted = {(row.recurring_action_id, row.date) for row, _ in written}
+    for completed in (True, False):
+        if merge and not completed:
+            continue
+        keys = [
+            (item["recurring_action_id"], item["date"]) for item in values
+            if item["completed"] == completed
+            and (item["recurring_action_id"], item["date"]) not in inserted
+        ]
+        if not keys:
+            continue
+        rows = db.execute(
+            _returning(
+                update(_logs)
+                .where(_log_key.in_(keys), _logs.c.completed.is_distinct_from(completed))
+                .values(completed=completed)
+            )
+        )
+        written += [(row, False) for row in rows]
+    return written
+
+
+def _select_logs(db: Session, *criteria) -> list:
+    return db.execute(
+        select(_logs.c.id, _logs.c.recurring_action_id, _logs.c.date, _logs.c.completed).where(*criteria)
+    ).all()
+
+
+def _in_period(action: models.RecurringAction, log_date: date) -> bool:
+    start_date, end_date = effective_period(action)
+    return start_date <= log_date <= end_date
+
+
+def _apply_deltas(db: Session, actions: dict[int, models.RecurringAction], deltas: dict[int, int]) -> None:
+    """Обновить completed_count всех действий одним UPDATE и проставить новые значения в ORM."""
+    deltas = {action_id: delta for action_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    rows = db.execute(
+        update(_actions)
+        .where(_actions.c.id.in_(deltas))
+        .values(completed_count=_actions.c.completed_count + case(deltas, value=_actions.c.id))
+        .returning(_actions.c.id, _actions.c.completed_count)
+    )
+    for action_id, completed_count in rows:
+        set_committed_value(actions[action_id], "completed_count", completed_count)
+
+
+def _after_write(db: Session, actions: Iterable[models.RecurringAction], log_ids) -> None:
+    """Сбросить устаревшие объекты ORM и увеличить версию данных владельца."""
+    for log_id in log_ids:
+        log = db.identity_map.get(identity_key(models.RecurringActionLog, log_id))
+        if log is not None:
+            db.expire(log)
+    actions = list(actions)
+    for action in actions:
+        db.expire(action, ["logs"])
+    user_id = db.info.get("user_id")
+    if user_id is not None:
+        data_version.bump_users(db, [user_id])
+    else:
+        data_version.bump_for_actions(db, [action.id for action in actions])
+
+
+def _write(
+    db: Session,
+    actions: dict[int, models.RecurringAction],
+    values: dict[tuple[int, date], bool],
+    merge: bool,
+):
+    """
+    Upsert логов {(action_id, date): completed}.
+
+    Возвращает (результаты по ключу, дельты completed_count по действию,
+    id изменившихся строк); счётчики не применяет.
+    """
+    upsert = _upsert_postgresql if db.get_bind().dialect.name == "postgresql" else _upsert_sqlite
+    rows = [
+        {"recurring_action_id": action_id, "date": log_date, "completed": completed}
+        for (action_id, log_date), completed in values.items()
+    ]
+    written = {
+        (row.recurring_action_id, row.date): (row, inserted)
+        for row, inserted in upsert(db, rows, merge)
+    }
+    # Значение не изменилось — строки уже есть, только прочитать их id
+    unchanged = [key for key in values if key not in written]
+    existing = (
+        {(row.recurring_action_id, row.date): row for row in _select_logs(db, _log_key.in_(unchanged))}
+        if unchanged else {}
+    )
+
+    results = {}
+    deltas = defaultdict(int)
+    for key in values:
+        if key in written:
+            row, inserted = written[key]
+            delta = _completed_delta(inserted, row.completed) if _in_period(actions[key[0]], row.date) else 0
+        else:
+            row, inserted, delta = existing[key], False, 0
+        results[key] = _result(row, inserted, delta)
+        deltas[key[0]] += delta
+    return results, deltas, [row.id for row, _ in written.values()]
+
+
+def upsert_logs(
+    db: Session,
+    actions: dict[int, models.RecurringAction],
+    entries: Iterable[tuple[int, date, bool]],
+) -> dict[tuple[int, date], dict]:
+    """
+    Записать пачку логов (action_id, date, completed) одним upsert.
+
+    actions — действия по id (принадлежность проверяет вызывающий код).
+    Повторы одной пары (action_id, date) схлопываются: побеждает последний.
+    Возвращает результаты по ключу (action_id, date): строка лога,
+    признак inserted и completed_delta.
+    """
+    values = {(action_id, log_date): completed for action_id, log_date, completed in entries}
+    if not values:
+        return {}
+    results, deltas, changed_ids = _write(db, actions, values, merge=False)
+    _apply_deltas(db, actions, deltas)
+    if changed_ids:
+        completion_bitmap.apply(db, {key: result["completed"] for key, result in results.items()})
+        changed = set(changed_ids)
+        touched = {result["recurring_action_id"] for result in results.values() if result["id"] in changed}
+        _after_write(db, [actions[action_id] for action_id in touched], changed_ids)
+    return results
+
+
+def upsert_log(
+    db: Session,
+    action: models.RecurringAction,
+    log_date: date,
+    completed: bool,
+) -> dict:
+    """
+    Записать лог действия на дату (создать или обновить).
+
+    Возвращает строку лога, признак inserted и completed_delta —
+    изменение completed_count действия.
+    """
+    return upsert_logs(db, {action.id: action}, [(action.id, log_date, completed)])[(action.id, log_date)]
+
+
+def set_log_completed(
+    db: Session, action: models.RecurringAction, log_id: int, completed: bool
+) -> Optional[dict]:
+    """Изменить completed существующего лога по id. None — лог не найден."""
+    row = db.execute(
+        _returning(
+            update(_logs)
+            .where(
+                _logs.c.id == log_id,
+                _logs.c.recurring_action_id == action.id,
+                _logs.c.completed.is_distinct_from(completed),
+            )
+            .values(completed=completed)
+        )
+    ).first()
+    if row is None:
+        rows = _select_logs(db, _logs.c.id == log_id, _logs.c.recurring_action_id == action.id)
+        return _result(rows[0], False, 0) if rows else None
+
+    delta = _completed_delta(False, row.completed) if _in_period(action, row.date) else 0
+    _apply_deltas(db, {action.id: action}, {action.id: delta})
+    completion_bitmap.apply(db, {(action.id, row.date): row.completed})
+    _after_write(db, [action], [row.id])
+    return _result(row, False, delta)
+
+
+def move_log(
+    db: Session,
+    action: models.RecurringAction,
+    new_date: date,
+    log_id: Optional[int] = None,
+    old_date: Optional[date] = None,
+) -> Optional[dict]:
+    """
+    Перенести лог действия (по log_id или по old_date) на new_date.
+
+    Исходная строка удаляется (DELETE ... RETURNING); если на new_date лог уже
+    есть, отметки сливаются (completed = старое OR новое). Если лога на
+    old_date нет, на new_date создаётся невыполненный лог.
+    None — не найден лог по log_id.
+    """
+    criteria = [_logs.c.recurring_action_id == action.id]
+    criteria.append(_logs.c.id == log_id if log_id is not None else _logs.c.date == old_date)
+    source = db.execute(
+        delete(_logs).where(*criteria).returning(_logs.c.id, _logs.c.date, _logs.c.completed)
+    ).first()
+    if source is None and log_id is not None:
+        return None
+
+    moved_completed = source is not None and source.completed
+    results, deltas, changed_ids = _write(
+        db, {action.id: action}, {(action.id, new_date): moved_completed}, merge=True
+    )
+    result = results[(action.id, new_date)]
+    if source is not None:
+        if source.completed and _in_period(action, source.date):
+            result["completed_delta"] -= 1
+            deltas[action.id] -= 1
+        changed_ids.append(source.id)
+    _apply_deltas(db, {action.id: action}, deltas)
+    if changed_ids:
+        days = {(action.id, source.date): False} if source is not None else {}
+        days[(action.id, new_date)] = result["completed"]
+        completion_bitmap.apply(db, days)
+        _after_write(db, [action], changed_ids)
+    return result
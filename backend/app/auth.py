@@ -1,13 +1,12 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import NamedTuple, Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
-from . import database, models
+from . import cache, database, models, passwords
 
 load_dotenv()
 
@@ -16,17 +15,20 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-keep-it-secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Кэш аутентифицированных пользователей (по subject токена)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
 
-# ... (предыдущий код без изменений до pwd_context)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Синхронные варианты; обработчики используют пул passwords.hasher
+pwd_context = passwords.pwd_context
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return passwords.hash_password(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
 # ... (код функции)
@@ -42,7 +44,53 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+class CurrentUser(NamedTuple):
+    """Снимок аутентифицированного пользователя (то, что нужно для авторизации)."""
+
+    id: int
+    email: str
+    role: str
+
+
+# subject -> CurrentUser. Кэш процесса: в других воркерах изменения видны через TTL
+_user_cache = cache.LRUBackend(max_entries=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def token_claims(user: models.User) -> dict:
+    """Данные JWT: email (sub) и числовой id пользователя (uid)."""
+    return {"sub": user.email, "uid": user.id}
+
+
+def invalidate_user(email: str) -> None:
+    """Сбросить кэшированный снимок пользователя (после изменения профиля / привязки OAuth)."""
+    _user_cache.delete(email)
+
+
+def clear_user_cache() -> None:
+    """Очистить кэш пользователей (для тестов)."""
+    _user_cache.clear()
+
+
+def _load_user_snapshot(db: Session, email: str, user_id: Optional[int]) -> Optional[CurrentUser]:
+    if user_id is not None:
+        user = db.get(models.User, user_id)
+        if user is not None and user.email != email:
+            return None
+    else:
+        user = db.query(models.User).filter(models.User.email == email).first()
+    if user is None:
+        return None
+    return CurrentUser(id=user.id, email=user.email, role=user.role)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)) -> CurrentUser:
+    """
+    Пользователь запроса по JWT.
+
+    Снимок (id, email, role) берётся из кэша по subject токена — обычный запрос
+    обходится без обращения к БД. Промах: поиск по uid из токена (первичный ключ),
+    для старых токенов без uid — по email.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -51,12 +99,18 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
+        user_id: Optional[int] = payload.get("uid")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
-        raise credentials_exception
+
+    user = _user_cache.get(email)
+    if user is None or (user_id is not None and user.id != user_id):
+        user = await database.run_db(db, _load_user_snapshot, email, user_id)
+        if user is None:
+            raise credentials_exception
+        _user_cache.set(email, user)
+    # Владелец изменений в сессии запроса — по нему растёт версия данных (app/data_version.py)
+    db.info["user_id"] = user.id
     return user
@@ -0,0 +1,166 @@
+"""
+Кэш ответов на чтение (календарь) с инвалидацией по версии данных пользователя.
+
+Ключ записи: namespace + user_id + User.data_version + параметры запроса.
+Любая запись в данные пользователя увеличивает data_version в той же транзакции
+(app/data_version.py) — старые записи становятся недостижимыми и вытесняются
+по LRU/TTL. Версию передаёт вызывающий код (data_version.current_version —
+один запрос по первичному ключу на сессию запроса).
+
+Бэкенды (RESPONSE_CACHE_URL):
+- пусто / "memory" — LRU в памяти процесса;
+- redis://... — общий кэш для нескольких воркеров (нужен пакет redis);
+- "off" — кэш отключён.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "600"))
+
+
+class LRUBackend:
+    """LRU-кэш в памяти процесса с TTL (также кэш пользователей в app/auth.py)."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: int = RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Общий кэш в Redis: записи с TTL."""
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl: int = RESPONSE_CACHE_TTL, prefix: str = "response-cache"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("RESPONSE_CACHE_URL=redis://... требует пакет redis") from exc
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(f"{self.prefix}:{key}")
+
+    def set(self, key: str, value: str) -> None:
+        self.client.set(f"{self.prefix}:{key}", value, ex=self.ttl)
+
+    def size(self) -> int:
+        return -1  # не считаем: ключи общие для всех воркеров
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+
+def _create_backend(url: str):
+    if url == "off":
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return LRUBackend()
+
+
+backend = _create_backend(RESPONSE_CACHE_URL)
+
+# Метрики попаданий по namespace: {namespace: {"hits": n, "misses": n}}
+_stats: dict[str, dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(namespace: str, outcome: str) -> None:
+    with _stats_lock:
+        counters = _stats.setdefault(namespace, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+
+def cached_response(
+    namespace: str, user_id: int, version: int, params: tuple, build: Callable[[], BaseModel]
+) -> Response:
+    """
+    Вернуть JSON-ответ из кэша или построить его через build() и сохранить.
+
+    version — User.data_version; params — нормализованные параметры запроса (входят в ключ).
+    """
+    if backend is None:
+        return Response(content=build().model_dump_json(), media_type="application/json")
+
+    key = f"{namespace}:{user_id}:{version}:{params!r}"
+    body = backend.get(key)
+    if body is not None:
+        _record(namespace, "hits")
+    else:
+        _record(namespace, "misses")
+        body = build().model_dump_json()
+        backend.set(key, body)
+    return Response(content=body, media_type="application/json")
+
+
+def stats() -> dict:
+    """Счётчики попаданий/промахов по namespace и состояние бэкенда."""
+    with _stats_lock:
+        namespaces = {
+            name: {
+                **counters,
+                "hit_ratio": round(counters["hits"] / max(counters["hits"] + counters["misses"], 1), 3),
+            }
+            for name, counters in _stats.items()
+        }
+    return {
+        "backend": backend.name if backend is not None else "off",
+        "entries": backend.size() if backend is not None else 0,
+        "namespaces": namespaces,
+    }
+
+
+def clear() -> None:
+    """Очистить кэш и метрики (для тестов)."""
+    if backend is not None:
+        backend.clear()
+    with _stats_lock:
+        _stats.clear()
+
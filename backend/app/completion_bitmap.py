@@ -0,0 +1,365 @@
+"""
+Битовые карты выполнений регулярных действий — кэш чтения поверх логов.
+
+Строка recurring_action_months = (действие, месяц, bits): бит d-1 — выполнен
+ли день d (31 бит, помещается в INTEGER). Выполненные даты окна — декодирование
+масок, подсчёт за период — popcount.
+
+Режим включается COMPLETION_STORE=bitmap; в режиме rows карты не пишутся и
+не читаются. Логи RecurringActionLog остаются источником истины (их id отдаёт
+API, по ним считаются счётчики), а в режиме bitmap карты поддерживаются в той
+же транзакции:
+- запись через app/action_logs.py — apply() с итоговыми значениями дней;
+- запись логов через ORM — события сессии ниже;
+- записи мимо обоих путей (bulk insert, ручной SQL) — rebuild_actions().
+Пока работал режим rows, карты устаревают: при переключении rows → bitmap
+их нужно пересобрать (python -m app.completion_bitmap --rebuild).
+В режиме bitmap календарь (load_completed_dates) читает карты.
+"""
+
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Iterable, Optional, Union
+
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, delete, event, func, insert, inspect, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models
+
+load_dotenv()
+
+COMPLETION_STORE = os.getenv("COMPLETION_STORE", "rows")  # rows | bitmap
+
+MONTH_BITS = (1 << 31) - 1
+
+_months = models.RecurringActionMonth.__table__
+_logs = models.RecurringActionLog.__table__
+_PENDING_KEY = "completion_bitmap_pending"
+
+
+def enabled() -> bool:
+    """Поддерживаются и читаются ли битовые карты (COMPLETION_STORE=bitmap)."""
+    return COMPLETION_STORE == "bitmap"
+
+
+# ============================================
+# Месяцы и маски
+# ============================================
+
+
+def month_index(d: date) -> int:
+    """Номер месяца: year * 12 + (month - 1)."""
+    return d.year * 12 + d.month - 1
+
+
+def month_start(index: int) -> date:
+    year, month = divmod(index, 12)
+    return date(year, month + 1, 1)
+
+
+def day_mask(first_day: int, last_day: int) -> int:
+    """Маска дней first_day..last_day (1-31) одного месяца."""
+    return ((1 << last_day) - 1) & ~((1 << (first_day - 1)) - 1)
+
+
+def _period_mask(index: int, start_date: date, end_date: date) -> int:
+    """Маска дней месяца index, попадающих в [start_date, end_date]."""
+    first = start_date.day if month_index(start_date) == index else 1
+    last = end_date.day if month_index(end_date) == index else 31
+    return day_mask(first, last)
+
+
+def encode(days: Iterable[date]) -> dict[int, int]:
+    """Даты → {месяц: bits}."""
+    months: dict[int, int] = defaultdict(int)
+    for d in days:
+        months[month_index(d)] |= 1 << (d.day - 1)
+    return dict(months)
+
+
+def decode(months: dict[int, int], start_date: date, end_date: date) -> list[date]:
+    """{месяц: bits} → отмеченные даты в [start_date, end_date] по возрастанию."""
+    result = []
+    first_month, last_month = month_index(start_date), month_index(end_date)
+    for index in sorted(months):
+        if not first_month <= index <= last_month:
+            continue
+        bits = months[index] & _period_mask(index, start_date, end_date)
+        if not bits:
+            continue
+        first = month_start(index)
+        while bits:
+            low = bits & -bits
+            result.append(first + timedelta(days=low.bit_length() - 1))
+            bits ^= low
+    return result
+
+
+def count(months: dict[int, int], start_date: date, end_date: date) -> int:
+    """Сколько отмеченных дней в [start_date, end_date] — popcount по маскам."""
+    if end_date < start_date:
+        return 0
+    first, last = month_index(start_date), month_index(end_date)
+    return sum(
+        (bits & _period_mask(index, start_date, end_date)).bit_count()
+        for index, bits in months.items()
+        if first <= index <= last
+    )
+
+
+# ============================================
+# Чтение
+# ============================================
+
+
+def load_months(
+    db: Session, action_ids: Iterable[int], first_day: Optional[date] = None, last_day: Optional[date] = None
+) -> dict[int, dict[int, int]]:
+    """action_id -> {месяц: bits} (один запрос; без дат — вся история)."""
+    action_ids = list(action_ids)
+    if not action_ids:
+        return {}
+    criteria = [_months.c.recurring_action_id.in_(action_ids), _months.c.bits != 0]
+    if first_day is not None:
+        criteria.append(_months.c.month >= month_index(first_day))
+    if last_day is not None:
+        criteria.append(_months.c.month <= month_index(last_day))
+    result: dict[int, dict[int, int]] = defaultdict(dict)
+    for action_id, index, bits in db.execute(
+        select(_months.c.recurring_action_id, _months.c.month, _months.c.bits).where(*criteria)
+    ):
+        result[action_id][index] = bits
+    return dict(result)
+
+
+def load_completed_dates(
+    db: Session, action_ids: Iterable[int], first_day: date, last_day: date
+) -> dict[int, set[date]]:
+    """action_id -> выполненные даты в окне [first_day, last_day] (один запрос)."""
+    return {
+        action_id: set(decode(months, first_day, last_day))
+        for action_id, months in load_months(db, action_ids, first_day, last_day).items()
+    }
+
+
+def load_completed_counts(db: Session, action_ids: Iterable[int]) -> dict[int, int]:
+    """Выполненные дни каждого действия в его effective-периоде (как counters.load_completed_counts)."""
+    action_ids = list(action_ids)
+    if not action_ids:
+        return {}
+    action = models.RecurringAction
+    milestone = models.Milestone
+    periods = db.execute(
+        select(
+            action.id,
+            func.coalesce(action.start_date, milestone.start_date),
+            func.coalesce(action.end_date, milestone.end_date),
+        )
+        .join(milestone, milestone.id == action.milestone_id)
+        .where(action.id.in_(action_ids))
+    ).all()
+    months = load_months(db, action_ids)
+    counts = {}
+    for action_id, start_date, end_date in periods:
+        completed = count(months.get(action_id, {}), start_date, end_date)
+        if completed:
+            counts[action_id] = completed
+    return counts
+
+
+# ============================================
+# Запись
+# ============================================
+
+
+def apply(db: Session, values: dict[tuple[int, date], bool]) -> None:
+    """
+    Записать итоговые значения дней {(action_id, date): completed} в карты.
+
+    Два оператора на любую пачку: INSERT ... ON CONFLICT DO NOTHING для новых
+    месяцев и UPDATE bits = (bits & keep) | set по каждому затронутому месяцу.
+    """
+    if not enabled() or not values:
+        return
+    touched: dict[tuple[int, int], list[int]] = defaultdict(lambda: [0, 0])  # [touched, set]
+    for (action_id, d), completed in values.items():
+        masks = touched[(action_id, month_index(d))]
+        bit = 1 << (d.day - 1)
+        masks[0] |= bit
+        if completed:
+            masks[1] |= bit
+
+    connection = db.connection()
+    insert_fn = pg_insert if connection.dialect.name == "postgresql" else sqlite_insert
+    connection.execute(
+        insert_fn(_months)
+        .values([
+            {"recurring_action_id": action_id, "month": index, "bits": 0}
+            for action_id, index in touched
+        ])
+        .on_conflict_do_nothing(index_elements=[_months.c.recurring_action_id, _months.c.month])
+    )
+    connection.execute(
+        update(_months)
+        .where(
+            _months.c.recurring_action_id == bindparam("action_id"),
+            _months.c.month == bindparam("month_index"),
+        )
+        .values(bits=_months.c.bits.op("&")(bindparam("keep")).op("|")(bindparam("set"))),
+        [
+            {"action_id": action_id, "month_index": index, "keep": MONTH_BITS & ~mask, "set": set_mask}
+            for (action_id, index), (mask, set_mask) in touched.items()
+        ],
+    )
+
+
+def rebuild(db: Session, batch_size: int = 500) -> int:
+    """
+    Пересобрать карты всех действий из RecurringActionLog (пачками, коммит на пачку).
+
+    Возвращает число записанных строк-месяцев.
+    """
+    written = 0
+    last_id = 0
+    actions = models.RecurringAction.__table__
+    while True:
+        action_ids = db.execute(
+            select(actions.c.id).where(actions.c.id > last_id).order_by(actions.c.id).limit(batch_size)
+        ).scalars().all()
+        if not action_ids:
+            break
+        last_id = action_ids[-1]
+        written += rebuild_actions(db, action_ids)
+        db.commit()
+    return written
+
+
+def rebuild_actions(db: Session, action_ids: list[int]) -> int:
+    """Пересобрать карты указанных действий из логов (без коммита); число строк-месяцев."""
+    connection = db.connection()
+    days = defaultdict(list)
+    for action_id, log_date in connection.execute(
+        select(_logs.c.recurring_action_id, _logs.c.date).where(
+            _logs.c.recurring_action_id.in_(action_ids), _logs.c.completed == True
+        )
+    ):
+        days[action_id].append(log_date)
+    connection.execute(delete(_months).where(_months.c.recurring_action_id.in_(action_ids)))
+    rows = [
+        {"recurring_action_id": action_id, "month": index, "bits": bits}
+        for action_id, dates in days.items()
+        for index, bits in encode(dates).items()
+    ]
+    if rows:
+        connection.execute(insert(_months), rows)
+    return len(rows)
+
+
+# ============================================
+# Запись логов через ORM (события сессии)
+# ============================================
+
+
+def _previous(obj, key: str):
+    history = inspect(obj).attrs[key].history
+    return history.deleted[0] if history.deleted else getattr(obj, key)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_log_changes(session: Session, flush_context, instances) -> None:
+    if not enabled():
+        return
+    # Удалённые действия: их карты удаляются целиком, дни не пишутся
+    deleted_actions = {
+        obj.id for obj in session.deleted if isinstance(obj, models.RecurringAction) and obj.id is not None
+    }
+    # Ключ — id действия или, если действие создаётся в этом же flush и id ещё нет,
+    # сам объект: id появится к after_flush_postexec
+    values: dict[tuple[Union[int, models.RecurringAction], date], bool] = {}
+    for obj in session.dirty | session.deleted:
+        if isinstance(obj, models.RecurringActionLog):
+            previous_action_id = _previous(obj, "recurring_action_id")
+            if previous_action_id is not None:
+                values[(previous_action_id, _previous(obj, "date"))] = False
+    for obj in session.new | session.dirty:
+        if isinstance(obj, models.RecurringActionLog) and obj not in session.deleted:
+            action = obj.recurring_action_id
+            if action is None and obj.recurring_action is not None:
+                action = obj.recurring_action.id or obj.recurring_action
+            if action is not None:
+                values[(action, obj.date)] = bool(obj.completed)
+    values = {key: completed for key, completed in values.items() if key[0] not in deleted_actions}
+    if values or deleted_actions:
+        session.info[_PENDING_KEY] = (values, deleted_actions)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _apply_log_changes(session: Session, flush_context) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    values, deleted_actions = pending
+    if deleted_actions:
+        session.connection().execute(
+            delete(_months).where(_months.c.recurring_action_id.in_(deleted_actions))
+        )
+    resolved = {}
+    for (action, day), completed in values.items():
+        action_id = action if isinstance(action, int) else action.id
+        if action_id is not None:
+            resolved[(action_id, day)] = completed
+    apply(session, resolved)
+
+
+def _table_size(db: Session, table: str) -> Optional[int]:
+    """Размер таблицы с индексами в байтах (PostgreSQL, SQLite с dbstat); None — неизвестен."""
+    dialect = db.get_bind().dialect.name
+    try:
+        if dialect == "postgresql":
+            return db.execute(select(func.pg_total_relation_size(table))).scalar()
+        if dialect == "sqlite":
+            return db.execute(
+                text(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = :table "
+                    "OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table)"
+                ),
+                {"table": table},
+            ).scalar()
+    except Exception:  # dbstat не собран в SQLite или нет прав
+        return None
+    return None
+
+
+def storage_stats(db: Session) -> dict:
+    """Строки и размер (байты) логов и битовых карт."""
+    return {
+        name: {
+            "rows": db.execute(select(func.count()).select_from(table)).scalar(),
+            "bytes": _table_size(db, table.name),
+        }
+        for name, table in (("rows", _logs), ("bitmap", _months))
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from . import database
+
+    parser = argparse.ArgumentParser(description="Битовые карты выполнений регулярных действий")
+    parser.add_argument("--rebuild", action="store_true", help="Пересобрать карты из RecurringActionLog")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    session = database.SessionLocal()
+    try:
+        if args.rebuild:
+            print(f"Записано месяцев: {rebuild(session, batch_size=args.batch_size)}")
+        for name, stats in storage_stats(session).items():
+            print(f"{name}: {stats['rows']} строк, {stats['bytes']} байт")
+    finally:
+        session.close()
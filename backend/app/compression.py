@@ -0,0 +1,209 @@
+"""
+Сжатие ответов (Content-Encoding: gzip / br).
+
+Дерево целей и задачи за диапазон — большие JSON с повторяющимися
+названиями целей и вех; gzip сжимает их в 10–20 раз.
+
+- COMPRESSION: gzip (по умолчанию) | br — brotli, для клиентов без br — gzip
+  (нужен пакет brotli) | off;
+- COMPRESSION_MIN_SIZE — ответы меньше (байт) не сжимаются, по умолчанию 1024;
+- COMPRESSION_GZIP_LEVEL (5), COMPRESSION_BROTLI_QUALITY (4) — уровни сжатия.
+
+Сжимаются только ответы с телом из COMPRESSIBLE_TYPES одним сообщением:
+304/204, HEAD, потоковые ответы (NDJSON /api/tasks/range/stream), уже
+закодированные и Cache-Control: no-transform идут как есть. Остальные ответы
+таких типов получают Vary: Accept-Encoding, даже если не сжаты (клиент без
+gzip, тело меньше порога); у сжатого сильный ETag становится слабым (байты другие).
+Степень и CPU-время сжатия — метрики http_response_compression_* (app/metrics.py).
+"""
+
+import gzip
+import os
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from . import metrics
+
+load_dotenv()
+
+COMPRESSION = os.getenv("COMPRESSION", "gzip")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/javascript",
+    "text/plain",
+    "text/html",
+    "text/css",
+    "text/csv",
+})
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _brotli_compressor():
+    try:
+        import brotli
+    except ImportError as exc:
+        raise RuntimeError("COMPRESSION=br требует пакет brotli") from exc
+    return lambda body: brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+
+
+def create_encoders(mode: str = COMPRESSION) -> dict:
+    """Кодировщики в порядке предпочтения сервера: {"br": fn, "gzip": fn}."""
+    if mode == "off":
+        return {}
+    if mode == "br":
+        return {"br": _brotli_compressor(), "gzip": _gzip}
+    if mode == "gzip":
+        return {"gzip": _gzip}
+    raise ValueError(f"COMPRESSION: неизвестный режим {mode!r} (gzip, br, off)")
+
+
+def choose_encoding(accept_encoding: str, supported) -> Optional[str]:
+    """
+    Кодировка для ответа по Accept-Encoding: наибольший q > 0 среди supported,
+    при равных q — порядок supported. None — сжимать нельзя.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _header(headers: list, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _is_compressible(headers: list) -> bool:
+    if _header(headers, b"content-encoding") is not None:
+        return False
+    if b"no-transform" in (_header(headers, b"cache-control") or b"").lower():
+        return False
+    content_type = (_header(headers, b"content-type") or b"").split(b";")[0].strip().lower()
+    return content_type.decode("latin-1") in COMPRESSIBLE_TYPES
+
+
+def _with_vary(headers: list) -> list:
+    """Заголовки с Vary: Accept-Encoding (объединяется с уже заданным Vary)."""
+    result = []
+    vary = None
+    for name, value in headers:
+        if name.lower() == b"vary":
+            vary = value
+        else:
+            result.append((name, value))
+    if vary is None:
+        vary = b"Accept-Encoding"
+    elif b"accept-encoding" not in vary.lower() and vary.strip() != b"*":
+        vary += b", Accept-Encoding"
+    result.append((b"vary", vary))
+    return result
+
+
+def _compressed_headers(headers: list, encoding: str, length: int) -> list:
+    result = []
+    for name, value in headers:
+        key = name.lower()
+        if key == b"content-length":
+            continue
+        if key == b"etag" and not value.startswith(b"W/"):
+            value = b"W/" + value
+        result.append((name, value))
+    result += [
+        (b"content-encoding", encoding.encode("latin-1")),
+        (b"content-length", str(length).encode("latin-1")),
+    ]
+    return result
+
+
+class CompressionMiddleware:
+    """ASGI-middleware: сжимает ответ целиком, если клиент принимает gzip/br."""
+
+    def __init__(self, app, encoders: Optional[dict] = None, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.encoders = create_encoders() if encoders is None else encoders
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encoders or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept = _header(scope.get("headers", []), b"accept-encoding") or b""
+        encoding = choose_encoding(accept.decode("latin-1"), self.encoders)
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Заголовки ждут первого куска тела: Content-Encoding зависит от него
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = list(start.get("headers", []))
+            passthrough = True
+            if (
+                message.get("more_body", False)
+                or start["status"] in (204, 304)
+                or not _is_compressible(headers)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            # Представление зависит от Accept-Encoding, даже если этот ответ не сжат
+            headers = _with_vary(headers)
+            if encoding is None or len(body) < self.minimum_size:
+                await send({**start, "headers": headers})
+                await send(message)
+                return
+
+            started = time.thread_time()
+            compressed = self.encoders[encoding](body)
+            metrics.COMPRESSION_SECONDS.labels(encoding).observe(time.thread_time() - started)
+            metrics.COMPRESSION_RATIO.labels(encoding).observe(len(compressed) / len(body))
+            metrics.COMPRESSION_BYTES.labels(encoding, "uncompressed").inc(len(body))
+            metrics.COMPRESSION_BYTES.labels(encoding, "compressed").inc(len(compressed))
+
+            if len(compressed) >= len(body):
+                await send({**start, "headers": headers})
+                await send(message)
+                return
+            await send({**start, "headers": _compressed_headers(headers, encoding, len(compressed))})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
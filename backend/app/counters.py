@@ -0,0 +1,311 @@
+"""
+Денормализованные счётчики прогресса регулярных действий.
+
+RecurringAction.completed_count — выполненные логи в effective-периоде,
+RecurringAction.expected_count — сколько раз действие должно быть выполнено.
+
+Счётчики поддерживаются инкрементально в той же транзакции, что и запись:
+- создание / переключение / перенос / удаление лога → completed_count ± 1
+  (атомарный UPDATE completed_count = completed_count + delta);
+- изменение weekdays или периода действия (в т.ч. дат вехи) → пересчёт
+  expected_count по формуле и completed_count одним подзапросом.
+
+check_action_counters() проверяет (и при repair=True чинит) счётчики пачками.
+CLI: python -m app.counters [--repair]
+"""
+
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, Optional
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session, aliased, joinedload
+
+from . import data_version, models
+from .recurrence import count_weekday_occurrences
+
+_PENDING_KEY = "action_counters_pending"
+
+
+# ============================================
+# Подсчёт
+# ============================================
+
+
+def effective_period(
+    action: models.RecurringAction, milestone: Optional[models.Milestone] = None
+) -> tuple[date, date]:
+    """Effective-период действия: свой период или период вехи."""
+    milestone = milestone or action.milestone
+    return (
+        action.start_date or milestone.start_date,
+        action.end_date or milestone.end_date,
+    )
+
+
+def expected_count_for(
+    action: models.RecurringAction, milestone: Optional[models.Milestone] = None
+) -> int:
+    """Сколько раз действие должно быть выполнено за effective-период."""
+    start_date, end_date = effective_period(action, milestone)
+    return count_weekday_occurrences(start_date, end_date, action.weekdays or [])
+
+
+def _completed_in_period_query(action_id_column):
+    """Подзапрос: выполненные логи действия в его effective-периоде."""
+    log = models.RecurringActionLog
+    # Алиас: иначе recurring_actions подзапроса затеняет внешнюю таблицу UPDATE
+    action = aliased(models.RecurringAction)
+    milestone = models.Milestone
+    return (
+        select(func.count(log.id))
+        .join(action, action.id == log.recurring_action_id)
+        .join(milestone, milestone.id == action.milestone_id)
+        .where(
+            log.recurring_action_id == action_id_column,
+            log.completed == True,
+            log.date >= func.coalesce(action.start_date, milestone.start_date),
+            log.date <= func.coalesce(action.end_date, milestone.end_date),
+        )
+        .scalar_subquery()
+    )
+
+
+def load_completed_counts(db: Session, action_ids: Iterable[int]) -> dict[int, int]:
+    """
+    Количество выполненных логов каждого действия в его effective-периоде.
+
+    Один GROUP BY запрос вместо загрузки action.logs в память.
+    Действия без выполненных логов в словарь не попадают (= 0).
+    """
+    action_ids = list(action_ids)
+    if not action_ids:
+        return {}
+    log = models.RecurringActionLog
+    action = models.RecurringAction
+    rows = (
+        db.query(log.recurring_action_id, func.count(log.id))
+        .join(action, action.id == log.recurring_action_id)
+        .join(models.Milestone, models.Milestone.id == action.milestone_id)
+        .filter(
+            log.recurring_action_id.in_(action_ids),
+            log.completed == True,
+            log.date >= func.coalesce(action.start_date, models.Milestone.start_date),
+            log.date <= func.coalesce(action.end_date, models.Milestone.end_date),
+        )
+        .group_by(log.recurring_action_id)
+        .all()
+    )
+    return {action_id: count for action_id, count in rows}
+
+
+def _recount_completed(db: Session, action_ids: Iterable[int]) -> None:
+    """Пересчитать completed_count действий одним UPDATE с подзапросом."""
+    action_ids = list(action_ids)
+    if not action_ids:
+        return
+    table = models.RecurringAction.__table__
+    db.connection().execute(
+        update(table)
+        .where(table.c.id.in_(action_ids))
+        .values(completed_count=_completed_in_period_query(table.c.id))
+    )
+
+
+# ============================================
+# Инкрементальное обновление (события сессии)
+# ============================================
+
+
+def _previous_value(obj, key: str):
+    """Значение атрибута до изменений в текущем flush."""
+    history = inspect(obj).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, key)
+
+
+def _attrs_changed(obj, keys: Iterable[str]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+def _milestone_of(session: Session, action: models.RecurringAction) -> models.Milestone:
+    if action.milestone is not None:
+        return action.milestone
+    return session.get(models.Milestone, action.milestone_id)
+
+
+def _action_by_id(session: Session, action_id: Optional[int]) -> Optional[models.RecurringAction]:
+    if action_id is None:
+        return None
+    return session.get(models.RecurringAction, action_id)
+
+
+def _log_delta(session, pending, action, log_date, completed, sign) -> None:
+    """Учесть вклад лога (+1/-1), если он выполнен и попадает в период действия."""
+    if not completed or action is None or action in pending["recount"]:
+        return
+    start_date, end_date = effective_period(action, _milestone_of(session, action))
+    if start_date <= log_date <= end_date:
+        pending["deltas"][action] += sign
+
+
+def _reset_period(session, pending, action: models.RecurringAction) -> None:
+    """Период или дни недели изменились — пересчитать оба счётчика."""
+    action.expected_count = expected_count_for(action, _milestone_of(session, action))
+    pending["recount"].add(action)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_counter_changes(session: Session, flush_context, instances) -> None:
+    pending = {"deltas": defaultdict(int), "recount": set()}
+
+    with session.no_autoflush:
+        # 1. Изменения периода: новые действия, weekdays/даты действия, даты вехи
+        for obj in session.new:
+            if isinstance(obj, models.RecurringAction):
+                obj.expected_count = expected_count_for(obj, _milestone_of(session, obj))
+                obj.completed_count = 0
+        for obj in session.dirty:
+            if isinstance(obj, models.RecurringAction) and _attrs_changed(
+                obj, ("weekdays", "start_date", "end_date", "milestone_id")
+            ):
+                _reset_period(session, pending, obj)
+            elif isinstance(obj, models.Milestone) and _attrs_changed(
+                obj, ("start_date", "end_date")
+            ):
+                for action in obj.recurring_actions:
+                    _reset_period(session, pending, action)
+
+        # 2. Изменения логов: инкрементальные дельты
+        for obj in session.new:
+            if isinstance(obj, models.RecurringActionLog):
+                action = obj.recurring_action or _action_by_id(session, obj.recurring_action_id)
+                _log_delta(session, pending, action, obj.date, obj.completed, +1)
+        for obj in session.dirty:
+            if isinstance(obj, models.RecurringActionLog) and _attrs_changed(
+                obj, ("completed", "date", "recurring_action_id")
+            ):
+                previous_action = _action_by_id(session, _previous_value(obj, "recurring_action_id"))
+                _log_delta(
+                    session, pending, previous_action,
+                    _previous_value(obj, "date"), _previous_value(obj, "completed"), -1,
+                )
+                action = _action_by_id(session, obj.recurring_action_id)
+                _log_delta(session, pending, action, obj.date, obj.completed, +1)
+        for obj in session.deleted:
+            if isinstance(obj, models.RecurringActionLog):
+                previous_action = _action_by_id(session, _previous_value(obj, "recurring_action_id"))
+                _log_delta(
+                    session, pending, previous_action,
+                    _previous_value(obj, "date"), _previous_value(obj, "completed"), -1,
+                )
+
+    if pending["deltas"] or pending["recount"]:
+        session.info[_PENDING_KEY] = pending
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _apply_counter_changes(session: Session, flush_context) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    table = models.RecurringAction.__table__
+    connection = session.connection()
+    touched = []
+    for action, delta in pending["deltas"].items():
+        if delta and action.id is not None:
+            connection.execute(
+                update(table)
+                .where(table.c.id == action.id)
+                .values(completed_count=table.c.completed_count + delta)
+            )
+            touched.append(action)
+    recount = [action for action in pending["recount"] if action.id is not None]
+    _recount_completed(session, [action.id for action in recount])
+    touched.extend(recount)
+
+    # Значения в памяти устарели — перечитаем из БД при следующем обращении
+    for action in touched:
+        if action in session and not inspect(action).deleted:
+            session.expire(action, ["completed_count"])
+
+
+# ============================================
+# Проверка согласованности
+# ============================================
+
+
+def check_action_counters(
+    db: Session, repair: bool = False, batch_size: int = 500
+) -> list[dict]:
+    """
+    Сверить счётчики всех действий с логами (пачками по batch_size).
+
+    Возвращает список расхождений; при repair=True исправляет их
+    (completed_count — атомарным пересчётом в SQL) и коммитит каждую пачку.
+    """
+    mismatches = []
+    last_id = 0
+    while True:
+        batch = (
+            db.query(models.RecurringAction)
+            .options(joinedload(models.RecurringAction.milestone))
+            .filter(models.RecurringAction.id > last_id)
+            .order_by(models.RecurringAction.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        completed = load_completed_counts(db, [action.id for action in batch])
+        broken = []
+        for action in batch:
+            actual_expected = expected_count_for(action)
+            actual_completed = completed.get(action.id, 0)
+            if (
+                action.expected_count != actual_expected
+                or action.completed_count != actual_completed
+            ):
+                mismatches.append({
+                    "action_id": action.id,
+                    "expected_count": action.expected_count,
+                    "actual_expected_count": actual_expected,
+                    "completed_count": action.completed_count,
+                    "actual_completed_count": actual_completed,
+                })
+                broken.append(action)
+
+        if repair and broken:
+            for action in broken:
+                action.expected_count = expected_count_for(action)
+            db.flush()
+            _recount_completed(db, [action.id for action in broken])
+            data_version.bump_for_actions(db, [action.id for action in broken])
+            db.commit()
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from . import database
+
+    parser = argparse.ArgumentParser(description="Проверка счётчиков прогресса регулярных действий")
+    parser.add_argument("--repair", action="store_true", help="Исправить найденные расхождения")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    session = database.SessionLocal()
+    try:
+        found = check_action_counters(session, repair=args.repair, batch_size=args.batch_size)
+    finally:
+        session.close()
+    for item in found:
+        print(item)
+    print(f"{'Исправлено' if args.repair else 'Найдено'} расхождений: {len(found)}")
@@ -0,0 +1,188 @@
+"""
+Версия данных пользователя (User.data_version) и условные GET-запросы.
+
+data_version монотонно растёт: любой flush, изменивший данные пользователя
+(цели, вехи, действия, логи, todo, профиль), увеличивает её атомарным UPDATE
+в той же транзакции. Пользователь сессии проставляется в auth.get_current_user
+(session.info["user_id"]).
+
+По версии строится слабый ETag GET-ответов: W/"<user_id>-<data_version>-<today>"
+(дата входит в тег, т.к. прогресс и списки задач зависят от текущего дня).
+Совпавший If-None-Match возвращает 304 сразу после аутентификации — до
+загрузки дерева целей и расчёта прогресса.
+
+Пользователь запроса — кэшированный снимок без версии (auth.CurrentUser),
+поэтому версия читается current_version(): один запрос по первичному ключу
+на сессию, сбрасывается при увеличении.
+"""
+
+from datetime import date
+from itertools import chain
+from typing import Iterable
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from . import auth, database, models
+
+_VERSIONS_KEY = "data_versions"
+
+# Модели, изменение которых меняет ответы на чтение
+_TRACKED_MODELS = (
+    models.User,
+    models.Goal,
+    models.Step,
+    models.Todo,
+    models.Milestone,
+    models.RecurringAction,
+    models.RecurringActionLog,
+    models.OneTimeAction,
+)
+
+
+def _bump(session: Session, user_ids: Iterable[int]) -> None:
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    users = models.User.__table__
+    session.connection().execute(
+        update(users)
+        .where(users.c.id.in_(user_ids))
+        .values(data_version=users.c.data_version + 1)
+    )
+    versions = session.info.get(_VERSIONS_KEY, {})
+    for user_id in user_ids:
+        versions.pop(user_id, None)
+        user = session.identity_map.get(identity_key(models.User, user_id))
+        if user is not None:
+            session.expire(user, ["data_version"])
+
+
+def bump_users(db: Session, user_ids: Iterable[int]) -> None:
+    """Увеличить версию пользователей (для записей мимо ORM, напр. app/action_logs.py)."""
+    _bump(db, user_ids)
+
+
+def bump_for_actions(db: Session, action_ids: Iterable[int]) -> None:
+    """Увеличить версию владельцев действий (для изменений вне запроса пользователя)."""
+    action_ids = list(action_ids)
+    if not action_ids:
+        return
+    owners = (
+        select(models.Goal.user_id)
+        .join(models.Milestone, models.Milestone.goal_id == models.Goal.id)
+        .join(models.RecurringAction, models.RecurringAction.milestone_id == models.Milestone.id)
+        .where(models.RecurringAction.id.in_(action_ids))
+        .distinct()
+    )
+    _bump(db, db.execute(owners).scalars().all())
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_versions(session: Session) -> None:
+    # Следующая транзакция может увидеть версию, увеличенную другим запросом
+    session.info.pop(_VERSIONS_KEY, None)
+
+
+@event.listens_for(Session, "before_flush")
+def _mark_user_data_changed(session: Session, flush_context, instances) -> None:
+    if session.info.get("user_id") is None:
+        return
+    # dirty включает объекты с присвоенным, но не изменившимся значением — их пропускаем
+    if any(
+        isinstance(obj, _TRACKED_MODELS)
+        for obj in chain(session.new, session.deleted)
+    ) or any(
+        isinstance(obj, _TRACKED_MODELS) and session.is_modified(obj)
+        for obj in session.dirty
+    ):
+        session.info["data_version_pending"] = True
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _bump_after_flush(session: Session, flush_context) -> None:
+    if session.info.pop("data_version_pending", False):
+        _bump(session, [session.info["user_id"]])
+
+
+def current_version(db: Session, user_id: int) -> int:
+    """User.data_version; в пределах сессии запроса читается один раз."""
+    versions = db.info.setdefault(_VERSIONS_KEY, {})
+    if user_id not in versions:
+        versions[user_id] = db.execute(
+            select(models.User.data_version).where(models.User.id == user_id)
+        ).scalar_one()
+    return versions[user_id]
+
+
+def weak_etag(user_id: int, version: int) -> str:
+    return f'W/"{user_id}-{version}-{date.today().isoformat()}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение (RFC 9110): W/ не учитывается, допускается список и *."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+async def conditional_get(
+    request: Request,
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db),
+) -> None:
+    """
+    Зависимость роутеров: для GET вычисляет ETag по версии данных пользователя,
+    при совпадении с If-None-Match отвечает 304 до выполнения обработчика.
+    """
+    if request.method != "GET":
+        return
+    version = await database.run_db(db, current_version, current_user.id)
+    etag = weak_etag(current_user.id, version)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        raise HTTPException(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=_cache_headers(etag)
+        )
+    request.state.etag = etag
+
+
+def _cache_headers(etag: str) -> dict[str, str]:
+    # no-cache: клиент может хранить ответ, но обязан ревалидировать его по ETag
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+class ETagMiddleware:
+    """ASGI-middleware: добавляет ETag (из conditional_get) к успешным GET-ответам."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                etag = scope.get("state", {}).get("etag")
+                if etag:
+                    headers = [
+                        (name, value) for name, value in message.get("headers", [])
+                        if name.lower() not in (b"etag", b"cache-control")
+                    ]
+                    headers += [
+                        (name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in _cache_headers(etag).items()
+                    ]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,157 @@
+"""
+Счётчик SQL-запросов и времени БД на запрос, заголовок Server-Timing.
+
+События before/after_cursor_execute повешены на все движки (Engine), в том
+числе на sync_engine асинхронного — считается всё, что уходит в БД.
+Счётчик текущего запроса лежит в contextvar: его видят и обработчики в
+threadpool, и run_sync AsyncSession. Счётчики вкладываются: запрос внутри
+count_queries() (тесты, бенчмарки) учитывается и во внешнем счётчике.
+
+QueryTimingMiddleware добавляет к ответу
+    Server-Timing: db;dur=<мс>, app;dur=<мс>, queries;desc="<число>"
+и пишет в лог (WARNING, logger app.instrumentation) запросы сверх бюджетов:
+REQUEST_QUERY_BUDGET (число запросов), REQUEST_DB_TIME_BUDGET_MS,
+REQUEST_TIME_BUDGET_MS; 0 — бюджет не проверяется.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1").lower() in ("1", "true", "yes")
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", "30"))
+REQUEST_DB_TIME_BUDGET_MS = float(os.getenv("REQUEST_DB_TIME_BUDGET_MS", "200"))
+REQUEST_TIME_BUDGET_MS = float(os.getenv("REQUEST_TIME_BUDGET_MS", "1000"))
+
+_START_KEY = "query_started_at"
+
+
+class QueryStats:
+    """Число SQL-запросов и суммарное время в БД (секунды)."""
+
+    __slots__ = ("count", "db_time", "parent")
+
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.count = 0
+        self.db_time = 0.0
+        self.parent = parent
+
+    def add(self, duration: float) -> None:
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.db_time += duration
+            stats = stats.parent
+
+    @property
+    def db_time_ms(self) -> float:
+        return self.db_time * 1000
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Считать SQL-запросы внутри блока (включая запросы вложенных HTTP-запросов)."""
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info[_START_KEY].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.add(time.perf_counter() - started)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # Упавший запрос не дошёл до after_cursor_execute — снять его отметку
+    conn = exception_context.connection
+    if conn is not None and conn.info.get(_START_KEY):
+        conn.info[_START_KEY].pop()
+
+
+def server_timing(stats: QueryStats, total: float) -> str:
+    db_ms = stats.db_time_ms
+    app_ms = max(total * 1000 - db_ms, 0.0)
+    return f'db;dur={db_ms:.1f}, app;dur={app_ms:.1f}, queries;desc="{stats.count}"'
+
+
+def _route_name(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "")
+
+
+def _check_budgets(scope, stats: QueryStats, total: float) -> None:
+    exceeded = []
+    if REQUEST_QUERY_BUDGET and stats.count > REQUEST_QUERY_BUDGET:
+        exceeded.append("queries")
+    if REQUEST_DB_TIME_BUDGET_MS and stats.db_time_ms > REQUEST_DB_TIME_BUDGET_MS:
+        exceeded.append("db")
+    if REQUEST_TIME_BUDGET_MS and total * 1000 > REQUEST_TIME_BUDGET_MS:
+        exceeded.append("total")
+    if exceeded:
+        logger.warning(
+            "Request over budget (%s): %s %s queries=%d db=%.1fms total=%.1fms",
+            ",".join(exceeded), scope["method"], _route_name(scope),
+            stats.count, stats.db_time_ms, total * 1000,
+        )
+
+
+class QueryTimingMiddleware:
+    """ASGI-middleware: счётчик запросов к БД на HTTP-запрос, Server-Timing, лог превышений бюджета."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stats = QueryStats(parent=_current.get())
+        token = _current.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and SERVER_TIMING:
+                total = time.perf_counter() - started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats, total).encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Потоковые ответы дочитывают БД после заголовков — бюджет по итогу
+                _check_budgets(scope, stats, time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
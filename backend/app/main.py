@@ -1,17 +1,36 @@
 import os
-from contextlib import asynccontextmanager
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from .database import engine, Base
-from .routers import auth, goals, todos, goals_v2, tasks, calendar
+from .database import engine, async_engine, Base
+from . import counters  # noqa: F401 — регистрирует обновление счётчиков прогресса
+from . import metrics, passwords, sweeper
+from .compression import CompressionMiddleware
+from .data_version import ETagMiddleware, conditional_get
+from .instrumentation import QueryTimingMiddleware
+from .routers import auth, goals, todos, goals_v2, tasks, calendar, admin
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Create tables on startup
     Base.metadata.create_all(bind=engine)
+
+    # Финализация действий с истёкшим периодом (вместо пересчёта на GET)
+    sweep_task = None
+    if sweeper.SWEEP_INTERVAL_SECONDS > 0:
+        sweep_task = asyncio.create_task(sweeper.run_periodically())
     yield
+    if sweep_task:
+        sweep_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await sweep_task
+    passwords.hasher.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 app = FastAPI(title="Goal Navigator API", lifespan=lifespan)
@@ -40,12 +59,35 @@ app.add_middleware(
     secret_key=os.getenv("SECRET_KEY", "your-secret-key-keep-it-secret"),
 )
 
+# ETag по версии данных пользователя; If-None-Match -> 304 до загрузки данных
+app.add_middleware(ETagMiddleware)
+
+# gzip/br поверх готовых заголовков (ETag уже выставлен); время сжатия входит в метрики запроса
+app.add_middleware(CompressionMiddleware)
+
+# Метрики Prometheus по шаблону маршрута (внутри QueryTimingMiddleware — видит счётчик SQL)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Последним — внешний слой: число запросов к БД и время на весь запрос (Server-Timing)
+app.add_middleware(QueryTimingMiddleware)
+etag = [Depends(conditional_get)]
+
 app.include_router(auth.router)
-app.include_router(goals.router)
-app.include_router(todos.router)
-app.include_router(goals_v2.router)  # API v2 для страницы "Цели"
-app.include_router(tasks.router)  # API для страницы "Ближайшие дни"
-app.include_router(calendar.router)  # API для страницы "Календарь"
+app.include_router(goals.router, dependencies=etag)
+app.include_router(todos.router, dependencies=etag)
+app.include_router(goals_v2.router, dependencies=etag)  # API v2 для страницы "Цели"
+app.include_router(tasks.router, dependencies=etag)  # API для страницы "Ближайшие дни"
+app.include_router(calendar.router, dependencies=etag)  # API для страницы "Календарь"
+app.include_router(admin.router)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    """Метрики Prometheus (app/metrics.py); async — threadpool снимается из event loop."""
+    if metrics.METRICS_TOKEN and authorization != f"Bearer {metrics.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
 
 
 @app.get("/")
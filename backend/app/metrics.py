@@ -0,0 +1,219 @@
+"""
+Метрики Prometheus: GET /metrics (формат text exposition).
+
+- http_request_duration_seconds{method, route, status} — гистограмма по шаблону
+  маршрута (/api/v2/goals/{goal_id}, а не по конкретному URL);
+  http_requests_in_progress{method} — запросы в обработке;
+  http_request_db_queries / http_request_db_seconds{route} — SQL на запрос
+  (счётчик app/instrumentation.py);
+- threadpool_* — занятость потоков threadpool (anyio), в котором идут
+  синхронные обработчики и run_db;
+- db_pool_*{engine} — пул соединений SQLAlchemy: размер, выданные, overflow;
+  db_pool_wait_seconds — ожидание свободного соединения;
+- response_cache_* — попадания/промахи кэша ответов по namespace;
+  password_hash_* — пул bcrypt (app/passwords.py);
+- progress_compute_seconds{level} — расчёт прогресса: milestone — веха с её
+  действиями, goal — только агрегация по уже посчитанным вехам (ряды не пересекаются);
+- http_response_compression_ratio / _seconds{encoding} — степень сжатия ответа
+  (сжатый / исходный) и CPU-время сжатия; http_response_compression_bytes_total
+  {encoding, stage} — байты до и после (app/compression.py).
+
+Метрики живут в памяти процесса: при нескольких воркерах uvicorn каждый
+отдаёт свои (в docker-compose.prod.yml — один воркер).
+METRICS_TOKEN — если задан, /metrics требует Authorization: Bearer <token>.
+"""
+
+import os
+import time
+
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from . import instrumentation
+
+load_dotenv()
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP-запросы в обработке", ["method"]
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL-запросов на HTTP-запрос",
+    ["route"],
+    buckets=(1, 2, 4, 6, 10, 15, 25, 50, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Время в БД на HTTP-запрос",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Ожидание соединения из пула SQLAlchemy",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+PROGRESS_SECONDS = Histogram(
+    "progress_compute_seconds",
+    "Расчёт прогресса (level: milestone — веха с действиями, goal — агрегация по готовым вехам)",
+    ["level"],
+    buckets=(0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+COMPRESSION_RATIO = Histogram(
+    "http_response_compression_ratio",
+    "Размер сжатого ответа относительно исходного",
+    ["encoding"],
+    buckets=(0.02, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1),
+)
+COMPRESSION_SECONDS = Histogram(
+    "http_response_compression_seconds",
+    "CPU-время сжатия ответа",
+    ["encoding"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+COMPRESSION_BYTES = Counter(
+    "http_response_compression_bytes",
+    "Байты сжатых ответов (stage: uncompressed, compressed)",
+    ["encoding", "stage"],
+)
+
+
+def _route_template(scope) -> str:
+    """Шаблон маршрута; несовпавшие пути — одной меткой, чтобы не плодить ряды."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность по шаблону маршрута, запросы в обработке, SQL на запрос."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = time.perf_counter()
+        status = {"code": 500}
+        observed = False
+
+        def observe():
+            nonlocal observed
+            if observed:
+                return
+            observed = True
+            route = _route_template(scope)
+            REQUEST_DURATION.labels(method, route, str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+            stats = instrumentation.current_stats()
+            if stats is not None:
+                REQUEST_DB_QUERIES.labels(route).observe(stats.count)
+                REQUEST_DB_SECONDS.labels(route).observe(stats.db_time)
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            observe()
+            in_progress.dec()
+
+
+class _RuntimeCollector:
+    """Метрики, снимаемые в момент scrape: threadpool, пулы БД, кэш, пул паролей."""
+
+    def describe(self):
+        # Без describe реестр вызвал бы collect() при регистрации — до готовности app.database
+        return []
+
+    def collect(self):
+        yield from _threadpool_metrics()
+        yield from _db_pool_metrics()
+        yield from _cache_metrics()
+        yield from _password_hash_metrics()
+
+
+def _threadpool_metrics():
+    from anyio import to_thread
+
+    try:
+        limiter = to_thread.current_default_thread_limiter()
+        stats = limiter.statistics()
+    except Exception:  # scrape вне event loop — threadpool недоступен
+        return
+    yield GaugeMetricFamily("threadpool_threads_total", "Размер threadpool", value=limiter.total_tokens)
+    yield GaugeMetricFamily("threadpool_threads_busy", "Занятые потоки threadpool", value=stats.borrowed_tokens)
+    yield GaugeMetricFamily("threadpool_tasks_waiting", "Задачи в ожидании потока", value=stats.tasks_waiting)
+
+
+def _db_pool_metrics():
+    from . import database
+
+    size = GaugeMetricFamily("db_pool_size", "Размер пула соединений", labels=["engine"])
+    checked_out = GaugeMetricFamily("db_pool_checked_out", "Выданные соединения", labels=["engine"])
+    overflow = GaugeMetricFamily("db_pool_overflow", "Соединения сверх pool_size", labels=["engine"])
+    engines = {"sync": database.engine}
+    if database.async_engine is not None:
+        engines["async"] = database.async_engine.sync_engine
+    for name, engine in engines.items():
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):  # пулы без учёта (SQLite в памяти)
+            continue
+        size.add_metric([name], pool.size())
+        checked_out.add_metric([name], pool.checkedout())
+        overflow.add_metric([name], max(pool.overflow(), 0))
+    yield from (size, checked_out, overflow)
+
+
+def _cache_metrics():
+    from . import cache
+
+    stats = cache.stats()
+    hits = CounterMetricFamily("response_cache_hits", "Попадания кэша ответов", labels=["namespace"])
+    misses = CounterMetricFamily("response_cache_misses", "Промахи кэша ответов", labels=["namespace"])
+    ratio = GaugeMetricFamily("response_cache_hit_ratio", "Доля попаданий кэша ответов", labels=["namespace"])
+    for namespace, counters in stats["namespaces"].items():
+        hits.add_metric([namespace], counters["hits"])
+        misses.add_metric([namespace], counters["misses"])
+        ratio.add_metric([namespace], counters["hit_ratio"])
+    yield from (hits, misses, ratio)
+    yield GaugeMetricFamily("response_cache_entries", "Записей в кэше ответов", value=stats["entries"])
+
+
+def _password_hash_metrics():
+    from . import passwords
+
+    stats = passwords.stats()
+    yield GaugeMetricFamily("password_hash_in_flight", "Задачи bcrypt в пуле", value=stats["in_flight"])
+    yield GaugeMetricFamily("password_hash_queued", "Задачи bcrypt в очереди", value=stats["queued"])
+    yield CounterMetricFamily("password_hash_completed", "Выполненные задачи bcrypt", value=stats["completed"])
+    yield CounterMetricFamily("password_hash_failed", "Задачи bcrypt с ошибкой или отменённые", value=stats["failed"])
+    yield CounterMetricFamily("password_hash_rejected", "Отклонённые задачи bcrypt", value=stats["rejected"])
+
+
+REGISTRY.register(_RuntimeCollector())
+
+
+def render() -> tuple[bytes, str]:
+    """Тело и Content-Type ответа /metrics."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
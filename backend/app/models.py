@@ -1,10 +1,29 @@
-from sqlalchemy import ForeignKey, Date, JSON
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import ForeignKey, Date, Index, SmallInteger, UniqueConstraint, text, type_coerce
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
+from sqlalchemy.types import TypeDecorator
 from .database import Base
+from .recurrence import mask_to_weekdays, weekdays_to_mask
 from typing import List, Optional
 from datetime import datetime, date
 
 
+class WeekdayMask(TypeDecorator):
+    """Дни недели в колонке SMALLINT: 7-битная маска в БД, список [1-7] в Python."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return weekdays_to_mask(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return mask_to_weekdays(value)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -17,6 +36,8 @@ class User(Base):
     auth_provider: Mapped[str] = mapped_column(default="local")  # "local" | "google" | "both"
     google_id: Mapped[Optional[str]] = mapped_column(unique=True, nullable=True, index=True)
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    # Версия данных пользователя: растёт при каждой записи (ETag, кэш ответов — app/data_version.py)
+    data_version: Mapped[int] = mapped_column(default=0, server_default="0")
 
     # Связь с целями: один пользователь может иметь много целей
     goals: Mapped[List["Goal"]] = relationship(
@@ -29,6 +50,10 @@ class User(Base):
 
 class Goal(Base):
     __tablename__ = "goals"
+    __table_args__ = (
+        # Список целей пользователя и окно календаря
+        Index("ix_goals_user_archived_start", "user_id", "is_archived", "start_date"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -95,6 +120,7 @@ class Milestone(Base):
     """Веха - промежуточный этап достижения цели."""
 
     __tablename__ = "milestones"
+    __table_args__ = (Index("ix_milestones_goal_id", "goal_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     goal_id: Mapped[int] = mapped_column(ForeignKey("goals.id"))
@@ -128,19 +154,31 @@ class RecurringAction(Base):
     """Регулярное действие - повторяется каждую неделю в указанные дни."""
 
     __tablename__ = "recurring_actions"
+    __table_args__ = (
+        # Частичный индекс: удалённые действия не читаются
+        Index(
+            "ix_recurring_actions_milestone_active",
+            "milestone_id",
+            postgresql_where=text("is_deleted = false"),
+            sqlite_where=text("is_deleted = 0"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     milestone_id: Mapped[int] = mapped_column(ForeignKey("milestones.id"))
     title: Mapped[str] = mapped_column(nullable=False)
-    weekdays: Mapped[List[int]] = mapped_column(
-        JSON, nullable=False
-    )  # [1,3,5] = пн, ср, пт
+    # [1,3,5] = пн, ср, пт; хранится маской в колонке weekday_mask (бит 0 = Пн)
+    weekdays: Mapped[List[int]] = mapped_column("weekday_mask", WeekdayMask, nullable=False)
     target_percent: Mapped[int] = mapped_column(default=80)  # Целевой % выполнения (1-100)
     is_completed: Mapped[bool] = mapped_column(default=False)  # Достигнут ли target_percent
     start_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)  # Свой период (если None — milestone)
     end_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)  # Свой период (если None — milestone)
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
 
+    # Денормализованные счётчики прогресса за effective-период (см. app/counters.py)
+    completed_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    expected_count: Mapped[int] = mapped_column(default=0, server_default="0")
+
     # Soft delete
     is_deleted: Mapped[bool] = mapped_column(default=False)
 
@@ -150,25 +188,56 @@ class RecurringAction(Base):
         back_populates="recurring_action", cascade="all, delete-orphan"
     )
 
+    @validates("weekdays")
+    def _coerce_weekdays(self, key, value):
+        # Тот же вид, что после чтения из БД: отсортированный список без повторов
+        return None if value is None else mask_to_weekdays(weekdays_to_mask(value))
+
+    @classmethod
+    def active_on(cls, weekday_mask: int):
+        """SQL-условие: действие повторяется хотя бы в один из дней маски (weekday_mask & mask <> 0)."""
+        return type_coerce(cls.weekdays, SmallInteger).op("&")(weekday_mask) != 0
+
 
 class RecurringActionLog(Base):
     """Лог выполнения регулярного действия."""
 
     __tablename__ = "recurring_action_logs"
+    __table_args__ = (
+        # Один лог на действие и дату; индекс для выборок логов по окну дат
+        UniqueConstraint("recurring_action_id", "date", name="uq_recurring_action_logs_action_date"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    recurring_action_id: Mapped[int] = mapped_column(ForeignKey("recurring_actions.id"))
-    date: Mapped[date] = mapped_column(Date, nullable=False)
-    completed: Mapped[bool] = mapped_column(default=False)
+    # active_history: прежние значения нужны событиям flush (счётчики, битовые карты),
+    # даже если атрибут был expired до изменения
+    recurring_action_id: Mapped[int] = mapped_column(ForeignKey("recurring_actions.id"), active_history=True)
+    date: Mapped[date] = mapped_column(Date, nullable=False, active_history=True)
+    completed: Mapped[bool] = mapped_column(default=False, active_history=True)
 
     # Связи
     recurring_action: Mapped["RecurringAction"] = relationship(back_populates="logs")
 
 
+class RecurringActionMonth(Base):
+    """Битовая карта выполнений действия за месяц (app/completion_bitmap.py): бит d-1 — день d."""
+
+    __tablename__ = "recurring_action_months"
+
+    recurring_action_id: Mapped[int] = mapped_column(
+        ForeignKey("recurring_actions.id", ondelete="CASCADE"), primary_key=True
+    )
+    month: Mapped[int] = mapped_column(primary_key=True)  # year * 12 + (month - 1)
+    bits: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+
+
 class OneTimeAction(Base):
     """Однократное действие - выполняется один раз к определённой дате."""
 
     __tablename__ = "one_time_actions"
+    __table_args__ = (
+        Index("ix_one_time_actions_milestone_deadline", "milestone_id", "deadline"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     milestone_id: Mapped[int] = mapped_column(ForeignKey("milestones.id"))
@@ -1,6 +1,9 @@
 from authlib.integrations.starlette_client import OAuth
+from sqlalchemy.orm import Session
 import os
 
+from . import auth, models
+
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:8000/auth/google/callback")
@@ -16,3 +19,54 @@ oauth.register(
         "redirect_uri": GOOGLE_REDIRECT_URI,
     },
 )
+
+
+def login_google_user(db: Session, user_info: dict) -> dict:
+    """
+    Найти пользователя по данным Google (userinfo), привязать Google
+    к существующему аккаунту по email или создать нового; вернуть данные
+    для JWT. Синхронная функция — вызывать через database.run_db.
+    """
+    google_id = user_info["sub"]
+    email = user_info["email"]
+    display_name = user_info.get("name", "")
+    avatar_url = user_info.get("picture", "")
+
+    # Ищем пользователя по google_id
+    user = db.query(models.User).filter(models.User.google_id == google_id).first()
+
+    if not user:
+        # Ищем по email — возможно, зарегистрирован через email+пароль
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user:
+            # Привязываем Google к существующему аккаунту
+            user.google_id = google_id
+            user.auth_provider = "both"
+            if not user.display_name:
+                user.display_name = display_name
+            if not user.avatar_url:
+                user.avatar_url = avatar_url
+        else:
+            # Новый пользователь через Google
+            user_count = db.query(models.User).count()
+            user = models.User(
+                email=email,
+                google_id=google_id,
+                display_name=display_name,
+                avatar_url=avatar_url,
+                auth_provider="google",
+                role="admin" if user_count == 0 else "user",
+                hashed_password=None,
+            )
+            db.add(user)
+        db.commit()
+        db.refresh(user)
+    else:
+        # Обновляем профиль из Google при каждом входе
+        user.display_name = display_name
+        user.avatar_url = avatar_url
+        db.commit()
+
+    # Профиль изменился — снимок в кэше аутентификации устарел
+    auth.invalidate_user(user.email)
+    return auth.token_claims(user)
@@ -0,0 +1,144 @@
+"""
+Хэширование паролей (bcrypt) в отдельном ограниченном пуле.
+
+bcrypt — десятки миллисекунд CPU на вызов. В обработчиках он занимал потоки
+общего threadpool (или event loop при DATABASE_ASYNC), и всплеск входов
+останавливал остальные запросы. Здесь работа идёт в собственном пуле из
+PASSWORD_HASH_WORKERS потоков (или процессов при PASSWORD_HASH_PROCESSES=1),
+очередь ограничена PASSWORD_HASH_QUEUE: сверх неё запрос сразу получает
+PasswordQueueFull (в API — 503), а не ждёт.
+
+Стоимость задаёт BCRYPT_ROUNDS. Хэш с другой стоимостью при успешном входе
+пересчитывается (verify_and_update) — смена настройки применяется постепенно.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+PASSWORD_HASH_PROCESSES = os.getenv("PASSWORD_HASH_PROCESSES", "").lower() in ("1", "true", "yes")
+
+# min = max = default: хэш с другой стоимостью считается устаревшим
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class PasswordQueueFull(Exception):
+    """Очередь хэширования заполнена — запрос отклонён без ожидания."""
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update(password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """(пароль верен, новый хэш — если сохранённый сделан с другой стоимостью)."""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Ограниченный пул для bcrypt: не больше workers задач выполняется
+    и не больше max_queue ждёт; метрики — в stats().
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_QUEUE,
+                 processes: bool = PASSWORD_HASH_PROCESSES):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.processes = processes
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.processes:
+                    # spawn: форк процесса с потоками и открытыми соединениями небезопасен
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hash"
+                    )
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Выполнить fn(*args) в пуле; PasswordQueueFull, если очередь заполнена."""
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise PasswordQueueFull()
+            self._in_flight += 1
+            self._peak_queued = max(self._peak_queued, self._in_flight - self.workers)
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BaseException:
+            # Ошибка в пуле или отмена запроса — не «выполнено»
+            with self._lock:
+                self._in_flight -= 1
+                self._failed += 1
+            raise
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": "process" if self.processes else "thread",
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.workers),
+                "peak_queued": self._peak_queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+hasher = PasswordHasher()
+
+
+async def hash_password_async(password: str) -> str:
+    return await hasher.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return await hasher.run(verify_and_update, password, hashed_password)
+
+
+def stats() -> dict:
+    """Метрики пула хэширования (для /api/admin)."""
+    return hasher.stats()
@@ -0,0 +1,98 @@
+"""
+Арифметика повторений регулярных действий по дням недели.
+
+Дни недели кодируются как в API: 1=Пн ... 7=Вс (список [1, 3, 5]); в БД —
+7-битной маской (бит 0 = Пн, models.WeekdayMask).
+Подсчёт за O(1): целые недели × количество дней недели + остаток по таблице.
+"""
+
+from datetime import date, timedelta
+from typing import Iterable, Iterator
+
+ALL_WEEKDAYS_MASK = 0b1111111
+
+
+def weekdays_to_mask(weekdays: Iterable[int]) -> int:
+    """Преобразовать список дней недели [1-7] в 7-битную маску (бит 0 = Пн)."""
+    mask = 0
+    for day in weekdays:
+        if 1 <= day <= 7:
+            mask |= 1 << (day - 1)
+    return mask
+
+
+def _build_remainder_table() -> tuple:
+    """
+    Таблица остатков: _REMAINDER[mask][first_weekday][length] —
+    сколько дней из маски попадает в отрезок из length дней (0-6),
+    начинающийся с дня недели first_weekday (0=Пн).
+    """
+    table = []
+    for mask in range(128):
+        by_start = []
+        for first in range(7):
+            counts = [0]
+            for offset in range(6):
+                bit = (first + offset) % 7
+                counts.append(counts[-1] + ((mask >> bit) & 1))
+            by_start.append(tuple(counts))
+        table.append(tuple(by_start))
+    return tuple(table)
+
+
+_REMAINDER = _build_remainder_table()
+_POPCOUNT = tuple(bin(mask).count("1") for mask in range(128))
+_DAYS = tuple(
+    tuple(day for day in range(1, 8) if (mask >> (day - 1)) & 1) for mask in range(128)
+)
+
+
+def mask_to_weekdays(mask: int) -> list[int]:
+    """7-битная маска → отсортированный список дней недели [1-7]."""
+    return list(_DAYS[mask & ALL_WEEKDAYS_MASK])
+
+
+def range_weekday_mask(start_date: date, end_date: date) -> int:
+    """Маска дней недели, встречающихся в [start_date, end_date] (0 — пустой диапазон)."""
+    days = (end_date - start_date).days + 1
+    if days <= 0:
+        return 0
+    if days >= 7:
+        return ALL_WEEKDAYS_MASK
+    first = start_date.weekday()
+    mask = (1 << days) - 1
+    # Циклический сдвиг на день недели начала диапазона
+    return ((mask << first) | (mask >> (7 - first))) & ALL_WEEKDAYS_MASK
+
+
+def count_weekday_occurrences(
+    start_date: date, end_date: date, weekdays: Iterable[int]
+) -> int:
+    """Сколько дат в [start_date, end_date] попадает на указанные дни недели."""
+    if end_date < start_date:
+        return 0
+    mask = weekdays_to_mask(weekdays)
+    full_weeks, remainder = divmod((end_date - start_date).days + 1, 7)
+    return full_weeks * _POPCOUNT[mask] + _REMAINDER[mask][start_date.weekday()][remainder]
+
+
+def iter_weekday_occurrences(
+    start_date: date, end_date: date, weekdays: Iterable[int]
+) -> Iterator[date]:
+    """Перебрать даты в [start_date, end_date] на указанные дни недели (по возрастанию)."""
+    mask = weekdays_to_mask(weekdays)
+    first = start_date.weekday()
+    # Смещения от начала каждой недели, попадающие в маску (по возрастанию)
+    offsets = [
+        timedelta(days=offset) for offset in range(7) if (mask >> ((first + offset) % 7)) & 1
+    ]
+    if not offsets:
+        return
+    week_start = start_date
+    while week_start <= end_date:
+        for offset in offsets:
+            current = week_start + offset
+            if current > end_date:
+                return
+            yield current
+        week_start += timedelta(days=7)
@@ -0,0 +1,27 @@
+"""
+Служебные эндпоинты для администратора.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from .. import auth, passwords
+from .. import cache as response_cache
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+def require_admin(current_user: auth.CurrentUser = Depends(auth.get_current_user)) -> auth.CurrentUser:
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    return current_user
+
+
+@router.get("/cache-stats")
+def get_cache_stats(current_user: auth.CurrentUser = Depends(require_admin)):
+    """Метрики кэша ответов календаря: попадания/промахи по namespace."""
+    return response_cache.stats()
+
+
+@router.get("/password-hash-stats")
+def get_password_hash_stats(current_user: auth.CurrentUser = Depends(require_admin)):
+    """Пул хэширования паролей: глубина очереди, выполнено, отклонено."""
+    return passwords.stats()
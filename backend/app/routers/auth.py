@@ -4,24 +4,34 @@ from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette.requests import Request
 from starlette.responses import RedirectResponse
-from .. import models, schemas, auth, database
-from ..oauth import oauth
+from .. import models, schemas, auth, database, data_version, passwords
+from ..oauth import oauth, login_google_user
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=database.SessionRoute)
 
-@router.post("/register", response_model=schemas.UserResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
+async def _password_work(coro):
+    """Хэширование в пуле passwords.hasher; переполненная очередь — 503 сразу."""
+    try:
+        return await coro
+    except passwords.PasswordQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _email_registered(db: Session, email: str) -> bool:
+    return db.query(models.User.id).filter(models.User.email == email).first() is not None
 
+
+def _create_local_user(db: Session, email: str, hashed_password: str):
     # Первый пользователь — admin
     user_count = db.query(models.User).count()
     role = "admin" if user_count == 0 else "user"
 
-    hashed_password = auth.get_password_hash(user.password)
     new_user = models.User(
-        email=user.email,
+        email=email,
         hashed_password=hashed_password,
         auth_provider="local",
         role=role,
@@ -29,19 +39,50 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
-    return new_user
+    return schemas.UserResponse.model_validate(new_user)
+
+
+def _find_local_user(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def _save_rehash(db: Session, user_id: int, hashed_password: str) -> None:
+    """Пароль пересчитан с текущей стоимостью bcrypt (BCRYPT_ROUNDS)."""
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.hashed_password: hashed_password}, synchronize_session=False
+    )
+    db.commit()
+
+
+# register/login — async: bcrypt идёт в пуле passwords.hasher, а не в потоке
+# threadpool / run_sync, занятом сессией БД
+@router.post("/register", response_model=schemas.UserResponse)
+async def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    if await database.run_db(db, _email_registered, user.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    hashed_password = await _password_work(passwords.hash_password_async(user.password))
+    return await database.run_db(db, _create_local_user, user.email, hashed_password)
 
 @router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not user.hashed_password or not auth.verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+    user = await database.run_db(db, _find_local_user, form_data.username)
+    valid, new_hash = False, None
+    if user and user.hashed_password:
+        valid, new_hash = await _password_work(
+            passwords.verify_password_async(form_data.password, user.hashed_password)
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    access_token = auth.create_access_token(data={"sub": user.email})
+    claims = auth.token_claims(user)
+    if new_hash:
+        await database.run_db(db, _save_rehash, user.id, new_hash)
+
+    access_token = auth.create_access_token(data=claims)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -61,48 +102,12 @@ async def google_callback(request: Request, db: Session = Depends(database.get_d
     if not user_info:
         raise HTTPException(status_code=400, detail="Failed to get user info from Google")
 
-    google_id = user_info["sub"]
-    email = user_info["email"]
-    display_name = user_info.get("name", "")
-    avatar_url = user_info.get("picture", "")
-
-    # Ищем пользователя по google_id
-    user = db.query(models.User).filter(models.User.google_id == google_id).first()
-
-    if not user:
-        # Ищем по email — возможно, зарегистрирован через email+пароль
-        user = db.query(models.User).filter(models.User.email == email).first()
-        if user:
-            # Привязываем Google к существующему аккаунту
-            user.google_id = google_id
-            user.auth_provider = "both"
-            if not user.display_name:
-                user.display_name = display_name
-            if not user.avatar_url:
-                user.avatar_url = avatar_url
-        else:
-            # Новый пользователь через Google
-            user_count = db.query(models.User).count()
-            user = models.User(
-                email=email,
-                google_id=google_id,
-                display_name=display_name,
-                avatar_url=avatar_url,
-                auth_provider="google",
-                role="admin" if user_count == 0 else "user",
-                hashed_password=None,
-            )
-            db.add(user)
-        db.commit()
-        db.refresh(user)
-    else:
-        # Обновляем профиль из Google при каждом входе
-        user.display_name = display_name
-        user.avatar_url = avatar_url
-        db.commit()
+    # Поиск / привязка / создание пользователя — синхронная работа с БД,
+    # поэтому через run_db (threadpool или AsyncSession), а не на event loop
+    claims = await database.run_db(db, login_google_user, user_info)
 
     # Создаём JWT-токен
-    access_token = auth.create_access_token(data={"sub": user.email})
+    access_token = auth.create_access_token(data=claims)
 
     # Redirect на фронтенд с токеном
     frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
@@ -111,21 +116,30 @@ async def google_callback(request: Request, db: Session = Depends(database.get_d
     )
 
 
-@router.get("/me", response_model=schemas.UserResponse)
-def get_current_user_profile(current_user: models.User = Depends(auth.get_current_user)):
+@router.get(
+    "/me",
+    response_model=schemas.UserResponse,
+    dependencies=[Depends(data_version.conditional_get)],
+)
+def get_current_user_profile(
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
+    db: Session = Depends(database.get_db),
+):
     """Получить профиль текущего пользователя."""
-    return current_user
+    return db.get(models.User, current_user.id)
 
 
 @router.put("/me", response_model=schemas.UserResponse)
 def update_profile(
     profile: schemas.UserProfileUpdate,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
     db: Session = Depends(database.get_db),
 ):
     """Обновить профиль (display_name)."""
+    user = db.get(models.User, current_user.id)
     if profile.display_name is not None:
-        current_user.display_name = profile.display_name
+        user.display_name = profile.display_name
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    auth.invalidate_user(current_user.email)
+    return user
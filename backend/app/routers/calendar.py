@@ -4,13 +4,16 @@ API для страницы "Календарь" (004-calendar-page).
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session, selectinload, with_loader_criteria
 from datetime import date, timedelta
 from typing import List, Optional
-from .. import models, schemas, auth, database
-from .goals_v2 import calculate_goal_progress, calculate_milestone_progress, calculate_recurring_action_progress
+from .. import models, schemas, auth, database, data_version, completion_bitmap
+from .. import cache as response_cache
+from ..recurrence import ALL_WEEKDAYS_MASK, iter_weekday_occurrences, range_weekday_mask
+from .goals_v2 import ProgressContext, goal_tree_options
 
-router = APIRouter(prefix="/api/calendar", tags=["calendar"])
+router = APIRouter(prefix="/api/calendar", tags=["calendar"], route_class=database.SessionRoute)
 
 # Палитра цветов для целей (назначается по порядку создания)
 GOAL_COLORS = [
@@ -31,9 +34,19 @@ def _get_goal_color(goal_index: int) -> str:
 
 
 def _get_user_goals(
-    db: Session, user_id: int, include_archived: bool = False
+    db: Session,
+    user_id: int,
+    include_archived: bool = False,
+    window: Optional[tuple[date, date]] = None,
+    goal_ids: Optional[set[int]] = None,
+    options: Optional[list] = None,
 ) -> List[models.Goal]:
-    """Получить все цели v2 пользователя (с датами)."""
+    """
+    Получить цели v2 пользователя (с датами).
+
+    window=(first_day, last_day) — только цели, пересекающиеся с окном;
+    goal_ids — фильтр по целям. Оба условия применяются в SQL.
+    """
     query = (
         db.query(models.Goal)
         .filter(
@@ -41,11 +54,130 @@ def _get_user_goals(
             models.Goal.start_date.isnot(None),
         )
     )
+    if options:
+        # populate_existing: окно задаёт состав коллекций, не переиспользуем загруженные ранее
+        query = query.options(*options).populate_existing()
     if not include_archived:
         query = query.filter(models.Goal.is_archived == False)
+    if window is not None:
+        first_day, last_day = window
+        query = query.filter(models.Goal.start_date <= last_day, models.Goal.end_date >= first_day)
+    if goal_ids is not None:
+        query = query.filter(models.Goal.id.in_(goal_ids))
     return query.order_by(models.Goal.id).all()
 
 
+def _load_goal_positions(
+    db: Session, user_id: int, goal_ids: List[int], include_archived: bool = False
+) -> dict[int, int]:
+    """
+    goal_id -> порядковый номер цели среди всех целей пользователя (с датами).
+
+    Считается оконной функцией в SQL, поэтому цвет цели не зависит от того,
+    какие цели попали в окно запроса.
+    """
+    if not goal_ids:
+        return {}
+    conditions = [models.Goal.user_id == user_id, models.Goal.start_date.isnot(None)]
+    if not include_archived:
+        conditions.append(models.Goal.is_archived == False)
+    numbered = (
+        select(
+            models.Goal.id,
+            (func.row_number().over(order_by=models.Goal.id) - 1).label("position"),
+        )
+        .where(*conditions)
+        .subquery()
+    )
+    rows = db.execute(
+        select(numbered.c.id, numbered.c.position).where(numbered.c.id.in_(goal_ids))
+    )
+    return {goal_id: position for goal_id, position in rows}
+
+
+def _recurring_in_window(first_day: date, last_day: date):
+    """Неудалённые регулярные действия; для окна короче недели — только с его днями недели."""
+    criteria = models.RecurringAction.is_deleted == False
+    mask = range_weekday_mask(first_day, last_day)
+    if mask != ALL_WEEKDAYS_MASK:
+        criteria = and_(criteria, models.RecurringAction.active_on(mask))
+    return criteria
+
+
+def _calendar_window_options(first_day: date, last_day: date, with_details: bool = False) -> list:
+    """
+    Опции загрузки вех и действий целей, ограниченные окном [first_day, last_day].
+
+    Вехи — неархивные, пересекающиеся с окном или с однократным действием в окне
+    (дедлайн однократного действия не обязан лежать внутри вехи).
+    with_details — ещё однократные действия с дедлайном в окне и логи за окно.
+    """
+    onetime_in_window = and_(
+        models.OneTimeAction.is_deleted == False,
+        models.OneTimeAction.deadline >= first_day,
+        models.OneTimeAction.deadline <= last_day,
+    )
+    milestones = selectinload(models.Goal.milestones)
+    options = [
+        milestones.selectinload(models.Milestone.recurring_actions),
+        with_loader_criteria(
+            models.Milestone,
+            and_(
+                models.Milestone.is_archived == False,
+                or_(
+                    and_(
+                        models.Milestone.start_date <= last_day,
+                        models.Milestone.end_date >= first_day,
+                    ),
+                    models.Milestone.one_time_actions.any(onetime_in_window),
+                ),
+            ),
+        ),
+        with_loader_criteria(models.RecurringAction, _recurring_in_window(first_day, last_day)),
+    ]
+    if with_details:
+        options += [
+            milestones.selectinload(models.Milestone.recurring_actions)
+            .selectinload(models.RecurringAction.logs),
+            milestones.selectinload(models.Milestone.one_time_actions),
+            with_loader_criteria(models.OneTimeAction, onetime_in_window),
+            with_loader_criteria(
+                models.RecurringActionLog,
+                and_(
+                    models.RecurringActionLog.date >= first_day,
+                    models.RecurringActionLog.date <= last_day,
+                ),
+            ),
+        ]
+    return options
+
+
+def _month_range(year: int, month: int) -> tuple[date, date]:
+    """Первый и последний день месяца."""
+    first_day = date(year, month, 1)
+    if month == 12:
+        return first_day, date(year + 1, 1, 1) - timedelta(days=1)
+    return first_day, date(year, month + 1, 1) - timedelta(days=1)
+
+
+def _get_goals_in_window(
+    db: Session,
+    user_id: int,
+    first_day: date,
+    last_day: date,
+    filter_ids: Optional[set[int]],
+    include_archived: bool,
+    options: list,
+) -> tuple[List[models.Goal], dict[int, str]]:
+    """Цели, пересекающиеся с окном, и их цвета (стабильные независимо от окна и фильтра)."""
+    goals = _get_user_goals(
+        db, user_id, include_archived=include_archived,
+        window=(first_day, last_day), goal_ids=filter_ids, options=options,
+    )
+    positions = _load_goal_positions(db, user_id, [g.id for g in goals], include_archived)
+    return goals, _build_goal_color_map(goals, positions)
+
+
 def _parse_goal_ids(goal_ids: Optional[str], goal_id: Optional[int] = None) -> Optional[set[int]]:
     """Парсинг фильтра целей. goal_ids (через запятую) имеет приоритет над goal_id."""
     if goal_ids is not None:
@@ -59,9 +191,23 @@ def _parse_goal_ids(goal_ids: Optional[str], goal_id: Optional[int] = None) -> O
     return None
 
 
-def _build_goal_color_map(goals: List[models.Goal]) -> dict[int, str]:
-    """Построить маппинг goal_id -> цвет."""
-    return {goal.id: _get_goal_color(i) for i, goal in enumerate(goals)}
+def _filter_key(filter_ids: Optional[set[int]]) -> Optional[tuple[int, ...]]:
+    """Нормализованный фильтр целей для ключа кэша."""
+    return tuple(sorted(filter_ids)) if filter_ids is not None else None
+
+
+def _build_goal_color_map(
+    goals: List[models.Goal], positions: Optional[dict[int, int]] = None
+) -> dict[int, str]:
+    """
+    Построить маппинг goal_id -> цвет.
+
+    Цвет определяется порядковым номером цели среди всех целей пользователя:
+    positions из _load_goal_positions, либо порядок goals, если загружены все цели.
+    """
+    if positions is None:
+        positions = {goal.id: i for i, goal in enumerate(goals)}
+    return {goal.id: _get_goal_color(positions[goal.id]) for goal in goals}
 
 
 def _is_goal_active_on_date(goal: models.Goal, d: date) -> bool:
@@ -106,6 +252,142 @@ def _get_onetime_tasks_for_date(
     return results
 
 
+def _load_completed_dates(
+    db: Session, action_ids: List[int], first_day: date, last_day: date
+) -> dict[int, set[date]]:
+    """action_id -> даты выполненных логов в окне [first_day, last_day] (один запрос)."""
+    if not action_ids:
+        return {}
+    if completion_bitmap.enabled():
+        return completion_bitmap.load_completed_dates(db, action_ids, first_day, last_day)
+    rows = db.query(
+        models.RecurringActionLog.recurring_action_id, models.RecurringActionLog.date
+    ).filter(
+        models.RecurringActionLog.recurring_action_id.in_(action_ids),
+        models.RecurringActionLog.completed == True,
+        models.RecurringActionLog.date >= first_day,
+        models.RecurringActionLog.date <= last_day,
+    )
+    completed: dict[int, set[date]] = {}
+    for action_id, log_date in rows:
+        completed.setdefault(action_id, set()).add(log_date)
+    return completed
+
+
+def _load_onetime_in_window(
+    db: Session, milestone_ids: List[int], first_day: date, last_day: date
+) -> dict[int, List[tuple[date, bool]]]:
+    """milestone_id -> [(deadline, completed)] неудалённых однократных действий с дедлайном в окне."""
+    if not milestone_ids:
+        return {}
+    rows = db.query(
+        models.OneTimeAction.milestone_id, models.OneTimeAction.deadline, models.OneTimeAction.completed
+    ).filter(
+        models.OneTimeAction.milestone_id.in_(milestone_ids),
+        models.OneTimeAction.is_deleted == False,
+        models.OneTimeAction.deadline >= first_day,
+        models.OneTimeAction.deadline <= last_day,
+    )
+    by_milestone: dict[int, List[tuple[date, bool]]] = {}
+    for milestone_id, deadline, completed in rows:
+        by_milestone.setdefault(milestone_id, []).append((deadline, completed))
+    return by_milestone
+
+
+def _build_month_days(
+    db: Session,
+    goals: List[models.Goal],
+    color_map: dict[int, str],
+    first_day: date,
+    last_day: date,
+) -> List[schemas.CalendarDayBrief]:
+    """
+    Агрегация месяца за один проход по действиям.
+
+    Каждое регулярное действие перебирается один раз — только по своим дням недели
+    в пересечении периода цели, вехи и месяца; счётчики пишутся в корзины по дням.
+    Выполнения и однократные действия загружаются из БД уже отфильтрованными по окну.
+    """
+    num_days = (last_day - first_day).days + 1
+    tasks_total = [0] * num_days
+    tasks_completed = [0] * num_days
+    day_goals: List[List[schemas.CalendarGoalBrief]] = [[] for _ in range(num_days)]
+    milestone_titles: List[Optional[str]] = [None] * num_days
+
+    # Пересечение периода цели с месяцем; цели без дат или вне месяца не участвуют
+    windows = []
+    for goal in goals:
+        if not goal.start_date or not goal.end_date:
+            continue
+        lo, hi = max(first_day, goal.start_date), min(last_day, goal.end_date)
+        if lo <= hi:
+            windows.append((goal, lo, hi))
+
+    milestones = [ms for goal, _, _ in windows for ms in goal.milestones if not ms.is_archived]
+    completed_dates = _load_completed_dates(
+        db,
+        [a.id for ms in milestones for a in ms.recurring_actions if not a.is_deleted],
+        first_day,
+        last_day,
+    )
+    onetime = _load_onetime_in_window(db, [ms.id for ms in milestones], first_day, last_day)
+
+    for goal, lo, hi in windows:
+        goal_days: set[int] = set()
+
+        for milestone in goal.milestones:
+            if milestone.is_archived:
+                continue
+            # Дедлайн вехи (первая веха дня в порядке обхода)
+            if lo <= milestone.end_date <= hi:
+                i = (milestone.end_date - first_day).days
+                if milestone_titles[i] is None:
+                    milestone_titles[i] = milestone.title
+
+            # Регулярные задачи — в пределах вехи
+            ms_lo, ms_hi = max(lo, milestone.start_date), min(hi, milestone.end_date)
+            for action in milestone.recurring_actions:
+                if action.is_deleted:
+                    continue
+                done = completed_dates.get(action.id, ())
+                for d in iter_weekday_occurrences(ms_lo, ms_hi, action.weekdays or []):
+                    i = (d - first_day).days
+                    tasks_total[i] += 1
+                    if d in done:
+                        tasks_completed[i] += 1
+                    goal_days.add(i)
+
+            # Однократные задачи
+            for deadline, completed in onetime.get(milestone.id, ()):
+                if lo <= deadline <= hi:
+                    i = (deadline - first_day).days
+                    tasks_total[i] += 1
+                    if completed:
+                        tasks_completed[i] += 1
+                    goal_days.add(i)
+
+        if goal_days:
+            brief = schemas.CalendarGoalBrief(
+                id=goal.id,
+                title=goal.title,
+                color=color_map.get(goal.id, "#888888"),
+            )
+            for i in goal_days:
+                day_goals[i].append(brief)
+
+    return [
+        schemas.CalendarDayBrief(
+            date=first_day + timedelta(days=i),
+            tasks_total=tasks_total[i],
+            tasks_completed=tasks_completed[i],
+            goals=day_goals[i],
+            has_milestone=milestone_titles[i] is not None,
+            milestone_title=milestone_titles[i],
+        )
+        for i in range(num_days)
+    ]
+
+
 # ============================================
 # Endpoints
 # ============================================
@@ -119,91 +401,35 @@ def get_calendar_month(
     goal_ids: Optional[str] = Query(None, description="Фильтр по нескольким целям (через запятую, напр. 1,2,3)"),
     include_archived: bool = Query(False, description="Включить архивные цели"),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
-    """Получить данные календаря за месяц."""
-    # Получаем все цели пользователя
-    all_goals = _get_user_goals(db, current_user.id, include_archived=include_archived)
-    color_map = _build_goal_color_map(all_goals)
-
-    # Фильтрация по goal_ids (приоритет) или goal_id (обратная совместимость)
+    """Получить данные календаря за месяц (ответ кэшируется, см. app/cache.py)."""
     filter_ids = _parse_goal_ids(goal_ids, goal_id)
-    if filter_ids is not None:
-        goals = [g for g in all_goals if g.id in filter_ids]
-    else:
-        goals = all_goals
-
-    # Определяем диапазон дат месяца
-    first_day = date(year, month, 1)
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = date(year, month + 1, 1) - timedelta(days=1)
-
-    # Собираем данные по каждому дню
-    days: List[schemas.CalendarDayBrief] = []
-    current = first_day
-
-    while current <= last_day:
-        tasks_total = 0
-        tasks_completed = 0
-        day_goals: List[schemas.CalendarGoalBrief] = []
-        has_milestone = False
-        milestone_title = None
-        seen_goal_ids = set()
-
-        for goal in goals:
-            if not _is_goal_active_on_date(goal, current):
-                continue
-
-            goal_has_tasks = False
-
-            for milestone in goal.milestones:
-                if milestone.is_archived:
-                    continue
-                # Проверяем вехи с дедлайном в этот день
-                if milestone.end_date == current and not has_milestone:
-                    has_milestone = True
-                    milestone_title = milestone.title
-
-                # Регулярные задачи
-                recurring = _get_recurring_tasks_for_date(milestone, current)
-                for action, completed in recurring:
-                    tasks_total += 1
-                    if completed:
-                        tasks_completed += 1
-                    goal_has_tasks = True
-
-                # Однократные задачи
-                onetime = _get_onetime_tasks_for_date(milestone, current)
-                for action, completed in onetime:
-                    tasks_total += 1
-                    if completed:
-                        tasks_completed += 1
-                    goal_has_tasks = True
-
-            if goal_has_tasks and goal.id not in seen_goal_ids:
-                seen_goal_ids.add(goal.id)
-                day_goals.append(
-                    schemas.CalendarGoalBrief(
-                        id=goal.id,
-                        title=goal.title,
-                        color=color_map.get(goal.id, "#888888"),
-                    )
-                )
+    return response_cache.cached_response(
+        "calendar-month",
+        current_user.id,
+        data_version.current_version(db, current_user.id),
+        (year, month, _filter_key(filter_ids), include_archived),
+        lambda: _build_calendar_month(db, current_user.id, year, month, filter_ids, include_archived),
+    )
 
-        days.append(
-            schemas.CalendarDayBrief(
-                date=current,
-                tasks_total=tasks_total,
-                tasks_completed=tasks_completed,
-                goals=day_goals,
-                has_milestone=has_milestone,
-                milestone_title=milestone_title,
-            )
-        )
 
-        current += timedelta(days=1)
+def _build_calendar_month(
+    db: Session,
+    user_id: int,
+    year: int,
+    month: int,
+    filter_ids: Optional[set[int]],
+    include_archived: bool,
+) -> schemas.CalendarMonthResponse:
+    first_day, last_day = _month_range(year, month)
+    goals, color_map = _get_goals_in_window(
+        db, user_id, first_day, last_day,
+        filter_ids=filter_ids,
+        include_archived=include_archived,
+        options=_calendar_window_options(first_day, last_day),
+    )
+    days = _build_month_days(db, goals, color_map, first_day, last_day)
 
     return schemas.CalendarMonthResponse(year=year, month=month, days=days)
 
@@ -215,17 +441,15 @@ def get_calendar_day(
     goal_ids: Optional[str] = Query(None, description="Фильтр по нескольким целям (через запятую)"),
     include_archived: bool = Query(False, description="Включить архивные цели"),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Получить детальную информацию о дне."""
-    all_goals = _get_user_goals(db, current_user.id, include_archived=include_archived)
-    color_map = _build_goal_color_map(all_goals)
-
-    filter_ids = _parse_goal_ids(goal_ids, goal_id)
-    if filter_ids is not None:
-        goals = [g for g in all_goals if g.id in filter_ids]
-    else:
-        goals = all_goals
+    goals, color_map = _get_goals_in_window(
+        db, current_user.id, day_date, day_date,
+        filter_ids=_parse_goal_ids(goal_ids, goal_id),
+        include_archived=include_archived,
+        options=_calendar_window_options(day_date, day_date, with_details=True),
+    )
 
     # Названия дней недели на русском
     weekday_names = [
@@ -238,6 +462,7 @@ def get_calendar_day(
     tasks: List[schemas.CalendarTaskView] = []
     milestones: List[schemas.CalendarMilestoneView] = []
     seen_goal_ids = set()
+    progress = ProgressContext()
 
     for goal in goals:
         if not _is_goal_active_on_date(goal, day_date):
@@ -262,9 +487,7 @@ def get_calendar_day(
             # Регулярные задачи
             recurring = _get_recurring_tasks_for_date(milestone, day_date)
             for action, completed in recurring:
-                progress_info = calculate_recurring_action_progress(
-                    action, milestone.start_date, milestone.end_date
-                )
+                progress_info = progress.action(action, milestone)
                 tasks.append(
                     schemas.CalendarTaskView(
                         id=action.id,
@@ -326,26 +549,39 @@ def get_calendar_timeline(
     goal_ids: Optional[str] = Query(None, description="Фильтр по нескольким целям (через запятую)"),
     include_archived: bool = Query(False, description="Включить архивные цели"),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
-    """Получить timeline целей для месяца."""
-    all_goals = _get_user_goals(db, current_user.id, include_archived=include_archived)
-    color_map = _build_goal_color_map(all_goals)
-
+    """Получить timeline целей для месяца (ответ кэшируется, см. app/cache.py)."""
     filter_ids = _parse_goal_ids(goal_ids, goal_id)
-    if filter_ids is not None:
-        goals = [g for g in all_goals if g.id in filter_ids]
-    else:
-        goals = all_goals
+    return response_cache.cached_response(
+        "calendar-timeline",
+        current_user.id,
+        data_version.current_version(db, current_user.id),
+        # Прогресс зависит от текущей даты (is_period_over) — она входит в ключ
+        (year, month, _filter_key(filter_ids), include_archived, date.today()),
+        lambda: _build_calendar_timeline(db, current_user.id, year, month, filter_ids, include_archived),
+    )
 
-    # Диапазон месяца
-    month_start = date(year, month, 1)
-    if month == 12:
-        month_end = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        month_end = date(year, month + 1, 1) - timedelta(days=1)
+
+def _build_calendar_timeline(
+    db: Session,
+    user_id: int,
+    year: int,
+    month: int,
+    filter_ids: Optional[set[int]],
+    include_archived: bool,
+) -> schemas.CalendarTimelineResponse:
+    # Диапазон месяца; вехи целей грузятся целиком — прогресс цели считается по всем вехам
+    month_start, month_end = _month_range(year, month)
+    goals, color_map = _get_goals_in_window(
+        db, user_id, month_start, month_end,
+        filter_ids=filter_ids,
+        include_archived=include_archived,
+        options=goal_tree_options(),
+    )
 
     timeline_goals: List[schemas.TimelineGoal] = []
+    progress = ProgressContext()
 
     for goal in goals:
         # Цель активна в месяце если пересекается с диапазоном
@@ -354,13 +590,13 @@ def get_calendar_timeline(
         if goal.start_date > month_end or goal.end_date < month_start:
             continue
 
-        progress, _ = calculate_goal_progress(goal)
+        goal_progress, _ = progress.goal(goal)
 
         milestone_views = []
         for ms in goal.milestones:
             if ms.is_archived:
                 continue
-            ms_info = calculate_milestone_progress(ms)
+            ms_info = progress.milestone(ms)
             milestone_views.append(
                 schemas.TimelineMilestone(
                     id=ms.id,
@@ -380,7 +616,7 @@ def get_calendar_timeline(
                 color=color_map.get(goal.id, "#888888"),
                 start_date=goal.start_date,
                 end_date=goal.end_date,
-                progress_percent=round(progress, 1),
+                progress_percent=round(goal_progress, 1),
                 milestones=milestone_views,
             )
         )
@@ -395,12 +631,14 @@ def get_upcoming_deadlines(
     goal_ids: Optional[str] = Query(None, description="Фильтр по нескольким целям (через запятую)"),
     include_archived: bool = Query(False, description="Включить архивные цели"),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Получить задачи с приближающимся дедлайном, сгруппированные по вехам."""
     today = date.today()
 
-    all_goals = _get_user_goals(db, current_user.id, include_archived=include_archived)
+    all_goals = _get_user_goals(
+        db, current_user.id, include_archived=include_archived, options=goal_tree_options()
+    )
     color_map = _build_goal_color_map(all_goals)
 
     filter_ids = _parse_goal_ids(goal_ids, goal_id)
@@ -411,6 +649,7 @@ def get_upcoming_deadlines(
 
     # milestone_id -> { milestone_data, tasks }
     milestone_groups: dict[int, dict] = {}
+    progress = ProgressContext()
 
     for goal in goals:
         goal_color = color_map.get(goal.id, "#888888")
@@ -433,9 +672,7 @@ def get_upcoming_deadlines(
                     continue
 
                 effective_start = action.start_date or milestone.start_date
-                progress_info = calculate_recurring_action_progress(
-                    action, milestone.start_date, milestone.end_date
-                )
+                progress_info = progress.action(action, milestone)
 
                 tasks_in_milestone.append(
                     schemas.DeadlineTaskView(
@@ -529,3 +766,4 @@ def get_upcoming_deadlines(
         total_tasks=total_tasks,
         milestones=milestones_response,
     )
+
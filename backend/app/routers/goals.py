@@ -3,10 +3,10 @@ from sqlalchemy.orm import Session
 from typing import List
 from .. import models, schemas, auth, database
 
-router = APIRouter(prefix="/goals", tags=["goals"])
+router = APIRouter(prefix="/goals", tags=["goals"], route_class=database.SessionRoute)
 
 @router.post("/", response_model=schemas.GoalResponse)
-def create_goal(goal: schemas.GoalCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_goal(goal: schemas.GoalCreate, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     new_goal = models.Goal(**goal.model_dump(), user_id=current_user.id)
     db.add(new_goal)
     db.commit()
@@ -14,7 +14,7 @@ def create_goal(goal: schemas.GoalCreate, db: Session = Depends(database.get_db)
     return new_goal
 
 @router.get("/", response_model=List[schemas.GoalResponse])
-def get_goals(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def get_goals(db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     goals = db.query(models.Goal).filter(models.Goal.user_id == current_user.id).all()
     for goal in goals:
         total_steps = len(goal.steps)
@@ -26,7 +26,7 @@ def get_goals(db: Session = Depends(database.get_db), current_user: models.User
     return goals
 
 @router.get("/stats", response_model=schemas.UserStats)
-def get_user_stats(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def get_user_stats(db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     goals = db.query(models.Goal).filter(models.Goal.user_id == current_user.id).all()
     
     total_goals = len(goals)
@@ -57,14 +57,14 @@ def get_user_stats(db: Session = Depends(database.get_db), current_user: models.
     }
 
 @router.get("/{goal_id}", response_model=schemas.GoalResponse)
-def get_goal(goal_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def get_goal(goal_id: int, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     goal = db.query(models.Goal).filter(models.Goal.id == goal_id, models.Goal.user_id == current_user.id).first()
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
     return goal
 
 @router.delete("/{goal_id}")
-def delete_goal(goal_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def delete_goal(goal_id: int, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     goal = db.query(models.Goal).filter(models.Goal.id == goal_id, models.Goal.user_id == current_user.id).first()
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
@@ -74,7 +74,7 @@ def delete_goal(goal_id: int, db: Session = Depends(database.get_db), current_us
 
 # Управление шагами
 @router.post("/{goal_id}/steps", response_model=schemas.StepResponse)
-def create_step(goal_id: int, step: schemas.StepCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_step(goal_id: int, step: schemas.StepCreate, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     goal = db.query(models.Goal).filter(models.Goal.id == goal_id, models.Goal.user_id == current_user.id).first()
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
@@ -4,12 +4,13 @@ API v2 для целей, вех и действий.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload, with_loader_criteria
 from typing import List, Optional
-from datetime import date, datetime, timedelta
-from .. import models, schemas, auth, database
+from datetime import date, datetime
+from .. import models, schemas, auth, database, action_logs, metrics
+from ..recurrence import count_weekday_occurrences
 
-router = APIRouter(prefix="/api/v2/goals", tags=["goals-v2"])
+router = APIRouter(prefix="/api/v2/goals", tags=["goals-v2"], route_class=database.SessionRoute)
 
 
 # ============================================
@@ -17,10 +18,46 @@ router = APIRouter(prefix="/api/v2/goals", tags=["goals-v2"])
 # ============================================
 
 
-def get_goal_or_404(db: Session, goal_id: int, user_id: int) -> models.Goal:
+def goal_tree_options(include_archived_milestones: bool = False) -> list:
+    """
+    Опции загрузки всего дерева цели фиксированным числом запросов.
+
+    goal -> milestones -> recurring_actions, milestones -> one_time_actions
+    грузятся через selectinload (по одному запросу на уровень вместо N+1).
+    Логи не грузятся — прогресс считается по счётчикам действий (app/counters.py).
+    Удалённые действия (и архивные вехи, если не запрошены) отсекаются в SQL.
+    """
+    milestones = selectinload(models.Goal.milestones)
+    options = [
+        milestones.selectinload(models.Milestone.recurring_actions),
+        milestones.selectinload(models.Milestone.one_time_actions),
+        with_loader_criteria(models.RecurringAction, models.RecurringAction.is_deleted == False),
+        with_loader_criteria(models.OneTimeAction, models.OneTimeAction.is_deleted == False),
+    ]
+    if not include_archived_milestones:
+        options.append(
+            with_loader_criteria(models.Milestone, models.Milestone.is_archived == False)
+        )
+    return options
+
+
+def milestone_tree_options() -> list:
+    """Опции загрузки действий одной вехи (удалённые отсекаются в SQL)."""
+    return [
+        selectinload(models.Milestone.recurring_actions),
+        selectinload(models.Milestone.one_time_actions),
+        with_loader_criteria(models.RecurringAction, models.RecurringAction.is_deleted == False),
+        with_loader_criteria(models.OneTimeAction, models.OneTimeAction.is_deleted == False),
+    ]
+
+
+def get_goal_or_404(
+    db: Session, goal_id: int, user_id: int, options: Optional[list] = None
+) -> models.Goal:
     """Получить цель или вернуть 404."""
     goal = (
         db.query(models.Goal)
+        .options(*(options or []))
         .filter(models.Goal.id == goal_id, models.Goal.user_id == user_id)
         .first()
     )
@@ -30,11 +67,12 @@ def get_goal_or_404(db: Session, goal_id: int, user_id: int) -> models.Goal:
 
 
 def get_milestone_or_404(
-    db: Session, milestone_id: int, user_id: int
+    db: Session, milestone_id: int, user_id: int, options: Optional[list] = None
 ) -> models.Milestone:
     """Получить веху или вернуть 404 (с проверкой владельца через goal)."""
     milestone = (
         db.query(models.Milestone)
+        .options(*(options or []))
         .join(models.Goal)
         .filter(models.Milestone.id == milestone_id, models.Goal.user_id == user_id)
         .first()
@@ -44,30 +82,29 @@ def get_milestone_or_404(
     return milestone
 
 
+def is_target_reached(completed_count: int, expected_count: int, target_percent: int) -> bool:
+    """completed / expected * 100 >= target_percent без погрешностей float."""
+    return expected_count > 0 and completed_count * 100 >= target_percent * expected_count
+
 
 def calculate_recurring_action_progress(
-    action: models.RecurringAction, start_date: date, end_date: date
+    action: models.RecurringAction,
+    start_date: date,
+    end_date: date,
+    completed_count: int,
 ) -> dict:
     """
     Рассчитать прогресс регулярного действия.
 
+    completed_count — число выполнений за период (RecurringAction.completed_count).
+
     Возвращает:
     - expected_count: сколько раз должно быть выполнено (за весь период)
     - completed_count: сколько раз выполнено
     - current_percent: текущий процент (completed/expected * 100)
     - is_target_reached: current_percent >= target_percent
     """
-    total_expected = 0
-    upper_bound = end_date
-    current = start_date
-    while current <= upper_bound:
-        if (current.weekday() + 1) in action.weekdays:
-            total_expected += 1
-        current += timedelta(days=1)
-
-    completed_count = sum(
-        1 for log in action.logs if log.completed and start_date <= log.date <= end_date
-    )
+    total_expected = count_weekday_occurrences(start_date, end_date, action.weekdays)
 
     if total_expected == 0:
         current_percent = 0.0
@@ -78,21 +115,30 @@ def calculate_recurring_action_progress(
         "expected_count": total_expected,
         "completed_count": completed_count,
         "current_percent": round(current_percent, 1),
-        "is_target_reached": current_percent >= action.target_percent,
+        # Целочисленное сравнение — то же условие, что и в sweeper.finalize_expired_actions
+        "is_target_reached": is_target_reached(completed_count, total_expected, action.target_percent),
         "is_period_over": end_date <= date.today(),
     }
 
 
-def calculate_milestone_progress(milestone: models.Milestone) -> dict:
+@metrics.PROGRESS_SECONDS.labels("milestone").time()
+def calculate_milestone_progress(
+    milestone: models.Milestone, progress: Optional["ProgressContext"] = None
+) -> dict:
     """
     Рассчитать общий прогресс вехи (игнорируя удалённые действия).
 
+    Выполнения берутся из счётчиков действий (RecurringAction.completed_count).
+    progress — контекст запроса: прогресс действий берётся из него
+    (и считается в нём один раз).
+
     Возвращает dict:
     - progress: float — средний процент выполнения по всем действиям
     - actions_completed_count: int — кол-во действий, достигших цели
     - actions_total_count: int — общее кол-во активных действий
     - all_actions_reached_target: bool — все действия достигли target_percent
     """
+    progress = progress or ProgressContext()
     total_weight = 0
     total_progress = 0.0
     actions_completed = 0
@@ -101,11 +147,7 @@ def calculate_milestone_progress(milestone: models.Milestone) -> dict:
     for action in milestone.recurring_actions:
         if action.is_deleted:
             continue
-        effective_start = action.start_date or milestone.start_date
-        effective_end = action.end_date or milestone.end_date
-        progress_info = calculate_recurring_action_progress(
-            action, effective_start, effective_end
-        )
+        progress_info = progress.action(action, milestone)
         total_weight += 1
         total_progress += progress_info["current_percent"]
         # Действие считается завершённым только если период закончился И target достигнут
@@ -131,89 +173,136 @@ def calculate_milestone_progress(milestone: models.Milestone) -> dict:
     }
 
 
-def calculate_goal_progress(goal: models.Goal) -> tuple[float, bool]:
-    """Рассчитать общий прогресс цели и статус завершения (игнорируя архивные вехи)."""
+def calculate_goal_progress(
+    goal: models.Goal, progress: Optional["ProgressContext"] = None
+) -> tuple[float, bool]:
+    """
+    Рассчитать общий прогресс цели и статус завершения (игнорируя архивные вехи).
+
+    Метрика progress_compute_seconds{level="goal"} — только агрегация по готовым
+    вехам: расчёт самих вех уже наблюдается с level="milestone".
+    """
+    progress = progress or ProgressContext()
     active_milestones = [ms for ms in goal.milestones if not ms.is_archived]
+    milestone_infos = [(ms, progress.milestone(ms)) for ms in active_milestones]
 
-    if not active_milestones:
-        return 0.0, False
+    with metrics.PROGRESS_SECONDS.labels("goal").time():
+        if not milestone_infos:
+            return 0.0, False
 
-    total_progress = 0.0
-    all_completed = True
+        total_progress = 0.0
+        all_completed = True
+
+        for milestone, ms_info in milestone_infos:
+            total_progress += ms_info["progress"]
+
+            # Веха завершена когда ВСЕ действия достигли своего target_percent
+            if not ms_info["all_actions_reached_target"] and not milestone.is_closed:
+                all_completed = False
 
-    for milestone in active_milestones:
-        ms_info = calculate_milestone_progress(milestone)
-        total_progress += ms_info["progress"]
+        avg_progress = total_progress / len(milestone_infos)
+        return avg_progress, all_completed
 
-        # Веха завершена когда ВСЕ действия достигли своего target_percent
-        if not ms_info["all_actions_reached_target"] and not milestone.is_closed:
-            all_completed = False
 
-    avg_progress = total_progress / len(active_milestones)
-    return avg_progress, all_completed
+class ProgressContext:
+    """
+    Прогресс действий, вех и целей в пределах одного запроса.
+
+    Каждое действие, веха и цель считаются один раз: построители ответов,
+    calculate_goal_progress и calculate_milestone_progress берут готовый
+    результат. Контекст создаётся после записи — прогресс отражает состояние
+    на момент первого обращения (после изменений — новый контекст или forget).
+    """
+
+    def __init__(self):
+        self._actions: dict[int, dict] = {}
+        self._milestones: dict[int, dict] = {}
+        self._goals: dict[int, tuple[float, bool]] = {}
+
+    def action(self, action: models.RecurringAction, milestone: Optional[models.Milestone] = None) -> dict:
+        """Прогресс регулярного действия за effective-период."""
+        info = self._actions.get(action.id)
+        if info is None:
+            milestone = milestone or action.milestone
+            info = calculate_recurring_action_progress(
+                action,
+                action.start_date or milestone.start_date,
+                action.end_date or milestone.end_date,
+                action.completed_count,
+            )
+            self._actions[action.id] = info
+        return info
+
+    def milestone(self, milestone: models.Milestone) -> dict:
+        """Прогресс вехи (calculate_milestone_progress)."""
+        info = self._milestones.get(milestone.id)
+        if info is None:
+            info = self._milestones[milestone.id] = calculate_milestone_progress(milestone, progress=self)
+        return info
+
+    def goal(self, goal: models.Goal) -> tuple[float, bool]:
+        """Прогресс цели и статус завершения (calculate_goal_progress)."""
+        info = self._goals.get(goal.id)
+        if info is None:
+            info = self._goals[goal.id] = calculate_goal_progress(goal, progress=self)
+        return info
+
+    def set_action(self, action: models.RecurringAction, info: dict) -> None:
+        """Запомнить уже посчитанный прогресс действия (recalculate_action_completion)."""
+        self._actions[action.id] = info
+
+    def forget(self, milestone: models.Milestone) -> None:
+        """Сбросить веху и её действия (после изменения их данных)."""
+        self._milestones.pop(milestone.id, None)
+        self._goals.pop(milestone.goal_id, None)
+        for action in milestone.recurring_actions:
+            self._actions.pop(action.id, None)
+
 
+def recalculate_action_completion(
+    action: models.RecurringAction, progress: Optional[ProgressContext] = None
+) -> dict:
+    """
+    Пересчитать is_completed для действия на основе текущего прогресса.
 
-def recalculate_action_completion(action: models.RecurringAction) -> dict:
-    """Пересчитать is_completed для действия на основе текущего прогресса."""
+    Счётчики действия обновляются при flush — изменения логов и периода
+    должны быть сброшены в БД до вызова. С progress — результат
+    запоминается в контексте запроса.
+    """
     milestone = action.milestone
     effective_start = action.start_date or milestone.start_date
     effective_end = action.end_date or milestone.end_date
     progress_info = calculate_recurring_action_progress(
-        action, effective_start, effective_end
+        action, effective_start, effective_end, action.completed_count
     )
     # is_completed = True только когда период завершён И цель достигнута
     today = date.today()
     action.is_completed = (effective_end <= today) and progress_info["is_target_reached"]
+    if progress is not None:
+        progress.set_action(action, progress_info)
     return progress_info
 
 
-def _recalculate_expired_actions(db: Session, milestones: list) -> bool:
-    """
-    Пересчитать is_completed для всех recurring actions с истёкшим периодом.
-
-    Оптимизация: пересчитываем только действия, у которых
-    effective_end <= today AND is_completed == False (потенциально незакрытые).
-
-    Возвращает True, если были изменения в БД.
-    """
-    today = date.today()
-    changed = False
-
-    for milestone in milestones:
-        for action in milestone.recurring_actions:
-            if action.is_deleted:
-                continue
-            # Пересчитываем только потенциально незакрытые действия с истёкшим периодом
-            effective_end = action.end_date or milestone.end_date
-            if effective_end <= today and not action.is_completed:
-                recalculate_action_completion(action)
-                if action.is_completed:
-                    changed = True
-
-    if changed:
-        db.flush()
-
-    return changed
-
-
 def _action_to_response(
-    action: models.RecurringAction, progress_info: dict = None
+    action: models.RecurringAction,
+    progress_info: dict = None,
+    progress: Optional[ProgressContext] = None,
 ) -> schemas.RecurringActionResponse:
     """Преобразовать модель действия в response-схему."""
     milestone = action.milestone
     effective_start = action.start_date or milestone.start_date
     effective_end = action.end_date or milestone.end_date
     if progress_info is None:
-        progress_info = calculate_recurring_action_progress(
-            action, effective_start, effective_end
-        )
+        progress_info = (progress or ProgressContext()).action(action, milestone)
     return schemas.RecurringActionResponse(
         id=action.id,
         milestone_id=action.milestone_id,
         title=action.title,
         weekdays=action.weekdays,
         target_percent=action.target_percent,
-        is_completed=action.is_completed,
+        # Финализация в БД — задача sweeper; ответ сразу отражает истёкший период
+        is_completed=action.is_completed
+        or (progress_info["is_period_over"] and progress_info["is_target_reached"]),
         current_percent=progress_info["current_percent"],
         is_target_reached=progress_info["is_target_reached"],
         expected_count=progress_info["expected_count"],
@@ -226,9 +315,14 @@ def _action_to_response(
     )
 
 
-def _goal_to_response(goal: models.Goal, include_archived_milestones: bool = False) -> schemas.GoalV2Response:
+def _goal_to_response(
+    goal: models.Goal,
+    include_archived_milestones: bool = False,
+    progress: Optional[ProgressContext] = None,
+) -> schemas.GoalV2Response:
     """Преобразовать модель цели в response-схему."""
-    progress, is_completed = calculate_goal_progress(goal)
+    progress = progress or ProgressContext()
+    goal_progress, is_completed = progress.goal(goal)
 
     milestones = goal.milestones
     if not include_archived_milestones:
@@ -241,8 +335,8 @@ def _goal_to_response(goal: models.Goal, include_archived_milestones: bool = Fal
         start_date=goal.start_date,
         end_date=goal.end_date,
         created_at=goal.created_at,
-        milestones=[_milestone_to_response(ms) for ms in milestones],
-        progress=progress,
+        milestones=[_milestone_to_response(ms, progress) for ms in milestones],
+        progress=goal_progress,
         is_completed=is_completed,
         is_archived=goal.is_archived,
         archived_at=goal.archived_at,
@@ -260,7 +354,7 @@ def _goal_to_response(goal: models.Goal, include_archived_milestones: bool = Fal
 def create_goal(
     goal_data: schemas.GoalV2Create,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Создать новую цель с вехами."""
     # Создаём цель
@@ -319,12 +413,16 @@ def create_goal(
 def list_goals(
     include_archived: bool = Query(False, description="Включить архивные цели"),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Получить список всех целей пользователя."""
-    query = db.query(models.Goal).filter(
-        models.Goal.user_id == current_user.id,
-        models.Goal.start_date.isnot(None),  # Только цели v2 (с датами)
+    query = (
+        db.query(models.Goal)
+        .options(*goal_tree_options(include_archived_milestones=include_archived))
+        .filter(
+            models.Goal.user_id == current_user.id,
+            models.Goal.start_date.isnot(None),  # Только цели v2 (с датами)
+        )
     )
 
     if not include_archived:
@@ -332,27 +430,21 @@ def list_goals(
 
     goals = query.all()
 
-    # Автопересчёт is_completed для действий с истёкшим периодом
-    any_changed = False
-    for goal in goals:
-        if _recalculate_expired_actions(db, goal.milestones):
-            any_changed = True
-    if any_changed:
-        db.commit()
-
-    return [_goal_to_response(goal, include_archived_milestones=include_archived) for goal in goals]
+    progress = ProgressContext()
+    return [
+        _goal_to_response(goal, include_archived_milestones=include_archived, progress=progress)
+        for goal in goals
+    ]
 
 
 @router.get("/{goal_id}", response_model=schemas.GoalV2Response)
 def get_goal(
     goal_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Получить цель по ID."""
-    goal = get_goal_or_404(db, goal_id, current_user.id)
-    if _recalculate_expired_actions(db, goal.milestones):
-        db.commit()
+    goal = get_goal_or_404(db, goal_id, current_user.id, goal_tree_options())
     return _goal_to_response(goal)
 
 
@@ -361,7 +453,7 @@ def update_goal(
     goal_id: int,
     goal_data: schemas.GoalV2Update,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Обновить цель (partial update)."""
     goal = get_goal_or_404(db, goal_id, current_user.id)
@@ -389,7 +481,7 @@ def update_goal(
 def delete_goal(
     goal_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Архивировать цель (soft delete)."""
     goal = get_goal_or_404(db, goal_id, current_user.id)
@@ -402,7 +494,7 @@ def delete_goal(
 def restore_goal(
     goal_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Восстановить архивную цель."""
     goal = (
@@ -428,15 +520,18 @@ def restore_goal(
 # ============================================
 
 
-def _milestone_to_response(milestone: models.Milestone) -> schemas.MilestoneResponse:
+def _milestone_to_response(
+    milestone: models.Milestone, progress: Optional[ProgressContext] = None
+) -> schemas.MilestoneResponse:
     """Преобразовать модель вехи в response-схему."""
-    ms_info = calculate_milestone_progress(milestone)
+    progress = progress or ProgressContext()
+    ms_info = progress.milestone(milestone)
 
     # Фильтруем удалённые действия
     active_recurring = [ra for ra in milestone.recurring_actions if not ra.is_deleted]
     active_onetime = [ota for ota in milestone.one_time_actions if not ota.is_deleted]
 
-    recurring_responses = [_action_to_response(ra) for ra in active_recurring]
+    recurring_responses = [_action_to_response(ra, progress=progress) for ra in active_recurring]
 
     return schemas.MilestoneResponse(
         id=milestone.id,
@@ -479,7 +574,7 @@ def create_milestone(
     goal_id: int,
     milestone_data: schemas.MilestoneCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Создать веху для цели."""
     get_goal_or_404(db, goal_id, current_user.id)
@@ -525,12 +620,12 @@ def create_milestone(
 def list_milestones(
     goal_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Получить список вех цели."""
-    goal = get_goal_or_404(db, goal_id, current_user.id)
-    if _recalculate_expired_actions(db, goal.milestones):
-        db.commit()
+    goal = get_goal_or_404(
+        db, goal_id, current_user.id, goal_tree_options(include_archived_milestones=True)
+    )
     return [_milestone_to_response(ms) for ms in goal.milestones]
 
 
@@ -538,12 +633,10 @@ def list_milestones(
 def get_milestone(
     milestone_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Получить веху по ID."""
-    milestone = get_milestone_or_404(db, milestone_id, current_user.id)
-    if _recalculate_expired_actions(db, [milestone]):
-        db.commit()
+    milestone = get_milestone_or_404(db, milestone_id, current_user.id, milestone_tree_options())
     return _milestone_to_response(milestone)
 
 
@@ -552,7 +645,7 @@ def update_milestone(
     milestone_id: int,
     milestone_data: schemas.MilestoneUpdate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Обновить веху."""
     milestone = get_milestone_or_404(db, milestone_id, current_user.id)
@@ -579,7 +672,7 @@ def update_milestone(
 def delete_milestone(
     milestone_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Архивировать веху (soft delete)."""
     milestone = get_milestone_or_404(db, milestone_id, current_user.id)
@@ -593,7 +686,7 @@ def close_milestone(
     milestone_id: int,
     close_data: schemas.MilestoneCloseAction,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """
     Закрыть веху с выбором действия.
@@ -641,21 +734,23 @@ def bulk_update_target_percent(
     milestone_id: int,
     data: schemas.BulkTargetPercentUpdate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Обновить target_percent для ВСЕХ регулярных действий вехи."""
     milestone = get_milestone_or_404(db, milestone_id, current_user.id)
 
+    # Прогресс действий, посчитанный при пересчёте, переиспользуется в ответе
+    progress = ProgressContext()
     for action in milestone.recurring_actions:
         if action.is_deleted:
             continue
         action.target_percent = data.target_percent
-        recalculate_action_completion(action)
+        recalculate_action_completion(action, progress)
 
     db.commit()
     db.refresh(milestone)
 
-    return _milestone_to_response(milestone)
+    return _milestone_to_response(milestone, progress)
 
 
 @router.put("/milestones/{milestone_id}/complete", response_model=schemas.MilestoneResponse)
@@ -663,7 +758,7 @@ def complete_milestone(
     milestone_id: int,
     data: schemas.MilestoneComplete,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Принудительно завершить веху (установить is_closed=True)."""
     milestone = get_milestone_or_404(db, milestone_id, current_user.id)
@@ -705,7 +800,7 @@ def create_recurring_action(
     milestone_id: int,
     action_data: schemas.RecurringActionCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Создать регулярное действие."""
     milestone = get_milestone_or_404(db, milestone_id, current_user.id)
@@ -735,7 +830,7 @@ def create_recurring_action(
 def get_recurring_action(
     action_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Получить регулярное действие по ID с прогрессом."""
     action = (
@@ -761,7 +856,7 @@ def update_recurring_action(
     action_id: int,
     action_data: schemas.RecurringActionUpdate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Обновить регулярное действие (title, weekdays)."""
     action = (
@@ -798,7 +893,9 @@ def update_recurring_action(
     if dates_changed:
         _validate_action_dates(action.start_date, action.end_date, action.milestone)
 
-    # Пересчитываем is_completed после любого изменения (включая target_percent)
+    # Пересчитываем is_completed после любого изменения (включая target_percent);
+    # flush обновляет счётчики под новый период/weekdays
+    db.flush()
     progress_info = recalculate_action_completion(action)
 
     db.commit()
@@ -811,7 +908,7 @@ def update_recurring_action(
 def delete_recurring_action(
     action_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Удалить регулярное действие (soft delete)."""
     action = (
@@ -844,7 +941,7 @@ def delete_recurring_action(
 def recalculate_recurring_action(
     action_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Пересчитать current_percent и is_completed для регулярного действия."""
     action = (
@@ -883,7 +980,7 @@ def log_recurring_action(
     action_id: int,
     log_data: schemas.RecurringActionLogCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Записать выполнение регулярного действия."""
     action = (
@@ -900,35 +997,11 @@ def log_recurring_action(
     if not action:
         raise HTTPException(status_code=404, detail="Recurring action not found")
 
-    # Проверяем что запись на эту дату ещё не существует
-    existing = (
-        db.query(models.RecurringActionLog)
-        .filter(
-            models.RecurringActionLog.recurring_action_id == action_id,
-            models.RecurringActionLog.date == log_data.date,
-        )
-        .first()
-    )
-
-    if existing:
-        # Обновляем существующую запись
-        existing.completed = log_data.completed
-        # Автопересчёт is_completed действия
-        recalculate_action_completion(action)
-        db.commit()
-        db.refresh(existing)
-        return existing
-
-    # Создаём новую запись
-    log = models.RecurringActionLog(
-        recurring_action_id=action_id, date=log_data.date, completed=log_data.completed
-    )
-    db.add(log)
-    db.flush()
+    # Один upsert вместо SELECT + INSERT/UPDATE; счётчик обновляется там же
+    log = action_logs.upsert_log(db, action, log_data.date, log_data.completed)
     # Автопересчёт is_completed действия
     recalculate_action_completion(action)
     db.commit()
-    db.refresh(log)
 
     return log
 
@@ -947,7 +1020,7 @@ def create_one_time_action(
     milestone_id: int,
     action_data: schemas.OneTimeActionCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Создать однократное действие."""
     get_milestone_or_404(db, milestone_id, current_user.id)
@@ -971,7 +1044,7 @@ def update_one_time_action(
     action_id: int,
     action_data: schemas.OneTimeActionUpdate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Обновить однократное действие."""
     action = (
@@ -1019,7 +1092,7 @@ def update_one_time_action(
 def delete_one_time_action(
     action_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Удалить однократное действие (soft delete)."""
     action = (
@@ -1044,30 +1117,27 @@ def delete_one_time_action(
 # ============================================
 
 
-@router.get("/{goal_id}/progress")
+@router.get("/{goal_id}/progress", response_model=schemas.GoalProgressResponse)
 def get_goal_progress(
     goal_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Получить детальный прогресс цели."""
-    goal = get_goal_or_404(db, goal_id, current_user.id)
-    if _recalculate_expired_actions(db, goal.milestones):
-        db.commit()
+    goal = get_goal_or_404(
+        db, goal_id, current_user.id, goal_tree_options(include_archived_milestones=True)
+    )
 
+    progress = ProgressContext()
     milestones_progress = []
     for ms in goal.milestones:
-        ms_info = calculate_milestone_progress(ms)
+        ms_info = progress.milestone(ms)
 
         recurring_actions_progress = []
         for ra in ms.recurring_actions:
             if ra.is_deleted:
                 continue
-            eff_start = ra.start_date or ms.start_date
-            eff_end = ra.end_date or ms.end_date
-            progress_info = calculate_recurring_action_progress(
-                ra, eff_start, eff_end
-            )
+            progress_info = progress.action(ra, ms)
             recurring_actions_progress.append({
                 "id": ra.id,
                 "title": ra.title,
@@ -1083,7 +1153,7 @@ def get_goal_progress(
                 "id": ota.id,
                 "title": ota.title,
                 "completed": ota.completed,
-                "deadline": ota.deadline.isoformat(),
+                "deadline": ota.deadline,
             }
             for ota in ms.one_time_actions
             if not ota.is_deleted
@@ -1103,7 +1173,7 @@ def get_goal_progress(
             }
         )
 
-    overall_progress, is_completed = calculate_goal_progress(goal)
+    overall_progress, is_completed = progress.goal(goal)
 
     return {
         "goal_id": goal_id,
@@ -3,14 +3,22 @@ API для задач на странице "Ближайшие дни" (003-upc
 Объединяет RegularAction и OneTimeAction в единый TaskView.
 """
 
+import heapq
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, contains_eager, selectinload, with_loader_criteria
 from datetime import date, datetime, timedelta
-from typing import List
-from .. import models, schemas, auth, database
-from .goals_v2 import calculate_milestone_progress, recalculate_action_completion, calculate_recurring_action_progress
+from typing import Iterator, List, NamedTuple
+from .. import models, schemas, auth, database, action_logs
+from ..recurrence import ALL_WEEKDAYS_MASK, iter_weekday_occurrences, range_weekday_mask
+from .goals_v2 import ProgressContext, recalculate_action_completion
 
-router = APIRouter(prefix="/api/tasks", tags=["tasks"])
+router = APIRouter(prefix="/api/tasks", tags=["tasks"], route_class=database.SessionRoute)
+
+# Потоковый /range/stream: максимальный диапазон и размер окна загрузки (дни)
+STREAM_MAX_DAYS = 366
+STREAM_WINDOW_DAYS = 31
 
 
 # ============================================
@@ -43,13 +51,45 @@ def _verify_milestone_ownership(db: Session, milestone_id: int, user_id: int) ->
     return milestone
 
 
-def _build_recurring_tasks(
-    db: Session, user_id: int, start_date: date, end_date: date
-) -> List[schemas.TaskView]:
-    """Собрать регулярные задачи за диапазон дат."""
-    milestones = _get_user_milestones_query(db, user_id).all()
-    tasks = []
+class _RecurringPlan(NamedTuple):
+    """Регулярное действие в диапазоне запроса: всё, что нужно для TaskView, без ORM."""
+
+    action_id: int
+    title: str
+    weekdays: List[int]
+    goal_id: int
+    goal_title: str
+    milestone_id: int
+    milestone_title: str
+    start_date: date  # пересечение effective-периода и диапазона запроса
+    end_date: date
+    target_percent: int
+    progress: dict
 
+
+def _load_recurring_plans(
+    db: Session, user_id: int, start_date: date, end_date: date
+) -> List[_RecurringPlan]:
+    """Регулярные действия, активные в диапазоне дат (прогресс — по счётчикам действия)."""
+    action_criteria = models.RecurringAction.is_deleted == False
+    weekday_mask = range_weekday_mask(start_date, end_date)
+    if weekday_mask != ALL_WEEKDAYS_MASK:
+        # Диапазон короче недели: действия без его дней недели не загружаются
+        action_criteria = and_(action_criteria, models.RecurringAction.active_on(weekday_mask))
+    # Вехи, пересекающиеся с диапазоном, и их действия — пакетно; логи грузятся отдельно
+    milestones = (
+        _get_user_milestones_query(db, user_id)
+        .filter(models.Milestone.start_date <= end_date, models.Milestone.end_date >= start_date)
+        .options(
+            contains_eager(models.Milestone.goal),
+            selectinload(models.Milestone.recurring_actions),
+            with_loader_criteria(models.RecurringAction, action_criteria),
+        )
+        .populate_existing()
+        .all()
+    )
+    progress = ProgressContext()
+    plans = []
     for milestone in milestones:
         for action in milestone.recurring_actions:
             if action.is_deleted:
@@ -57,44 +97,95 @@ def _build_recurring_tasks(
             # Effective period действия
             effective_start = action.start_date or milestone.start_date
             effective_end = action.end_date or milestone.end_date
-            # Рассчитываем прогресс действия один раз
-            progress_info = calculate_recurring_action_progress(
-                action, effective_start, effective_end
-            )
-            # Создаём лог-маппинг: date -> log
-            log_by_date = {log.date: log for log in action.logs}
-
-            # Итерируем по дням диапазона (пересечение запроса и effective period)
             range_start = max(start_date, effective_start)
             range_end = min(end_date, effective_end)
-            current = range_start
-            while current <= range_end:
-                # weekday() возвращает 0-6 (Mon-Sun), наши weekdays это 1-7
-                if (current.weekday() + 1) in action.weekdays:
-                    log = log_by_date.get(current)
-                    tasks.append(
-                        schemas.TaskView(
-                            id=f"recurring-{action.id}-{current.isoformat()}",
-                            type="recurring",
-                            title=action.title,
-                            date=current,
-                            goal_id=milestone.goal_id,
-                            goal_title=milestone.goal.title,
-                            milestone_id=milestone.id,
-                            milestone_title=milestone.title,
-                            completed=log.completed if log else False,
-                            original_id=action.id,
-                            log_id=log.id if log else None,
-                            target_percent=action.target_percent,
-                            current_percent=progress_info["current_percent"],
-                            is_target_reached=progress_info["is_target_reached"],
-                            completed_count=progress_info["completed_count"],
-                            expected_count=progress_info["expected_count"],
-                        )
-                    )
-                current += timedelta(days=1)
+            if range_start > range_end:
+                continue
+            plans.append(_RecurringPlan(
+                action_id=action.id,
+                title=action.title,
+                weekdays=action.weekdays,
+                goal_id=milestone.goal_id,
+                goal_title=milestone.goal.title,
+                milestone_id=milestone.id,
+                milestone_title=milestone.title,
+                start_date=range_start,
+                end_date=range_end,
+                target_percent=action.target_percent,
+                progress=progress.action(action, milestone),
+            ))
+    return plans
+
+
+def _load_logs(
+    db: Session, action_ids: List[int], start_date: date, end_date: date
+) -> dict[tuple[int, date], tuple[int, bool]]:
+    """(action_id, date) -> (log_id, completed) за диапазон — только нужные колонки."""
+    if not action_ids:
+        return {}
+    log = models.RecurringActionLog
+    rows = db.execute(
+        select(log.recurring_action_id, log.date, log.id, log.completed).where(
+            log.recurring_action_id.in_(action_ids),
+            log.date >= start_date,
+            log.date <= end_date,
+        )
+    )
+    return {(action_id, day): (log_id, completed) for action_id, day, log_id, completed in rows}
+
+
+def _iter_recurring_tasks(
+    plan: _RecurringPlan, start_date: date, end_date: date, logs: dict
+) -> Iterator[schemas.TaskView]:
+    """Задачи одного действия в порядке дат (перебираются только его дни недели)."""
+    for current in iter_weekday_occurrences(
+        max(start_date, plan.start_date), min(end_date, plan.end_date), plan.weekdays
+    ):
+        log_id, completed = logs.get((plan.action_id, current), (None, False))
+        yield schemas.TaskView(
+            id=f"recurring-{plan.action_id}-{current.isoformat()}",
+            type="recurring",
+            title=plan.title,
+            date=current,
+            goal_id=plan.goal_id,
+            goal_title=plan.goal_title,
+            milestone_id=plan.milestone_id,
+            milestone_title=plan.milestone_title,
+            completed=completed,
+            original_id=plan.action_id,
+            log_id=log_id,
+            target_percent=plan.target_percent,
+            current_percent=plan.progress["current_percent"],
+            is_target_reached=plan.progress["is_target_reached"],
+            completed_count=plan.progress["completed_count"],
+            expected_count=plan.progress["expected_count"],
+        )
+
+
+def _task_order(task: schemas.TaskView) -> tuple:
+    """Порядок задач: дата, тип, название; id — для однозначности."""
+    return (task.date, task.type, task.title, task.id)
 
-    return tasks
+
+def _merge_tasks(
+    db: Session,
+    user_id: int,
+    plans: List[_RecurringPlan],
+    start_date: date,
+    end_date: date,
+) -> Iterator[schemas.TaskView]:
+    """
+    Задачи за диапазон в порядке _task_order.
+
+    Каждое регулярное действие — уже упорядоченный по датам поток, однократные
+    сортируются отдельно; heapq.merge сливает потоки, не собирая и не сортируя
+    все задачи диапазона.
+    """
+    plans = [plan for plan in plans if plan.start_date <= end_date and plan.end_date >= start_date]
+    logs = _load_logs(db, [plan.action_id for plan in plans], start_date, end_date)
+    onetime = sorted(_build_onetime_tasks(db, user_id, start_date, end_date), key=_task_order)
+    streams = [_iter_recurring_tasks(plan, start_date, end_date, logs) for plan in plans]
+    return heapq.merge(*streams, onetime, key=_task_order)
 
 
 def _build_onetime_tasks(
@@ -113,6 +204,7 @@ def _build_onetime_tasks(
             models.OneTimeAction.deadline >= start_date,
             models.OneTimeAction.deadline <= end_date,
         )
+        .options(contains_eager(models.OneTimeAction.milestone).contains_eager(models.Milestone.goal))
         .all()
     )
 
@@ -147,34 +239,69 @@ def get_tasks_range(
     start_date: date = Query(..., description="Начальная дата (YYYY-MM-DD)"),
     end_date: date = Query(..., description="Конечная дата (YYYY-MM-DD)"),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Получить задачи за диапазон дат."""
     if end_date < start_date:
         raise HTTPException(status_code=400, detail="end_date must be >= start_date")
 
-    # Ограничиваем диапазон до 31 дня
+    # Ограничиваем диапазон до 31 дня (большие диапазоны — /range/stream)
     if (end_date - start_date).days > 31:
         raise HTTPException(status_code=400, detail="Date range must not exceed 31 days")
 
-    recurring = _build_recurring_tasks(db, current_user.id, start_date, end_date)
-    onetime = _build_onetime_tasks(db, current_user.id, start_date, end_date)
-
-    all_tasks = recurring + onetime
-    # Сортируем по дате, потом по типу (регулярные первые), потом по названию
-    all_tasks.sort(key=lambda t: (t.date, t.type, t.title))
+    plans = _load_recurring_plans(db, current_user.id, start_date, end_date)
+    all_tasks = list(_merge_tasks(db, current_user.id, plans, start_date, end_date))
 
     return schemas.TaskRangeResponse(tasks=all_tasks)
 
 
+@router.get("/range/stream")
+async def stream_tasks_range(
+    start_date: date = Query(..., description="Начальная дата (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Конечная дата (YYYY-MM-DD)"),
+    db: Session = Depends(database.get_db),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
+):
+    """
+    Задачи за диапазон до года — NDJSON (одна TaskView на строку) в порядке дат.
+
+    Диапазон обходится окнами по STREAM_WINDOW_DAYS: логи и однократные задачи
+    грузятся на окно, поэтому память не зависит от длины диапазона, а первые
+    строки уходят клиенту сразу после первого окна.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must be >= start_date")
+    if (end_date - start_date).days > STREAM_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must not exceed {STREAM_MAX_DAYS} days")
+
+    user_id = current_user.id
+    plans = await database.run_db(db, _load_recurring_plans, user_id, start_date, end_date)
+
+    def window_lines(session: Session, window_start: date, window_end: date) -> bytes:
+        tasks = _merge_tasks(session, user_id, plans, window_start, window_end)
+        return b"".join(task.model_dump_json().encode() + b"\n" for task in tasks)
+
+    async def lines():
+        window_start = start_date
+        while window_start <= end_date:
+            window_end = min(window_start + timedelta(days=STREAM_WINDOW_DAYS - 1), end_date)
+            chunk = await database.run_db(db, window_lines, window_start, window_end)
+            if chunk:
+                yield chunk
+            window_start = window_end + timedelta(days=1)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.put("/{task_id}/complete", response_model=schemas.TaskCompleteResponse)
 def complete_task(
     task_id: int,
     data: schemas.TaskComplete,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Отметить задачу выполненной/невыполненной."""
+    progress = ProgressContext()
     if data.type == "recurring":
         # Проверяем доступ к RegularAction через milestone -> goal -> user
         action = (
@@ -192,40 +319,15 @@ def complete_task(
 
         if data.log_id:
             # Обновляем существующий лог
-            log = (
-                db.query(models.RecurringActionLog)
-                .filter(
-                    models.RecurringActionLog.id == data.log_id,
-                    models.RecurringActionLog.recurring_action_id == task_id,
-                )
-                .first()
-            )
-            if not log:
+            log = action_logs.set_log_completed(db, action, data.log_id, data.completed)
+            if log is None:
                 raise HTTPException(status_code=404, detail="Log not found")
-            log.completed = data.completed
         else:
-            # Ищем лог на эту дату или создаём новый
-            log = (
-                db.query(models.RecurringActionLog)
-                .filter(
-                    models.RecurringActionLog.recurring_action_id == task_id,
-                    models.RecurringActionLog.date == data.date,
-                )
-                .first()
-            )
-            if log:
-                log.completed = data.completed
-            else:
-                log = models.RecurringActionLog(
-                    recurring_action_id=task_id,
-                    date=data.date,
-                    completed=data.completed,
-                )
-                db.add(log)
-
-        db.flush()
-        # Автопересчёт is_completed действия
-        recalculate_action_completion(action)
+            # Лог на эту дату: создаём или обновляем одним upsert
+            action_logs.upsert_log(db, action, data.date, data.completed)
+
+        # Автопересчёт is_completed действия (прогресс запоминается для ответа)
+        recalculate_action_completion(action, progress)
         milestone = action.milestone
 
     elif data.type == "one-time":
@@ -251,18 +353,13 @@ def complete_task(
 
     db.commit()
 
-    # Пересчитываем прогресс вехи
+    # Пересчитываем прогресс вехи; прогресс действия — из того же контекста
     db.refresh(milestone)
-    ms_info = calculate_milestone_progress(milestone)
+    ms_info = progress.milestone(milestone)
 
-    # Для recurring-задач — пересчитываем прогресс действия
     progress_fields = {}
     if data.type == "recurring":
-        effective_start = action.start_date or milestone.start_date
-        effective_end = action.end_date or milestone.end_date
-        progress_info = calculate_recurring_action_progress(
-            action, effective_start, effective_end
-        )
+        progress_info = progress.action(action, milestone)
         progress_fields = {
             "current_percent": progress_info["current_percent"],
             "completed_count": progress_info["completed_count"],
@@ -277,12 +374,101 @@ def complete_task(
     )
 
 
+@router.post("/complete-batch", response_model=schemas.TaskBatchCompleteResponse)
+def complete_tasks_batch(
+    data: schemas.TaskBatchComplete,
+    db: Session = Depends(database.get_db),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
+):
+    """
+    Отметить пачку задач (например, неделю привычек с Kanban) одним запросом.
+
+    Принадлежность всех действий проверяется одним запросом, логи пишутся одним
+    upsert, каждое действие и веха пересчитываются один раз.
+    """
+    recurring_ids = {item.id for item in data.items if item.type == "recurring"}
+    onetime_ids = {item.id for item in data.items if item.type == "one-time"}
+
+    # Вехи пользователя, содержащие запрошенные действия, вместе с действиями
+    milestones = (
+        db.query(models.Milestone)
+        .join(models.Goal)
+        .filter(
+            models.Goal.user_id == current_user.id,
+            or_(
+                models.Milestone.id.in_(
+                    select(models.RecurringAction.milestone_id).where(models.RecurringAction.id.in_(recurring_ids))
+                ),
+                models.Milestone.id.in_(
+                    select(models.OneTimeAction.milestone_id).where(models.OneTimeAction.id.in_(onetime_ids))
+                ),
+            ),
+        )
+        .options(
+            selectinload(models.Milestone.recurring_actions),
+            selectinload(models.Milestone.one_time_actions),
+        )
+        .all()
+    )
+    recurring = {
+        action.id: action for ms in milestones for action in ms.recurring_actions if action.id in recurring_ids
+    }
+    onetime = {
+        action.id: action for ms in milestones for action in ms.one_time_actions if action.id in onetime_ids
+    }
+    if len(recurring) != len(recurring_ids) or len(onetime) != len(onetime_ids):
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    before = ProgressContext()
+    progress_before = {ms.id: before.milestone(ms)["progress"] for ms in milestones}
+
+    action_logs.upsert_logs(
+        db,
+        recurring,
+        [(item.id, item.date, item.completed) for item in data.items if item.type == "recurring"],
+    )
+    now = datetime.utcnow()
+    for item in data.items:
+        if item.type == "one-time":
+            action = onetime[item.id]
+            action.completed = item.completed
+            action.completed_at = now if item.completed else None
+
+    # Каждое действие и веха — один раз (счётчики уже обновлены upsert'ом)
+    progress = ProgressContext()
+    actions_progress = []
+    for action in recurring.values():
+        progress_info = recalculate_action_completion(action, progress)
+        actions_progress.append(schemas.TaskBatchActionProgress(
+            id=action.id,
+            current_percent=progress_info["current_percent"],
+            completed_count=progress_info["completed_count"],
+            expected_count=progress_info["expected_count"],
+            is_target_reached=progress_info["is_target_reached"],
+        ))
+    milestones_progress = []
+    for ms in milestones:
+        ms_progress = progress.milestone(ms)["progress"]
+        milestones_progress.append(schemas.TaskBatchMilestoneProgress(
+            milestone_id=ms.id,
+            progress_before=progress_before[ms.id],
+            progress=ms_progress,
+            delta=round(ms_progress - progress_before[ms.id], 1),
+        ))
+
+    db.commit()
+
+    return schemas.TaskBatchCompleteResponse(
+        success=True, milestones=milestones_progress, actions=actions_progress
+    )
+
+
 @router.put("/{task_id}/reschedule")
 def reschedule_task(
     task_id: int,
     data: schemas.TaskReschedule,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Перенести задачу на другой день."""
     if data.new_date == data.old_date:
@@ -302,39 +488,13 @@ def reschedule_task(
         if not action:
             raise HTTPException(status_code=404, detail="Task not found")
 
-        if data.log_id:
-            # Переносим существующий лог на новую дату
-            log = (
-                db.query(models.RecurringActionLog)
-                .filter(
-                    models.RecurringActionLog.id == data.log_id,
-                    models.RecurringActionLog.recurring_action_id == task_id,
-                )
-                .first()
-            )
-            if not log:
-                raise HTTPException(status_code=404, detail="Log not found")
-            log.date = data.new_date
-        else:
-            # Ищем лог на старую дату
-            log = (
-                db.query(models.RecurringActionLog)
-                .filter(
-                    models.RecurringActionLog.recurring_action_id == task_id,
-                    models.RecurringActionLog.date == data.old_date,
-                )
-                .first()
-            )
-            if log:
-                log.date = data.new_date
-            else:
-                # Создаём лог на новую дату (невыполненный — просто перенос)
-                log = models.RecurringActionLog(
-                    recurring_action_id=task_id,
-                    date=data.new_date,
-                    completed=False,
-                )
-                db.add(log)
+        # Переносим лог (по log_id или со старой даты); без лога — создаём
+        # невыполненный лог на новую дату
+        log = action_logs.move_log(
+            db, action, data.new_date, log_id=data.log_id, old_date=data.old_date
+        )
+        if log is None:
+            raise HTTPException(status_code=404, detail="Log not found")
 
     elif data.type == "one-time":
         action = (
@@ -363,7 +523,7 @@ def reschedule_task(
 def create_task(
     data: schemas.TaskCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.CurrentUser = Depends(auth.get_current_user),
 ):
     """Создать новую задачу (регулярную или однократную)."""
     # Проверяем что веха принадлежит пользователю
@@ -4,10 +4,10 @@ from typing import List
 from .. import models, schemas, auth, database
 from datetime import datetime
 
-router = APIRouter(prefix="/todos", tags=["todos"])
+router = APIRouter(prefix="/todos", tags=["todos"], route_class=database.SessionRoute)
 
 @router.post("/", response_model=schemas.TodoResponse)
-def create_todo(todo: schemas.TodoCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_todo(todo: schemas.TodoCreate, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     new_todo = models.Todo(**todo.model_dump(), user_id=current_user.id)
     db.add(new_todo)
     db.commit()
@@ -15,18 +15,18 @@ def create_todo(todo: schemas.TodoCreate, db: Session = Depends(database.get_db)
     return new_todo
 
 @router.get("/", response_model=List[schemas.TodoResponse])
-def get_todos(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def get_todos(db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     return db.query(models.Todo).filter(models.Todo.user_id == current_user.id).all()
 
 @router.get("/{todo_id}", response_model=schemas.TodoResponse)
-def get_todo(todo_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def get_todo(todo_id: int, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     todo = db.query(models.Todo).filter(models.Todo.id == todo_id, models.Todo.user_id == current_user.id).first()
     if not todo:
         raise HTTPException(status_code=404, detail="Todo not found")
     return todo
 
 @router.put("/{todo_id}", response_model=schemas.TodoResponse)
-def update_todo(todo_id: int, todo_update: schemas.TodoUpdate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def update_todo(todo_id: int, todo_update: schemas.TodoUpdate, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     db_todo = db.query(models.Todo).filter(models.Todo.id == todo_id, models.Todo.user_id == current_user.id).first()
     if not db_todo:
         raise HTTPException(status_code=404, detail="Todo not found")
@@ -40,7 +40,7 @@ def update_todo(todo_id: int, todo_update: schemas.TodoUpdate, db: Session = Dep
     return db_todo
 
 @router.delete("/{todo_id}")
-def delete_todo(todo_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def delete_todo(todo_id: int, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     todo = db.query(models.Todo).filter(models.Todo.id == todo_id, models.Todo.user_id == current_user.id).first()
     if not todo:
         raise HTTPException(status_code=404, detail="Todo not found")
@@ -335,6 +335,51 @@ class GoalV2Response(GoalV2Base):
     model_config = ConfigDict(from_attributes=True)
 
 
+class GoalProgressAction(BaseModel):
+    """Прогресс регулярного действия в GET /api/v2/goals/{id}/progress."""
+
+    id: int
+    title: str
+    target_percent: int
+    current_percent: float
+    is_target_reached: bool
+    expected_count: int
+    completed_count: int
+
+
+class GoalProgressOneTimeAction(BaseModel):
+    """Статус однократного действия в GET /api/v2/goals/{id}/progress."""
+
+    id: int
+    title: str
+    completed: bool
+    deadline: date
+
+
+class GoalProgressMilestone(BaseModel):
+    """Прогресс вехи в GET /api/v2/goals/{id}/progress."""
+
+    id: int
+    title: str
+    progress: float
+    actions_completed_count: int
+    actions_total_count: int
+    all_actions_reached_target: bool
+    default_action_percent: int
+    recurring_actions: List[GoalProgressAction]
+    one_time_actions: List[GoalProgressOneTimeAction]
+
+
+class GoalProgressResponse(BaseModel):
+    """Ответ GET /api/v2/goals/{id}/progress."""
+
+    goal_id: int
+    title: str
+    overall_progress: float
+    is_completed: bool
+    milestones: List[GoalProgressMilestone]
+
+
 # ============================================
 # Схемы для страницы "Ближайшие дни" (003-upcoming-page)
 # ============================================
@@ -388,6 +433,48 @@ class TaskCompleteResponse(BaseModel):
     is_target_reached: Optional[bool] = None
 
 
+class TaskBatchItem(BaseModel):
+    """Элемент POST /api/tasks/complete-batch."""
+
+    type: Literal["recurring", "one-time"]
+    id: int  # ID RecurringAction или OneTimeAction
+    date: date
+    completed: bool
+
+
+class TaskBatchComplete(BaseModel):
+    """Тело POST /api/tasks/complete-batch."""
+
+    items: List[TaskBatchItem] = Field(min_length=1, max_length=500)
+
+
+class TaskBatchActionProgress(BaseModel):
+    """Прогресс регулярного действия после пакетной отметки."""
+
+    id: int
+    current_percent: float
+    completed_count: int
+    expected_count: int
+    is_target_reached: bool
+
+
+class TaskBatchMilestoneProgress(BaseModel):
+    """Изменение прогресса вехи после пакетной отметки."""
+
+    milestone_id: int
+    progress_before: float
+    progress: float
+    delta: float
+
+
+class TaskBatchCompleteResponse(BaseModel):
+    """Ответ POST /api/tasks/complete-batch."""
+
+    success: bool
+    milestones: List[TaskBatchMilestoneProgress]
+    actions: List[TaskBatchActionProgress]
+
+
 class TaskReschedule(BaseModel):
     """Тело PUT /api/tasks/{id}/reschedule."""
 
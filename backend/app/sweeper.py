@@ -0,0 +1,101 @@
+"""
+Фоновая финализация регулярных действий с истёкшим периодом.
+
+is_completed = True ставится, когда effective-период закончился
+(effective_end <= today) и target_percent достигнут. Раньше это делали
+GET-эндпоинты целей; теперь — периодическая задача и CLI, поэтому чтения
+остаются чистыми (без flush/commit и блокировок строк).
+
+Работает по всем пользователям пачками: кандидаты выбираются одним
+запросом по счётчикам действий (app/counters.py), затем один UPDATE на пачку.
+
+CLI: python -m app.sweeper
+"""
+
+import asyncio
+import logging
+import os
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Интервал запуска в процессе приложения (секунды); 0 — отключить
+SWEEP_INTERVAL_SECONDS = int(os.getenv("EXPIRED_ACTIONS_SWEEP_INTERVAL", "3600"))
+SWEEP_BATCH_SIZE = int(os.getenv("EXPIRED_ACTIONS_SWEEP_BATCH_SIZE", "1000"))
+
+
+def _expired_reached_ids_query(today: date, batch_size: int):
+    """ID незакрытых действий с истёкшим периодом, достигших target_percent."""
+    action = models.RecurringAction
+    milestone = models.Milestone
+    return (
+        select(action.id)
+        .join(milestone, milestone.id == action.milestone_id)
+        .where(
+            action.is_completed == False,
+            action.is_deleted == False,
+            func.coalesce(action.end_date, milestone.end_date) <= today,
+            action.expected_count > 0,
+            action.completed_count * 100 >= action.target_percent * action.expected_count,
+        )
+        .order_by(action.id)
+        .limit(batch_size)
+    )
+
+
+def finalize_expired_actions(
+    db: Session, today: Optional[date] = None, batch_size: int = SWEEP_BATCH_SIZE
+) -> int:
+    """
+    Проставить is_completed для всех действий с истёкшим периодом и достигнутой целью.
+
+    Каждая пачка коммитится отдельно. Возвращает число обновлённых действий.
+    """
+    today = today or date.today()
+    table = models.RecurringAction.__table__
+    total = 0
+    while True:
+        ids = db.execute(_expired_reached_ids_query(today, batch_size)).scalars().all()
+        if not ids:
+            break
+        db.execute(
+            update(table)
+            .where(table.c.id.in_(ids), table.c.is_completed == False)
+            .values(is_completed=True)
+        )
+        db.commit()
+        total += len(ids)
+    return total
+
+
+def run_sweep() -> int:
+    """Один проход в собственной сессии (для периодической задачи и CLI)."""
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return finalize_expired_actions(db)
+    finally:
+        db.close()
+
+
+async def run_periodically(interval: int = SWEEP_INTERVAL_SECONDS) -> None:
+    """Периодически запускать run_sweep в пуле потоков (не блокируя event loop)."""
+    while True:
+        try:
+            updated = await asyncio.to_thread(run_sweep)
+            if updated:
+                logger.info("Finalized %d expired recurring actions", updated)
+        except Exception:
+            logger.exception("Expired actions sweep failed")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    print(f"Завершено действий: {run_sweep()}")
@@ -0,0 +1,157 @@
+"""
+Бенчмарк GET /api/calendar/month на «тяжёлом» пользователе.
+
+Сравнивает однопроходную агрегацию (app/routers/calendar.py) с прежним
+алгоритмом «дни × цели × вехи × действия × логи» и проверяет, что ответы совпадают.
+
+Запуск (из backend/):
+    python -m benchmarks.calendar_month [--goals 12] [--repeat 5]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import cache as response_cache, models, schemas
+from app.database import Base
+from app.routers import calendar
+
+
+def seed_heavy_user(db, goals: int = 12, milestones: int = 4, actions: int = 5) -> models.User:
+    """Пользователь с годом истории: ежедневные действия и логи почти на каждый день."""
+    user = models.User(email="heavy@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    start = date(2026, 1, 1)
+    for g in range(goals):
+        goal = models.Goal(
+            title=f"Goal {g}", user_id=user.id,
+            start_date=start, end_date=start + timedelta(days=364),
+        )
+        db.add(goal)
+        db.flush()
+        span = 365 // milestones
+        for m in range(milestones):
+            ms_start = start + timedelta(days=m * span)
+            milestone = models.Milestone(
+                goal_id=goal.id, title=f"Milestone {g}.{m}",
+                start_date=ms_start, end_date=ms_start + timedelta(days=span - 1),
+            )
+            db.add(milestone)
+            db.flush()
+            for a in range(actions):
+                action = models.RecurringAction(
+                    milestone_id=milestone.id, title=f"Action {a}",
+                    weekdays=[1, 2, 3, 4, 5, 6, 7] if a % 2 else [1, 3, 5],
+                )
+                db.add(action)
+                db.flush()
+                db.add_all(
+                    models.RecurringActionLog(
+                        recurring_action_id=action.id,
+                        date=ms_start + timedelta(days=d),
+                        completed=d % 3 != 0,
+                    )
+                    for d in range(span)
+                )
+                db.add(models.OneTimeAction(
+                    milestone_id=milestone.id, title=f"Once {a}",
+                    deadline=ms_start + timedelta(days=a * 7),
+                ))
+        db.commit()
+    return user
+
+
+def legacy_calendar_month(db, user, year: int, month: int) -> schemas.CalendarMonthResponse:
+    """Прежняя реализация: для каждого дня обходит все действия и все их логи."""
+    goals = calendar._get_user_goals(db, user.id)
+    color_map = calendar._build_goal_color_map(goals)
+    first_day, last_day = calendar._month_range(year, month)
+    days = []
+    current = first_day
+    while current <= last_day:
+        total = completed_total = 0
+        day_goals = []
+        milestone_title = None
+        for goal in goals:
+            if not calendar._is_goal_active_on_date(goal, current):
+                continue
+            has_tasks = False
+            for milestone in goal.milestones:
+                if milestone.is_archived:
+                    continue
+                if milestone.end_date == current and milestone_title is None:
+                    milestone_title = milestone.title
+                tasks = calendar._get_recurring_tasks_for_date(milestone, current)
+                tasks += calendar._get_onetime_tasks_for_date(milestone, current)
+                for _, completed in tasks:
+                    total += 1
+                    completed_total += completed
+                    has_tasks = True
+            if has_tasks:
+                day_goals.append(schemas.CalendarGoalBrief(
+                    id=goal.id, title=goal.title, color=color_map[goal.id],
+                ))
+        days.append(schemas.CalendarDayBrief(
+            date=current, tasks_total=total, tasks_completed=completed_total, goals=day_goals,
+            has_milestone=milestone_title is not None, milestone_title=milestone_title,
+        ))
+        current += timedelta(days=1)
+    return schemas.CalendarMonthResponse(year=year, month=month, days=days)
+
+
+def _best_time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--goals", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        with Session() as db:
+            user = seed_heavy_user(db, goals=args.goals)
+            user_id = user.id
+
+        def run_new():
+            with Session() as db:
+                # Обработчик отдаёт готовый JSON (кэш ответов) — кэш выключен на время замера
+                response = calendar.get_calendar_month(
+                    year=2026, month=6, goal_id=None, goal_ids=None, include_archived=False,
+                    db=db, current_user=db.get(models.User, user_id),
+                )
+                return schemas.CalendarMonthResponse.model_validate_json(response.body)
+
+        def run_legacy():
+            with Session() as db:
+                return legacy_calendar_month(db, db.get(models.User, user_id), 2026, 6)
+
+        saved_backend, response_cache.backend = response_cache.backend, None
+        try:
+            assert run_new() == run_legacy(), "ответы не совпадают"
+            new, legacy = _best_time(run_new, args.repeat), _best_time(run_legacy, args.repeat)
+        finally:
+            response_cache.backend = saved_backend
+
+    print(f"goals={args.goals} legacy={legacy * 1000:.1f}ms new={new * 1000:.1f}ms "
+          f"speedup={legacy / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
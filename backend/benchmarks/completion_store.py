@@ -0,0 +1,123 @@
+"""
+Бенчмарк чтения выполнений: строки RecurringActionLog против битовых карт
+по месяцам (app/completion_bitmap.py) на пользователе с годами ежедневных привычек.
+
+В режиме bitmap карты хранятся вместе с логами, поэтому размер таблиц (строки и байты:
+pg_total_relation_size в PostgreSQL, dbstat в SQLite) — цена кэша сверх логов.
+Скорость чтения:
+- count_history — выполненные за effective-период всех действий
+  (GROUP BY по логам / popcount по картам);
+- dates_history — все выполненные даты за историю (календарь на всю историю);
+- dates_month — выполненные даты за текущий месяц (GET /api/calendar/month).
+Ответы двух хранилищ сверяются.
+
+Запуск (из backend/):
+    python -m benchmarks.completion_store [--database-url URL] [--years 5] [--repeat 20]
+        [--goals 12] [--recurring 5] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app import completion_bitmap, counters, models
+from app.database import Base
+from app.routers import calendar
+from benchmarks.seed import add_size_arguments, seed_user, size_options
+from benchmarks.suite import _timings
+
+
+def _stores():
+    """Переключить режим хранилища на время замера: ("rows", "bitmap")."""
+    for store in ("rows", "bitmap"):
+        completion_bitmap.COMPLETION_STORE = store
+        yield store
+
+
+def _load_completed_counts(db, action_ids):
+    if completion_bitmap.enabled():
+        return completion_bitmap.load_completed_counts(db, action_ids)
+    return counters.load_completed_counts(db, action_ids)
+
+
+def run_benchmark(database_url: str, email: str, repeat: int = 20, warmup: int = 2) -> dict:
+    """Размер хранилищ и время чтения обоими способами для засеянного пользователя."""
+    engine = create_engine(database_url)
+    previous_store = completion_bitmap.COMPLETION_STORE
+    try:
+        with sessionmaker(bind=engine)() as db:
+            user_id = db.execute(select(models.User.id).where(models.User.email == email)).scalar_one()
+            action_ids = db.execute(
+                select(models.RecurringAction.id)
+                .join(models.Milestone)
+                .join(models.Goal)
+                .where(models.Goal.user_id == user_id)
+            ).scalars().all()
+            history_start, history_end = db.execute(
+                select(models.Goal.start_date, models.Goal.end_date).where(models.Goal.user_id == user_id).limit(1)
+            ).one()
+            today = date.today()
+            month_start, month_end = calendar._month_range(today.year, today.month)
+
+            cases = {
+                "count_history": lambda: _load_completed_counts(db, action_ids),
+                "dates_history": lambda: calendar._load_completed_dates(db, action_ids, history_start, history_end),
+                "dates_month": lambda: calendar._load_completed_dates(db, action_ids, month_start, month_end),
+            }
+            results = {}
+            answers = {}
+            for store in _stores():
+                for name, case in cases.items():
+                    answers[(store, name)] = case()
+                    results[f"{name}:{store}"] = _timings(case, repeat, warmup)
+            for name in cases:
+                if answers[("rows", name)] != answers[("bitmap", name)]:
+                    raise AssertionError(f"{name}: хранилища расходятся")
+            storage = completion_bitmap.storage_stats(db)
+    finally:
+        completion_bitmap.COMPLETION_STORE = previous_store
+        engine.dispose()
+    return {"actions": len(action_ids), "storage": storage, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="по умолчанию — временный SQLite")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", help="записать результаты в JSON")
+    add_size_arguments(parser)
+    parser.set_defaults(years=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(database_url)
+        Base.metadata.create_all(bind=engine)
+        email = f"habits-{int(time.time())}@example.com"
+        completion_bitmap.COMPLETION_STORE = "bitmap"  # seed_user строит карты вместе с логами
+        with sessionmaker(bind=engine)() as db:
+            seed_user(db, email, hashed_password="x", **size_options(args))
+        engine.dispose()
+
+        report = run_benchmark(database_url, email, repeat=args.repeat, warmup=args.warmup)
+
+    report["dataset"] = size_options(args)
+    for store, stats in report["storage"].items():
+        size = f"{stats['bytes'] / 1024:.0f} KiB" if stats["bytes"] is not None else "размер неизвестен"
+        print(f"{store:8} {stats['rows']:>9} строк  {size}")
+    for name, result in report["results"].items():
+        print(f"{name:22} median={result['median_ms']:.2f}ms p95={result['p95_ms']:.2f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
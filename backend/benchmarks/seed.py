@@ -0,0 +1,181 @@
+"""
+Генератор синтетических «тяжёлых» пользователей для бенчмарков.
+
+Каждый пользователь получает goals целей на всю историю (years лет назад
+и 90 дней вперёд от сегодня), по milestones вех подряд в каждой, по recurring
+регулярных и onetime разовых действий в каждой вехе и логи регулярных
+действий на каждый подходящий день истории. Данные детерминированы (--seed).
+
+Логи вставляются пачками (ORM bulk insert), счётчики прогресса действий
+пересчитываются после вставки одним UPDATE, истёкшие действия финализируются
+как в фоновом sweeper — состояние БД такое же, как после работы через API.
+
+Запуск (из backend/):
+    python -m benchmarks.seed --database-url sqlite:///./bench.db [--users 1] [--goals 12]
+        [--milestones 4] [--recurring 5] [--onetime 3] [--years 2] [--email-prefix heavy]
+"""
+
+import argparse
+import os
+import random
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import auth, completion_bitmap, counters, models, sweeper
+from app.database import Base
+
+# Наборы дней недели по кругу: ежедневно, будни, пн/ср/пт, вт/чт, выходные
+WEEKDAY_PATTERNS = [
+    [1, 2, 3, 4, 5, 6, 7],
+    [1, 2, 3, 4, 5],
+    [1, 3, 5],
+    [2, 4],
+    [6, 7],
+]
+COMPLETION_RATE = 0.8
+LOG_BATCH_SIZE = 5000
+BENCH_PASSWORD = "benchmark"
+
+
+def seed_user(
+    db: Session,
+    email: str,
+    goals: int = 12,
+    milestones: int = 4,
+    recurring: int = 5,
+    onetime: int = 3,
+    years: int = 2,
+    today: Optional[date] = None,
+    rng: Optional[random.Random] = None,
+    hashed_password: Optional[str] = None,
+) -> models.User:
+    """Создать пользователя с деревом целей и историей логов; коммитит по целям."""
+    today = today or date.today()
+    rng = rng or random.Random(0)
+    history_start = today - timedelta(days=365 * years)
+    history_end = today + timedelta(days=90)
+    span = ((history_end - history_start).days + 1) // milestones
+
+    user = models.User(
+        email=email,
+        hashed_password=hashed_password or auth.get_password_hash(BENCH_PASSWORD),
+    )
+    db.add(user)
+    db.commit()
+
+    for g in range(goals):
+        goal = models.Goal(
+            title=f"Goal {g}", user_id=user.id,
+            start_date=history_start, end_date=history_end,
+        )
+        db.add(goal)
+        db.flush()
+        action_ids = []
+        logs = []
+        for m in range(milestones):
+            ms_start = history_start + timedelta(days=m * span)
+            ms_end = history_end if m == milestones - 1 else ms_start + timedelta(days=span - 1)
+            milestone = models.Milestone(
+                goal_id=goal.id, title=f"Milestone {g}.{m}",
+                start_date=ms_start, end_date=ms_end,
+            )
+            db.add(milestone)
+            db.flush()
+            for a in range(recurring):
+                weekdays = WEEKDAY_PATTERNS[(g + a) % len(WEEKDAY_PATTERNS)]
+                action = models.RecurringAction(
+                    milestone_id=milestone.id, title=f"Action {g}.{m}.{a}", weekdays=weekdays,
+                )
+                db.add(action)
+                db.flush()
+                action_ids.append(action.id)
+                day = ms_start
+                while day <= min(ms_end, today):
+                    if day.isoweekday() in weekdays:
+                        logs.append({
+                            "recurring_action_id": action.id,
+                            "date": day,
+                            "completed": rng.random() < COMPLETION_RATE,
+                        })
+                    day += timedelta(days=1)
+            for a in range(onetime):
+                deadline = ms_start + timedelta(days=(a + 1) * span // (onetime + 1))
+                db.add(models.OneTimeAction(
+                    milestone_id=milestone.id, title=f"Once {g}.{m}.{a}", deadline=deadline,
+                    completed=deadline < today and rng.random() < COMPLETION_RATE,
+                ))
+        db.flush()
+
+        for start in range(0, len(logs), LOG_BATCH_SIZE):
+            db.execute(insert(models.RecurringActionLog), logs[start:start + LOG_BATCH_SIZE])
+        # bulk insert идёт мимо событий flush — счётчики и битовые карты пересчитываются явно
+        counters._recount_completed(db, action_ids)
+        if completion_bitmap.enabled():
+            completion_bitmap.rebuild_actions(db, action_ids)
+        db.commit()
+
+    sweeper.finalize_expired_actions(db, today)
+    return user
+
+
+def seed_users(
+    db: Session, users: int = 1, email_prefix: str = "heavy", seed: int = 42, **sizes
+) -> list[models.User]:
+    """users пользователей {email_prefix}{i}@example.com с одинаковыми размерами дерева."""
+    rng = random.Random(seed)
+    hashed_password = auth.get_password_hash(BENCH_PASSWORD)
+    return [
+        seed_user(db, f"{email_prefix}{i}@example.com", rng=rng, hashed_password=hashed_password, **sizes)
+        for i in range(users)
+    ]
+
+
+def add_size_arguments(parser: argparse.ArgumentParser) -> None:
+    """Параметры размера данных (общие для seed и suite)."""
+    parser.add_argument("--goals", type=int, default=12)
+    parser.add_argument("--milestones", type=int, default=4)
+    parser.add_argument("--recurring", type=int, default=5, help="регулярных действий на веху")
+    parser.add_argument("--onetime", type=int, default=3, help="разовых действий на веху")
+    parser.add_argument("--years", type=int, default=2, help="лет истории логов")
+
+
+def size_options(args: argparse.Namespace) -> dict:
+    return {
+        "goals": args.goals,
+        "milestones": args.milestones,
+        "recurring": args.recurring,
+        "onetime": args.onetime,
+        "years": args.years,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), required=not os.getenv("DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--email-prefix", default="heavy")
+    parser.add_argument("--seed", type=int, default=42)
+    add_size_arguments(parser)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        users = seed_users(
+            db, users=args.users, email_prefix=args.email_prefix, seed=args.seed, **size_options(args)
+        )
+        log_count = db.query(models.RecurringActionLog).join(models.RecurringAction).join(
+            models.Milestone
+        ).join(models.Goal).filter(models.Goal.user_id.in_([user.id for user in users])).count()
+        emails = [user.email for user in users]
+
+    print(f"users={len(emails)} logs={log_count} password={BENCH_PASSWORD!r}")
+    for email in emails:
+        print(email)
+
+
+if __name__ == "__main__":
+    main()
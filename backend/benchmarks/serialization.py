@@ -0,0 +1,158 @@
+"""
+Бенчмарк сериализации ответов на «тяжёлом» пользователе.
+
+Для дерева целей (GET /api/v2/goals/), прогресса цели (GET /api/v2/goals/{id}/progress),
+сетки месяца (GET /api/calendar/month) и задач за месяц (GET /api/tasks/range)
+строит ответ один раз и замеряет пути, которыми FastAPI превращает его в байты:
+- revalidate — проверка готового ответа по response_model (FastAPI и SessionRoute);
+- encode:dump_json — путь по умолчанию при заданном response_model (pydantic-core сразу в байты);
+- encode:jsonable_encoder — обработчик без response_model: jsonable_encoder + json.dumps;
+- encode:dump_python+json — собственный response_class (JSONResponse) рендерит dict из pydantic;
+- encode:orjson — то же через orjson.dumps (ORJSONResponse), если пакет установлен.
+Отдельно — цена построения одной задачи (TaskView): конструктор с проверкой
+полей против model_construct.
+
+Запуск (из backend/):
+    python -m benchmarks.serialization [--database-url URL --email E] [--repeat 20]
+        [--goals 12] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import date
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models, schemas
+from app.database import Base
+from app.routers import calendar, goals_v2, tasks
+from benchmarks.seed import add_size_arguments, seed_user, size_options
+from benchmarks.suite import _timings
+
+try:
+    import orjson
+except ImportError:  # orjson не входит в зависимости приложения
+    orjson = None
+
+TASKS_PER_SAMPLE = 1000
+
+
+def build_payloads(db, user: models.User, today: date) -> dict:
+    """Готовые ответы эндпоинтов: имя → (response_model, ответ)."""
+    month_start, month_end = calendar._month_range(today.year, today.month)
+    goals = goals_v2.list_goals(include_archived=False, db=db, current_user=user)
+    plans = tasks._load_recurring_plans(db, user.id, month_start, month_end)
+    payloads = {
+        "goals": (List[schemas.GoalV2Response], goals),
+        "calendar_month": (
+            schemas.CalendarMonthResponse,
+            calendar._build_calendar_month(db, user.id, today.year, today.month, None, False),
+        ),
+        "tasks_range": (
+            schemas.TaskRangeResponse,
+            schemas.TaskRangeResponse(
+                tasks=list(tasks._merge_tasks(db, user.id, plans, month_start, month_end))
+            ),
+        ),
+    }
+    if goals:
+        progress = goals_v2.get_goal_progress(goal_id=goals[0].id, db=db, current_user=user)
+        payloads["goal_progress"] = (
+            schemas.GoalProgressResponse, schemas.GoalProgressResponse.model_validate(progress)
+        )
+    return payloads
+
+
+def _encoders(adapter: TypeAdapter, payload) -> dict:
+    encoders = {
+        "dump_json": lambda: adapter.dump_json(payload),
+        "jsonable_encoder": lambda: json.dumps(jsonable_encoder(payload)).encode(),
+        "dump_python+json": lambda: json.dumps(adapter.dump_python(payload, mode="json")).encode(),
+    }
+    if orjson is not None:
+        encoders["orjson"] = lambda: orjson.dumps(adapter.dump_python(payload, mode="json"))
+    return encoders
+
+
+def _task_construction(task: schemas.TaskView) -> dict:
+    """Построить TASKS_PER_SAMPLE задач: с проверкой полей и через model_construct."""
+    fields = dict(task)
+    return {
+        "validated": lambda: [schemas.TaskView(**fields) for _ in range(TASKS_PER_SAMPLE)],
+        "construct": lambda: [schemas.TaskView.model_construct(**fields) for _ in range(TASKS_PER_SAMPLE)],
+    }
+
+
+def run_benchmark(
+    database_url: str, email: str, repeat: int = 20, warmup: int = 2, today: date = None
+) -> dict:
+    """Время проверки и сериализации готовых ответов для засеянного пользователя."""
+    engine = create_engine(database_url)
+    results = {}
+    sizes = {}
+    try:
+        with sessionmaker(bind=engine)() as db:
+            user = db.execute(select(models.User).where(models.User.email == email)).scalar_one()
+            payloads = build_payloads(db, user, today or date.today())
+    finally:
+        engine.dispose()
+
+    for name, (response_model, payload) in payloads.items():
+        adapter = TypeAdapter(response_model)
+        body = adapter.dump_json(payload)
+        results[f"{name}:revalidate"] = _timings(lambda: adapter.validate_python(payload), repeat, warmup)
+        for encoder, encode in _encoders(adapter, payload).items():
+            if json.loads(encode()) != json.loads(body):
+                raise AssertionError(f"{name}: {encoder} расходится с dump_json")
+            results[f"{name}:encode:{encoder}"] = _timings(encode, repeat, warmup)
+        sizes[name] = len(body)
+
+    sample = payloads["tasks_range"][1].tasks
+    if sample:
+        for mode, build in _task_construction(sample[0]).items():
+            results[f"task_x{TASKS_PER_SAMPLE}:{mode}"] = _timings(build, repeat, warmup)
+    return {"bytes": sizes, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="по умолчанию — временный SQLite")
+    parser.add_argument("--email", help="пользователь в --database-url (засеянный benchmarks.seed)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", help="записать результаты в JSON")
+    add_size_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        email = args.email
+        if email is None:
+            engine = create_engine(database_url)
+            Base.metadata.create_all(bind=engine)
+            email = f"serialization-{int(time.time())}@example.com"
+            with sessionmaker(bind=engine)() as db:
+                seed_user(db, email, hashed_password="x", **size_options(args))
+            engine.dispose()
+
+        report = run_benchmark(database_url, email, repeat=args.repeat, warmup=args.warmup)
+
+    report["dataset"] = size_options(args)
+    for name, size in report["bytes"].items():
+        print(f"{name:16} {size / 1024:.0f} KiB")
+    for name, result in report["results"].items():
+        print(f"{name:40} median={result['median_ms']:.3f}ms p95={result['p95_ms']:.3f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Бенчмарки горячих путей API на синтетическом «тяжёлом» пользователе.
+
+Каждый случай — GET через полный стек приложения (аутентификация, ETag,
+сериализация) на TestClient; get_db подменяется сессией бенчмарк-БД.
+Кэш ответов календаря по умолчанию выключен, чтобы мерить построение ответа
+(--response-cache — оставить включённым).
+
+БД: по умолчанию временный SQLite с пользователем из benchmarks.seed;
+--database-url — своя БД (например, локальный PostgreSQL). С --email
+бенчмарк идёт по уже засеянному пользователю (python -m benchmarks.seed),
+иначе пользователь создаётся перед замером.
+
+Результаты — JSON (--output) для сравнения между коммитами (--compare).
+
+Запуск (из backend/):
+    python -m benchmarks.suite [--database-url URL] [--email heavy0@example.com]
+        [--repeat 20] [--output results.json] [--compare baseline.json] [--async]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import auth, cache, models
+from app.database import Base, async_database_url, get_db
+from app.main import app
+from benchmarks.seed import add_size_arguments, seed_user, size_options
+
+RESULTS_FORMAT = 1
+
+
+def build_cases(goal_id: int, today: date) -> dict[str, str]:
+    """Имя случая -> URL. Окно tasks/range — неделя вокруг сегодня, как на странице «Ближайшие дни»."""
+    return {
+        "list_goals": "/api/v2/goals/",
+        "get_goal_progress": f"/api/v2/goals/{goal_id}/progress",
+        "calendar_month": f"/api/calendar/month?year={today.year}&month={today.month}",
+        "calendar_day": f"/api/calendar/day/{today}",
+        "calendar_timeline": f"/api/calendar/timeline?year={today.year}&month={today.month}",
+        "upcoming_deadlines": "/api/calendar/upcoming-deadlines",
+        "tasks_range": f"/api/tasks/range?start_date={today - timedelta(days=3)}&end_date={today + timedelta(days=3)}",
+    }
+
+
+def _timings(fn: Callable[[], None], repeat: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def _session_override(database_url: str, use_async: bool):
+    """Зависимость get_db для бенчмарк-БД (Session или AsyncSession)."""
+    if use_async:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        # NullPool: соединения не переживают event loop TestClient
+        factory = async_sessionmaker(
+            create_async_engine(async_database_url(database_url), poolclass=NullPool), autoflush=False
+        )
+
+        async def override_get_db():
+            async with factory() as session:
+                yield session
+
+        return override_get_db
+
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=create_engine(database_url))
+
+    def override_get_db():
+        with factory() as session:
+            yield session
+
+    return override_get_db
+
+
+def run_suite(
+    database_url: str,
+    email: str,
+    repeat: int = 20,
+    warmup: int = 2,
+    use_async: bool = False,
+    response_cache: bool = False,
+    only: Optional[list[str]] = None,
+) -> dict[str, dict]:
+    """Замерить все случаи для пользователя email; {имя: тайминги}."""
+    engine = create_engine(database_url)
+    with sessionmaker(bind=engine)() as db:
+        user = db.query(models.User).filter(models.User.email == email).one()
+        goal_id = (
+            db.query(models.Goal.id).filter(models.Goal.user_id == user.id)
+            .order_by(models.Goal.id).limit(1).scalar()
+        )
+        claims = auth.token_claims(user)
+    engine.dispose()
+
+    cases = build_cases(goal_id, date.today())
+    if only:
+        cases = {name: url for name, url in cases.items() if name in only}
+
+    saved_backend = cache.backend
+    if not response_cache:
+        cache.backend = None
+    app.dependency_overrides[get_db] = _session_override(database_url, use_async)
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {auth.create_access_token(data=claims)}"
+    try:
+        results = {}
+        for name, url in cases.items():
+            def request(url=url):
+                response = client.get(url)
+                assert response.status_code == 200, (url, response.status_code, response.text)
+            results[name] = {"url": url, **_timings(request, repeat, warmup)}
+        return results
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        cache.backend = saved_backend
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict) -> list[str]:
+    """Строки сравнения медиан: случай, было, стало, отношение."""
+    lines = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            lines.append(f"{name:22} {'—':>10} {result['median_ms']:>10.2f}ms")
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        lines.append(
+            f"{name:22} {before['median_ms']:>8.2f}ms {result['median_ms']:>8.2f}ms  x{ratio:.2f}"
+        )
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="по умолчанию — временный SQLite")
+    parser.add_argument("--email", help="засеянный пользователь (иначе создаётся новый)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--case", action="append", dest="only", help="только этот случай (можно повторять)")
+    parser.add_argument("--async", action="store_true", dest="use_async", help="AsyncSession (как DATABASE_ASYNC=1)")
+    parser.add_argument("--response-cache", action="store_true", help="не выключать кэш ответов календаря")
+    parser.add_argument("--output", help="записать результаты в JSON")
+    parser.add_argument("--compare", help="JSON предыдущего запуска для сравнения")
+    add_size_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        email = args.email
+        dataset = {"email": email}
+        if email is None:
+            engine = create_engine(database_url)
+            Base.metadata.create_all(bind=engine)
+            email = f"bench-{int(time.time())}@example.com"
+            with sessionmaker(bind=engine)() as db:
+                seed_user(db, email, **size_options(args))
+            engine.dispose()
+            dataset = {"email": email, **size_options(args)}
+
+        results = run_suite(
+            database_url, email, repeat=args.repeat, warmup=args.warmup,
+            use_async=args.use_async, response_cache=args.response_cache, only=args.only,
+        )
+
+    report = {
+        "format": RESULTS_FORMAT,
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": database_url.split("://")[0].split("+")[0],
+        "async": args.use_async,
+        "response_cache": args.response_cache,
+        "dataset": dataset,
+        "results": results,
+    }
+
+    for name, result in results.items():
+        print(f"{name:22} median={result['median_ms']:.2f}ms p95={result['p95_ms']:.2f}ms min={result['min_ms']:.2f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nсравнение с {baseline.get('commit')} (медианы):")
+        print("\n".join(compare(baseline, report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.database import Base, get_db
 from app.main import app
-from app import models, auth
+from app import models, auth, cache, instrumentation
 
 # In-memory SQLite для тестов
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -22,6 +22,8 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 def setup_db():
     """Создаёт таблицы перед каждым тестом и удаляет после."""
     Base.metadata.create_all(bind=engine)
+    cache.clear()  # id пользователей повторяются между тестами
+    auth.clear_user_cache()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -50,6 +52,17 @@ def client(db):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def query_counter():
+    """
+    Счётчик SQL-запросов (app/instrumentation.py):
+        with query_counter() as queries:
+            client.get(...)
+        assert queries.count <= N
+    """
+    return instrumentation.count_queries
+
+
 @pytest.fixture
 def test_user(db) -> models.User:
     """Создаёт тестового пользователя."""
@@ -0,0 +1,208 @@
+"""
+Тесты денормализованных счётчиков RecurringAction.completed_count / expected_count
+(app/counters.py): инкрементальное обновление и проверка согласованности.
+"""
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import text
+from app import models
+from app.counters import check_action_counters, expected_count_for, load_completed_counts
+
+
+def _create_goal_with_milestone(session, user):
+    """Создать цель с вехой [-14; +14] дней от сегодня."""
+    today = date.today()
+    goal = models.Goal(title="Goal", user_id=user.id)
+    session.add(goal)
+    session.flush()
+    milestone = models.Milestone(
+        goal_id=goal.id,
+        title="Milestone",
+        start_date=today - timedelta(days=14),
+        end_date=today + timedelta(days=14),
+    )
+    session.add(milestone)
+    session.commit()
+    session.refresh(milestone)
+    return goal, milestone
+
+
+def _create_daily_action(session, milestone):
+    action = models.RecurringAction(
+        milestone_id=milestone.id, title="Daily", weekdays=[1, 2, 3, 4, 5, 6, 7]
+    )
+    session.add(action)
+    session.commit()
+    session.refresh(action)
+    return action
+
+
+def _assert_consistent(session, action):
+    session.refresh(action)
+    assert action.expected_count == expected_count_for(action)
+    assert action.completed_count == load_completed_counts(session, [action.id]).get(action.id, 0)
+
+
+class TestCountersOnCreate:
+    def test_new_action_has_expected_count(self, session, test_user):
+        _, milestone = _create_goal_with_milestone(session, test_user)
+        action = _create_daily_action(session, milestone)
+
+        assert action.expected_count == 29
+        assert action.completed_count == 0
+
+    def test_api_created_action(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+
+        response = client.post(
+            f"/api/v2/goals/milestones/{milestone.id}/recurring-actions",
+            json={"title": "Run", "weekdays": [1, 3, 5]},
+        )
+        assert response.status_code == 201
+        action = session.get(models.RecurringAction, response.json()["id"])
+        _assert_consistent(session, action)
+
+
+class TestCountersOnLogWrites:
+    def test_log_create_and_toggle(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        action = _create_daily_action(session, milestone)
+        today = date.today()
+
+        url = f"/api/v2/goals/recurring-actions/{action.id}/log"
+        client.post(url, json={"date": str(today), "completed": True})
+        client.post(url, json={"date": str(today - timedelta(days=1)), "completed": True})
+        session.refresh(action)
+        assert action.completed_count == 2
+
+        client.post(url, json={"date": str(today), "completed": False})
+        session.refresh(action)
+        assert action.completed_count == 1
+
+        # Лог вне периода вехи не учитывается
+        client.post(url, json={"date": str(today + timedelta(days=30)), "completed": True})
+        _assert_consistent(session, action)
+        assert action.completed_count == 1
+
+    def test_complete_task_and_reschedule(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        action = _create_daily_action(session, milestone)
+        today = date.today()
+
+        client.put(
+            f"/api/tasks/{action.id}/complete",
+            json={"type": "recurring", "date": str(today), "completed": True},
+        )
+        session.refresh(action)
+        assert action.completed_count == 1
+
+        # Перенос за пределы периода — выполнение больше не учитывается
+        client.put(
+            f"/api/tasks/{action.id}/reschedule",
+            json={
+                "type": "recurring",
+                "old_date": str(today),
+                "new_date": str(today + timedelta(days=20)),
+            },
+        )
+        _assert_consistent(session, action)
+        assert action.completed_count == 0
+
+    def test_log_delete(self, session, test_user):
+        _, milestone = _create_goal_with_milestone(session, test_user)
+        action = _create_daily_action(session, milestone)
+        log = models.RecurringActionLog(
+            recurring_action_id=action.id, date=date.today(), completed=True
+        )
+        session.add(log)
+        session.commit()
+        session.refresh(action)
+        assert action.completed_count == 1
+
+        session.delete(log)
+        session.commit()
+        _assert_consistent(session, action)
+        assert action.completed_count == 0
+
+
+class TestCountersOnPeriodChange:
+    def test_weekdays_and_period_change(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        action = _create_daily_action(session, milestone)
+        today = date.today()
+        for offset in range(-10, 0):
+            session.add(models.RecurringActionLog(
+                recurring_action_id=action.id, date=today + timedelta(days=offset), completed=True,
+            ))
+        session.commit()
+
+        response = client.put(
+            f"/api/v2/goals/recurring-actions/{action.id}",
+            json={"weekdays": [1], "start_date": str(today - timedelta(days=3))},
+        )
+        assert response.status_code == 200
+        _assert_consistent(session, action)
+        assert action.completed_count == 3
+        assert response.json()["completed_count"] == 3
+        assert response.json()["expected_count"] == action.expected_count
+
+    def test_recount_ignores_other_actions_logs(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        action = _create_daily_action(session, milestone)
+        other = _create_daily_action(session, milestone)
+        today = date.today()
+        for offset in range(-5, 0):
+            for target in (action, other):
+                session.add(models.RecurringActionLog(
+                    recurring_action_id=target.id, date=today + timedelta(days=offset), completed=True,
+                ))
+        session.commit()
+
+        response = client.put(
+            f"/api/v2/goals/recurring-actions/{action.id}",
+            json={"start_date": str(today - timedelta(days=2))},
+        )
+        assert response.status_code == 200
+        _assert_consistent(session, action)
+        assert action.completed_count == 2
+
+    def test_milestone_extension(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        action = _create_daily_action(session, milestone)
+
+        response = client.post(
+            f"/api/v2/goals/milestones/{milestone.id}/close",
+            json={"action": "extend", "new_end_date": str(milestone.end_date + timedelta(days=7))},
+        )
+        assert response.status_code == 200
+        _assert_consistent(session, action)
+        assert action.expected_count == 36
+
+
+class TestCheckActionCounters:
+    def test_detects_and_repairs(self, session, test_user):
+        _, milestone = _create_goal_with_milestone(session, test_user)
+        actions = [_create_daily_action(session, milestone) for _ in range(3)]
+        session.add(models.RecurringActionLog(
+            recurring_action_id=actions[0].id, date=date.today(), completed=True,
+        ))
+        session.commit()
+        assert check_action_counters(session) == []
+
+        session.execute(
+            text("UPDATE recurring_actions SET completed_count = 7, expected_count = 1 WHERE id = :id"),
+            {"id": actions[0].id},
+        )
+        session.commit()
+
+        mismatches = check_action_counters(session, repair=True, batch_size=2)
+        assert [m["action_id"] for m in mismatches] == [actions[0].id]
+        assert mismatches[0]["actual_completed_count"] == 1
+        assert check_action_counters(session) == []
+        _assert_consistent(session, actions[0])
@@ -0,0 +1,196 @@
+"""
+Тесты сервиса записи логов (app/action_logs.py): upsert без дубликатов,
+дельты completed_count, перенос с объединением, версия данных.
+"""
+from datetime import date, timedelta
+from sqlalchemy import event, text
+from app import models, action_logs
+from app.counters import load_completed_counts
+
+
+def _create_daily_action(session, user):
+    """Ежедневное действие в вехе [-14; +14] дней от сегодня."""
+    today = date.today()
+    goal = models.Goal(title="Goal", user_id=user.id)
+    session.add(goal)
+    session.flush()
+    milestone = models.Milestone(
+        goal_id=goal.id,
+        title="Milestone",
+        start_date=today - timedelta(days=14),
+        end_date=today + timedelta(days=14),
+    )
+    session.add(milestone)
+    session.flush()
+    action = models.RecurringAction(
+        milestone_id=milestone.id, title="Daily", weekdays=[1, 2, 3, 4, 5, 6, 7]
+    )
+    session.add(action)
+    session.commit()
+    session.refresh(action)
+    return action
+
+
+def _logs(session, action):
+    return (
+        session.query(models.RecurringActionLog)
+        .filter(models.RecurringActionLog.recurring_action_id == action.id)
+        .order_by(models.RecurringActionLog.date)
+        .all()
+    )
+
+
+def _assert_counter_consistent(session, action):
+    session.refresh(action)
+    assert action.completed_count == load_completed_counts(session, [action.id]).get(action.id, 0)
+
+
+class TestUpsertLog:
+    def test_insert_toggle_and_noop_deltas(self, session, test_user):
+        action = _create_daily_action(session, test_user)
+        today = date.today()
+
+        created = action_logs.upsert_log(session, action, today, True)
+        assert created["inserted"] is True
+        assert created["completed_delta"] == 1
+
+        same = action_logs.upsert_log(session, action, today, True)
+        assert same["id"] == created["id"]
+        assert same["completed_delta"] == 0
+
+        unchecked = action_logs.upsert_log(session, action, today, False)
+        assert unchecked["inserted"] is False
+        assert unchecked["completed_delta"] == -1
+
+        blank = action_logs.upsert_log(session, action, today - timedelta(days=1), False)
+        assert blank["inserted"] is True
+        assert blank["completed_delta"] == 0
+        session.commit()
+
+        assert len(_logs(session, action)) == 2
+        _assert_counter_consistent(session, action)
+
+    def test_outside_period_does_not_count(self, session, test_user):
+        action = _create_daily_action(session, test_user)
+
+        result = action_logs.upsert_log(session, action, date.today() + timedelta(days=30), True)
+        session.commit()
+
+        assert result["completed_delta"] == 0
+        _assert_counter_consistent(session, action)
+        assert action.completed_count == 0
+
+    def test_repeated_clicks_do_not_duplicate(self, auth_client, session):
+        client, user = auth_client
+        action = _create_daily_action(session, user)
+        today = date.today()
+
+        for _ in range(3):
+            response = client.put(
+                f"/api/tasks/{action.id}/complete",
+                json={"type": "recurring", "date": str(today), "completed": True},
+            )
+            assert response.status_code == 200
+            assert response.json()["completed_count"] == 1
+
+        assert len(_logs(session, action)) == 1
+
+    def test_single_write_statement_for_log(self, auth_client, session):
+        client, user = auth_client
+        action = _create_daily_action(session, user)
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = session.get_bind()
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.post(
+                f"/api/v2/goals/recurring-actions/{action.id}/log",
+                json={"date": str(date.today()), "completed": True},
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        assert response.status_code == 201
+        assert response.json()["completed"] is True
+        log_statements = [s for s in statements if "recurring_action_logs" in s]
+        assert len(log_statements) == 1
+        assert log_statements[0].lstrip().upper().startswith("INSERT")
+
+    def test_bumps_data_version(self, auth_client, session):
+        client, user = auth_client
+        action = _create_daily_action(session, user)
+        before = session.execute(
+            text("SELECT data_version FROM users WHERE id = :id"), {"id": user.id}
+        ).scalar_one()
+
+        client.post(
+            f"/api/v2/goals/recurring-actions/{action.id}/log",
+            json={"date": str(date.today()), "completed": True},
+        )
+
+        after = session.execute(
+            text("SELECT data_version FROM users WHERE id = :id"), {"id": user.id}
+        ).scalar_one()
+        assert after > before
+
+
+class TestMoveLog:
+    def test_merges_into_existing_log(self, auth_client, session):
+        client, user = auth_client
+        action = _create_daily_action(session, user)
+        today = date.today()
+        tomorrow = today + timedelta(days=1)
+        action_logs.upsert_log(session, action, today, True)
+        action_logs.upsert_log(session, action, tomorrow, True)
+        session.commit()
+
+        response = client.put(
+            f"/api/tasks/{action.id}/reschedule",
+            json={"type": "recurring", "old_date": str(today), "new_date": str(tomorrow)},
+        )
+
+        assert response.status_code == 200
+        logs = _logs(session, action)
+        assert [(log.date, log.completed) for log in logs] == [(tomorrow, True)]
+        _assert_counter_consistent(session, action)
+
+    def test_moves_completion_by_log_id(self, auth_client, session):
+        client, user = auth_client
+        action = _create_daily_action(session, user)
+        today = date.today()
+        log = action_logs.upsert_log(session, action, today, True)
+        session.commit()
+
+        response = client.put(
+            f"/api/tasks/{action.id}/reschedule",
+            json={
+                "type": "recurring",
+                "old_date": str(today),
+                "new_date": str(today + timedelta(days=2)),
+                "log_id": log["id"],
+            },
+        )
+
+        assert response.status_code == 200
+        logs = _logs(session, action)
+        assert [(log.date, log.completed) for log in logs] == [(today + timedelta(days=2), True)]
+        _assert_counter_consistent(session, action)
+
+    def test_unknown_log_id(self, auth_client, session):
+        client, user = auth_client
+        action = _create_daily_action(session, user)
+        today = date.today()
+
+        response = client.put(
+            f"/api/tasks/{action.id}/reschedule",
+            json={
+                "type": "recurring",
+                "old_date": str(today),
+                "new_date": str(today + timedelta(days=1)),
+                "log_id": 99999,
+            },
+        )
+        assert response.status_code == 404
@@ -7,6 +7,7 @@ import pytest
 from datetime import date, timedelta
 from unittest.mock import patch
 from app import models
+from app.sweeper import finalize_expired_actions
 
 
 # ============================================
@@ -802,9 +803,8 @@ class TestIsCompletedAfterPeriod:
         # Логи на все 10 дней — 100%
         _create_logs(session, action, count=10, start_date=start)
 
-        # GET на цель триггерит _recalculate_expired_actions
-        resp = client.get(f"/api/v2/goals/{goal.id}")
-        data = resp.json()
+        # Финализацию выполняет sweeper
+        finalize_expired_actions(session)
 
         # Проверяем через БД
         session.refresh(action)
@@ -826,12 +826,12 @@ class TestIsCompletedAfterPeriod:
         # Только 2 лога из 10 ожидаемых — 20% < 90%
         _create_logs(session, action, count=2, start_date=start)
 
-        resp = client.get(f"/api/v2/goals/{goal.id}")
+        finalize_expired_actions(session)
         session.refresh(action)
         assert action.is_completed is False
 
-    def test_expired_actions_auto_recalculate_on_get(self, auth_client, session):
-        """GET /api/v2/goals/{id} автоматически пересчитывает is_completed для истёкших действий."""
+    def test_expired_actions_finalized_by_sweeper_not_on_get(self, auth_client, session):
+        """GET не пишет в БД, но отражает истёкший период; is_completed сохраняет sweeper."""
         client, user = auth_client
         today = date.today()
         start = today - timedelta(days=10)
@@ -847,9 +847,13 @@ class TestIsCompletedAfterPeriod:
         # До GET is_completed=False (по умолчанию)
         assert action.is_completed is False
 
-        # GET триггерит автопересчёт
-        client.get(f"/api/v2/goals/{goal.id}")
+        # GET — чистое чтение: в ответе действие завершено, в БД ещё нет
+        resp = client.get(f"/api/v2/goals/{goal.id}")
+        assert resp.json()["milestones"][0]["recurring_actions"][0]["is_completed"] is True
+        session.refresh(action)
+        assert action.is_completed is False
 
+        assert finalize_expired_actions(session) == 1
         session.refresh(action)
         assert action.is_completed is True
 
@@ -881,8 +885,8 @@ class TestIsCompletedEdgeCases:
         # current_percent = 100% >= 80% → is_completed should be True
         # (потому что effective_end <= today)
         session.refresh(action)
-        # Нужен пересчёт через GET goal
-        client.get(f"/api/v2/goals/{goal.id}")
+        # Финализацию выполняет sweeper
+        finalize_expired_actions(session)
         session.refresh(action)
         assert action.is_completed is True
 
@@ -904,7 +908,7 @@ class TestIsCompletedEdgeCases:
         session.add(log)
         session.commit()
 
-        client.get(f"/api/v2/goals/{goal.id}")
+        finalize_expired_actions(session)
         session.refresh(action)
         assert action.is_completed is True
 
@@ -922,7 +926,7 @@ class TestIsCompletedEdgeCases:
         )
         # Нет логов
 
-        client.get(f"/api/v2/goals/{goal.id}")
+        finalize_expired_actions(session)
         session.refresh(action)
         assert action.is_completed is False
 
@@ -942,7 +946,7 @@ class TestIsCompletedEdgeCases:
         # Все 5 дней
         _create_logs(session, action, count=5, start_date=start)
 
-        client.get(f"/api/v2/goals/{goal.id}")
+        finalize_expired_actions(session)
         session.refresh(action)
         assert action.is_completed is True
 
@@ -962,7 +966,7 @@ class TestIsCompletedEdgeCases:
         # Только 4 из 5 дней
         _create_logs(session, action, count=4, start_date=start)
 
-        client.get(f"/api/v2/goals/{goal.id}")
+        finalize_expired_actions(session)
         session.refresh(action)
         assert action.is_completed is False
 
@@ -982,7 +986,7 @@ class TestIsCompletedEdgeCases:
             session, milestone, weekdays=[wrong_weekday], target_percent=80
         )
 
-        client.get(f"/api/v2/goals/{goal.id}")
+        finalize_expired_actions(session)
         session.refresh(action)
         # expected_count=0 → current_percent=0 → is_target_reached=False → is_completed=False
         assert action.is_completed is False
@@ -1088,7 +1092,7 @@ class TestFullPeriodExpectedCount:
         # 8 логов из 10 → 80% >= 80%, но период не закончился
         _create_logs(session, action, count=8, start_date=start)
 
-        client.get(f"/api/v2/goals/{goal.id}")
+        finalize_expired_actions(session)
         session.refresh(action)
         assert action.is_completed is False  # Период ещё идёт
 
@@ -0,0 +1,176 @@
+"""
+Асинхронный стек БД (DATABASE_ASYNC): обработчики через AsyncSession.run_sync
+работают на event loop (без threadpool) и отвечают так же, как синхронный путь.
+"""
+import asyncio
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import async_database_url, get_db
+from app.main import app
+from tests.conftest import SQLALCHEMY_DATABASE_URL
+
+
+@pytest.fixture
+def async_engine():
+    # NullPool: соединения aiosqlite не переживают event loop TestClient
+    return create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+
+
+@pytest.fixture
+def clients(client, db, auth_headers, async_engine):
+    """Пара (use_async, use_sync): переключает get_db между AsyncSession и Session."""
+    factory = async_sessionmaker(async_engine, autoflush=False)
+
+    async def override_get_async_db():
+        async with factory() as session:
+            yield session
+
+    def override_get_sync_db():
+        yield db
+
+    def use_async():
+        db.expire_all()
+        app.dependency_overrides[get_db] = override_get_async_db
+        return client
+
+    def use_sync():
+        db.expire_all()
+        app.dependency_overrides[get_db] = override_get_sync_db
+        return client
+
+    client.headers.update(auth_headers)
+    return use_async, use_sync
+
+
+def _create_tree(client):
+    today = date.today()
+    goal = client.post("/api/v2/goals/", json={
+        "title": "Goal",
+        "start_date": str(today - timedelta(days=20)),
+        "end_date": str(today + timedelta(days=20)),
+    })
+    assert goal.status_code == 201, goal.text
+    goal_id = goal.json()["id"]
+    milestone = client.post(f"/api/v2/goals/{goal_id}/milestones", json={
+        "title": "Milestone",
+        "start_date": str(today - timedelta(days=10)),
+        "end_date": str(today + timedelta(days=10)),
+    })
+    assert milestone.status_code == 201, milestone.text
+    milestone_id = milestone.json()["id"]
+    action = client.post(
+        f"/api/v2/goals/milestones/{milestone_id}/recurring-actions",
+        json={"title": "Run", "weekdays": [1, 2, 3, 4, 5, 6, 7]},
+    )
+    assert action.status_code == 201, action.text
+    onetime = client.post(
+        f"/api/v2/goals/milestones/{milestone_id}/one-time-actions",
+        json={"title": "Buy", "deadline": str(today + timedelta(days=2))},
+    )
+    assert onetime.status_code == 201, onetime.text
+    return goal_id, milestone_id, action.json()["id"], onetime.json()["id"]
+
+
+def _read_urls(goal_id, milestone_id):
+    today = date.today()
+    return [
+        "/auth/me",
+        "/api/v2/goals/",
+        f"/api/v2/goals/{goal_id}",
+        f"/api/v2/goals/{goal_id}/progress",
+        f"/api/v2/goals/milestones/{milestone_id}",
+        f"/api/tasks/range?start_date={today - timedelta(days=3)}&end_date={today + timedelta(days=3)}",
+        f"/api/calendar/month?year={today.year}&month={today.month}",
+        f"/api/calendar/day/{today}",
+        f"/api/calendar/timeline?year={today.year}&month={today.month}",
+        "/api/calendar/upcoming-deadlines",
+        "/todos/",
+    ]
+
+
+class TestAsyncDatabase:
+    def test_writes_and_reads_match_sync_path(self, clients):
+        use_async, use_sync = clients
+        today = date.today()
+
+        client = use_async()
+        goal_id, milestone_id, action_id, onetime_id = _create_tree(client)
+        responses = [
+            client.post(
+                f"/api/v2/goals/recurring-actions/{action_id}/log",
+                json={"date": str(today), "completed": True},
+            ),
+            client.put(
+                f"/api/tasks/{action_id}/complete",
+                json={"type": "recurring", "date": str(today - timedelta(days=1)), "completed": True},
+            ),
+            client.post("/api/tasks/complete-batch", json={"items": [
+                {"type": "recurring", "id": action_id, "date": str(today - timedelta(days=2)), "completed": True},
+                {"type": "one-time", "id": onetime_id, "date": str(today), "completed": True},
+            ]}),
+            client.put(
+                f"/api/tasks/{action_id}/reschedule",
+                json={"type": "recurring", "old_date": str(today), "new_date": str(today + timedelta(days=1))},
+            ),
+            client.put(f"/api/v2/goals/{goal_id}", json={"title": "Renamed"}),
+            client.post("/todos/", json={"title": "Todo", "date": f"{today}T10:00:00"}),
+            client.put("/auth/me", json={"display_name": "Async"}),
+        ]
+        for response in responses:
+            assert response.status_code in (200, 201), response.text
+
+        for url in _read_urls(goal_id, milestone_id):
+            async_response = use_async().get(url)
+            sync_response = use_sync().get(url)
+            assert async_response.status_code == 200, (url, async_response.text)
+            assert async_response.json() == sync_response.json(), url
+
+        assert use_async().get(f"/api/v2/goals/{goal_id}").json()["title"] == "Renamed"
+
+    def test_queries_run_on_event_loop(self, clients, async_engine):
+        use_async, _ = clients
+        client = use_async()
+        goal_id, milestone_id, _, _ = _create_tree(client)
+        on_loop = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            for url in _read_urls(goal_id, milestone_id):
+                assert client.get(url).status_code == 200
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+        assert on_loop and all(on_loop)
+
+    def test_tasks_stream_matches_sync_path(self, clients):
+        use_async, use_sync = clients
+        _create_tree(use_async())
+        today = date.today()
+        url = f"/api/tasks/range/stream?start_date={today - timedelta(days=60)}&end_date={today + timedelta(days=60)}"
+
+        async_response = use_async().get(url)
+        sync_response = use_sync().get(url)
+
+        assert async_response.status_code == 200, async_response.text
+        assert async_response.text == sync_response.text
+        assert async_response.text.count("\n") > 20
+
+    def test_async_database_url(self):
+        assert async_database_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+        assert async_database_url("postgresql+psycopg2://u@db/app") == "postgresql+asyncpg://u@db/app"
+        assert async_database_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
@@ -0,0 +1,75 @@
+"""
+Генератор данных и набор бенчмарков (backend/benchmarks): согласованность
+засеянных данных и прогон всех случаев на маленьком наборе.
+"""
+from datetime import date
+
+from app import completion_bitmap, models
+from app.counters import check_action_counters
+from benchmarks import serialization
+from benchmarks.completion_store import run_benchmark
+from benchmarks.seed import seed_user
+from benchmarks.suite import build_cases, compare, run_suite
+from tests.conftest import SQLALCHEMY_DATABASE_URL
+
+SIZES = {"goals": 2, "milestones": 2, "recurring": 2, "onetime": 1, "years": 1}
+
+
+class TestSeed:
+    def test_counts_and_counters(self, db):
+        user = seed_user(db, "bench@example.com", hashed_password="x", **SIZES)
+
+        goals = db.query(models.Goal).filter(models.Goal.user_id == user.id).all()
+        assert len(goals) == 2
+        assert db.query(models.Milestone).count() == 4
+        assert db.query(models.RecurringAction).count() == 8
+        assert db.query(models.OneTimeAction).count() == 4
+        assert db.query(models.RecurringActionLog).count() > 365
+        assert db.query(models.RecurringActionLog).filter(
+            models.RecurringActionLog.date > date.today()
+        ).count() == 0
+        assert check_action_counters(db) == []
+
+
+class TestSuite:
+    def test_runs_all_cases(self, db):
+        seed_user(db, "bench@example.com", hashed_password="x", **SIZES)
+
+        results = run_suite(SQLALCHEMY_DATABASE_URL, "bench@example.com", repeat=2, warmup=0)
+
+        assert results.keys() == build_cases(1, date.today()).keys()
+        for result in results.values():
+            assert result["repeat"] == 2
+            assert 0 < result["min_ms"] <= result["median_ms"] <= result["max_ms"]
+
+    def test_compare(self):
+        baseline = {"results": {"list_goals": {"median_ms": 10.0}}}
+        current = {"results": {"list_goals": {"median_ms": 5.0}, "tasks_range": {"median_ms": 1.0}}}
+
+        lines = compare(baseline, current)
+
+        assert "x0.50" in lines[0]
+        assert lines[1].startswith("tasks_range")
+
+
+class TestCompletionStore:
+    def test_compares_both_stores(self, db, monkeypatch):
+        monkeypatch.setattr(completion_bitmap, "COMPLETION_STORE", "bitmap")
+        seed_user(db, "habits@example.com", hashed_password="x", **SIZES)
+
+        report = run_benchmark(SQLALCHEMY_DATABASE_URL, "habits@example.com", repeat=1, warmup=0)
+
+        assert completion_bitmap.COMPLETION_STORE == "bitmap"
+        assert 0 < report["storage"]["bitmap"]["rows"] < report["storage"]["rows"]["rows"]
+        assert {name.split(":")[1] for name in report["results"]} == {"rows", "bitmap"}
+
+
+class TestSerialization:
+    def test_encoders_agree(self, db):
+        seed_user(db, "bench@example.com", hashed_password="x", **SIZES)
+
+        report = serialization.run_benchmark(SQLALCHEMY_DATABASE_URL, "bench@example.com", repeat=1, warmup=0)
+
+        assert report["bytes"].keys() == {"goals", "calendar_month", "tasks_range", "goal_progress"}
+        assert "goal_progress:encode:dump_json" in report["results"]
+        assert "task_x1000:construct" in report["results"]
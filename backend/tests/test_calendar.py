@@ -3,7 +3,9 @@
 """
 import pytest
 from datetime import date, timedelta
+from sqlalchemy import event
 from app import models
+from app.routers.calendar import GOAL_COLORS
 
 
 def _create_goal_with_milestone(
@@ -173,6 +175,58 @@ class TestGetCalendarMonth:
         assert response.status_code == 401
 
 
+class TestCalendarMonthAggregation:
+    def test_month_matches_day_details(self, auth_client, session):
+        """Агрегаты месяца совпадают с детализацией каждого дня."""
+        client, user = auth_client
+        first_day = date(2026, 3, 1)
+        goal, milestone = _create_goal_with_milestone(
+            session, user, title="Goal A",
+            goal_start=date(2026, 2, 20), goal_end=date(2026, 3, 25),
+            ms_start=date(2026, 3, 5), ms_end=date(2026, 3, 20),
+        )
+        other, other_ms = _create_goal_with_milestone(
+            session, user, title="Goal B",
+            goal_start=date(2026, 3, 10), goal_end=date(2026, 4, 30),
+            ms_title="Other milestone", ms_start=date(2026, 3, 1), ms_end=date(2026, 3, 20),
+        )
+        daily = _create_recurring_action(session, milestone, weekdays=[1, 2, 3, 4, 5, 6, 7])
+        _create_recurring_action(session, other_ms, weekdays=[2, 6])
+        deleted = _create_recurring_action(session, milestone, weekdays=[1])
+        deleted.is_deleted = True
+        _create_onetime_action(session, milestone, deadline=date(2026, 3, 12))
+        _create_onetime_action(session, other_ms, deadline=date(2026, 3, 5))  # цель ещё не активна
+        done = _create_onetime_action(session, other_ms, deadline=date(2026, 3, 14))
+        done.completed = True
+        for day in (3, 6, 7, 12, 19):
+            session.add(models.RecurringActionLog(
+                recurring_action_id=daily.id, date=date(2026, 3, day), completed=day != 7,
+            ))
+        session.commit()
+
+        response = client.get("/api/calendar/month?year=2026&month=3")
+        assert response.status_code == 200
+        days = response.json()["days"]
+        assert len(days) == 31
+
+        for i, month_day in enumerate(days):
+            d = first_day + timedelta(days=i)
+            detail = client.get(f"/api/calendar/day/{d.isoformat()}").json()
+            assert month_day["date"] == d.isoformat()
+            assert month_day["tasks_total"] == len(detail["tasks"])
+            assert month_day["tasks_completed"] == sum(t["completed"] for t in detail["tasks"])
+            assert month_day["goals"] == detail["goals"]
+            assert month_day["has_milestone"] == bool(detail["milestones"])
+            if detail["milestones"]:
+                assert month_day["milestone_title"] == detail["milestones"][0]["title"]
+
+        by_date = {d["date"]: d for d in days}
+        assert by_date["2026-03-12"]["tasks_total"] == 2
+        assert by_date["2026-03-12"]["tasks_completed"] == 1
+        assert by_date["2026-03-05"]["tasks_total"] == 1
+        assert by_date["2026-03-20"]["milestone_title"] == "Test Milestone"
+
+
 # ============================================
 # GET /api/calendar/day/{date}
 # ============================================
@@ -447,3 +501,129 @@ class TestFilterByGoal:
             f"/api/calendar/month?year={today.year}&month={today.month}&goal_id=99999"
         )
         assert response.status_code == 404
+
+
+# ============================================
+# Окно дат в SQL (цели, вехи, логи вне окна не загружаются)
+# ============================================
+
+
+class TestDateWindowPushdown:
+    def _create_goals(self, session, user):
+        """Старая цель (2024) и две цели в марте 2026."""
+        old, old_ms = _create_goal_with_milestone(
+            session, user, title="Old",
+            goal_start=date(2024, 1, 1), goal_end=date(2024, 12, 31),
+            ms_start=date(2024, 1, 1), ms_end=date(2024, 12, 31),
+        )
+        old_action = _create_recurring_action(session, old_ms, weekdays=[1, 2, 3, 4, 5, 6, 7])
+        for offset in range(0, 366, 7):
+            session.add(models.RecurringActionLog(
+                recurring_action_id=old_action.id,
+                date=date(2024, 1, 1) + timedelta(days=offset),
+                completed=True,
+            ))
+        session.commit()
+        second, _ = _create_goal_with_milestone(
+            session, user, title="Second",
+            goal_start=date(2026, 3, 1), goal_end=date(2026, 3, 31),
+            ms_start=date(2026, 3, 1), ms_end=date(2026, 3, 31),
+        )
+        third, third_ms = _create_goal_with_milestone(
+            session, user, title="Third",
+            goal_start=date(2026, 3, 1), goal_end=date(2026, 3, 31),
+            ms_start=date(2026, 3, 1), ms_end=date(2026, 3, 31),
+        )
+        _create_recurring_action(session, third_ms, weekdays=[1, 2, 3, 4, 5, 6, 7])
+        return old, old_ms, second, third
+
+    def test_colors_stable_across_windows_and_filters(self, auth_client, session):
+        """Цвет цели зависит от её номера среди всех целей, а не от окна/фильтра."""
+        client, user = auth_client
+        _, _, second, third = self._create_goals(session, user)
+        expected = {second.id: GOAL_COLORS[1], third.id: GOAL_COLORS[2]}
+
+        timeline = client.get("/api/calendar/timeline?year=2026&month=3").json()
+        assert {g["id"]: g["color"] for g in timeline["goals"]} == expected
+
+        filtered = client.get(
+            f"/api/calendar/month?year=2026&month=3&goal_ids={third.id}"
+        ).json()
+        assert filtered["days"][0]["goals"] == [
+            {"id": third.id, "title": "Third", "color": GOAL_COLORS[2]}
+        ]
+
+        day = client.get(f"/api/calendar/day/2026-03-10?goal_id={third.id}").json()
+        assert day["goals"][0]["color"] == GOAL_COLORS[2]
+        assert day["tasks"][0]["goal_color"] == GOAL_COLORS[2]
+
+    @pytest.mark.parametrize(
+        "url",
+        ["/api/calendar/month?year=2026&month=3", "/api/calendar/day/2026-03-10",
+         "/api/calendar/timeline?year=2026&month=3"],
+    )
+    def test_history_outside_window_not_loaded(self, auth_client, session, url):
+        client, user = auth_client
+        old, old_ms, _, _ = self._create_goals(session, user)
+        old_keys = {(models.Goal, old.id), (models.Milestone, old_ms.id)}
+        session.expunge_all()
+
+        loaded = []
+
+        def loaded_as_persistent(sess, instance):
+            loaded.append((type(instance), instance.id))
+
+        event.listen(session, "loaded_as_persistent", loaded_as_persistent)
+        try:
+            response = client.get(url)
+        finally:
+            event.remove(session, "loaded_as_persistent", loaded_as_persistent)
+
+        assert response.status_code == 200
+        assert loaded
+        assert not any(cls is models.RecurringActionLog for cls, _ in loaded)
+        assert not old_keys & set(loaded)
+
+    def test_day_loads_only_actions_on_weekday(self, auth_client, session):
+        """День календаря фильтрует регулярные действия по маске дней недели в SQL."""
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(
+            session, user,
+            goal_start=date(2026, 3, 1), goal_end=date(2026, 3, 31),
+            ms_start=date(2026, 3, 1), ms_end=date(2026, 3, 31),
+        )
+        tuesday_id = _create_recurring_action(session, milestone, title="Tuesday", weekdays=[2]).id
+        weekend_id = _create_recurring_action(session, milestone, title="Weekend", weekdays=[6, 7]).id
+        session.expunge_all()
+
+        loaded = []
+
+        def loaded_as_persistent(sess, instance):
+            loaded.append((type(instance), instance.id))
+
+        event.listen(session, "loaded_as_persistent", loaded_as_persistent)
+        try:
+            response = client.get("/api/calendar/day/2026-03-10")  # вторник
+        finally:
+            event.remove(session, "loaded_as_persistent", loaded_as_persistent)
+
+        assert [t["title"] for t in response.json()["tasks"]] == ["Tuesday"]
+        assert (models.RecurringAction, tuesday_id) in loaded
+        assert (models.RecurringAction, weekend_id) not in loaded
+
+    def test_onetime_outside_milestone_dates_still_shown(self, auth_client, session):
+        """Однократное действие с дедлайном вне дат вехи попадает в календарь."""
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(
+            session, user,
+            goal_start=date(2026, 3, 1), goal_end=date(2026, 5, 31),
+            ms_start=date(2026, 3, 1), ms_end=date(2026, 3, 31),
+        )
+        _create_onetime_action(session, milestone, title="Late task", deadline=date(2026, 4, 15))
+
+        month = client.get("/api/calendar/month?year=2026&month=4").json()
+        by_date = {d["date"]: d for d in month["days"]}
+        assert by_date["2026-04-15"]["tasks_total"] == 1
+
+        day = client.get("/api/calendar/day/2026-04-15").json()
+        assert [t["title"] for t in day["tasks"]] == ["Late task"]
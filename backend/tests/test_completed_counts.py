@@ -0,0 +1,133 @@
+"""
+Тесты SQL-агрегации выполнений (load_completed_counts):
+счётчики совпадают с подсчётом по action.logs, эндпоинты целей логи не читают.
+"""
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import event
+from app import models
+from app.counters import load_completed_counts
+from app.routers.goals_v2 import calculate_milestone_progress, calculate_recurring_action_progress
+
+
+def _create_goal_with_milestone(session, user):
+    """Создать цель v2 с вехой [-20; +20] дней от сегодня."""
+    today = date.today()
+    goal = models.Goal(
+        title="Goal",
+        user_id=user.id,
+        start_date=today - timedelta(days=30),
+        end_date=today + timedelta(days=30),
+    )
+    session.add(goal)
+    session.flush()
+    milestone = models.Milestone(
+        goal_id=goal.id,
+        title="Milestone",
+        start_date=today - timedelta(days=20),
+        end_date=today + timedelta(days=20),
+    )
+    session.add(milestone)
+    session.commit()
+    return goal, milestone
+
+
+def _add_action(session, milestone, start_date=None, end_date=None):
+    action = models.RecurringAction(
+        milestone_id=milestone.id,
+        title="Daily",
+        weekdays=[1, 2, 3, 4, 5, 6, 7],
+        start_date=start_date,
+        end_date=end_date,
+    )
+    session.add(action)
+    session.commit()
+    return action
+
+
+def _add_logs(session, action, offsets, completed=True):
+    today = date.today()
+    for offset in offsets:
+        session.add(
+            models.RecurringActionLog(
+                recurring_action_id=action.id,
+                date=today + timedelta(days=offset),
+                completed=completed,
+            )
+        )
+    session.commit()
+
+
+class TestLoadCompletedCounts:
+    def test_counts_only_completed_logs_in_milestone_window(self, session, test_user):
+        _, milestone = _create_goal_with_milestone(session, test_user)
+        action = _add_action(session, milestone)
+        _add_logs(session, action, [-25, -20, -5, -1, 20, 21])  # 2 за пределами вехи
+        _add_logs(session, action, [-2, -3], completed=False)
+
+        assert load_completed_counts(session, [action.id]) == {action.id: 4}
+
+    def test_uses_action_own_period(self, session, test_user):
+        today = date.today()
+        _, milestone = _create_goal_with_milestone(session, test_user)
+        action = _add_action(
+            session, milestone,
+            start_date=today - timedelta(days=5), end_date=today + timedelta(days=5),
+        )
+        _add_logs(session, action, [-10, -5, -1, 5, 6])
+
+        assert load_completed_counts(session, [action.id]) == {action.id: 3}
+
+    def test_actions_without_logs_absent(self, session, test_user):
+        _, milestone = _create_goal_with_milestone(session, test_user)
+        action = _add_action(session, milestone)
+
+        assert load_completed_counts(session, [action.id]) == {}
+        assert load_completed_counts(session, []) == {}
+
+    def test_matches_progress_computed_from_logs(self, session, test_user):
+        _, milestone = _create_goal_with_milestone(session, test_user)
+        first = _add_action(session, milestone)
+        second = _add_action(session, milestone)
+        _add_logs(session, first, range(-20, 0))
+        _add_logs(session, second, range(-22, -10, 2))
+        session.refresh(milestone)
+
+        counts = load_completed_counts(session, [first.id, second.id])
+        assert counts == {first.id: first.completed_count, second.id: second.completed_count}
+        percents = []
+        for action in (first, second):
+            info = calculate_recurring_action_progress(
+                action, milestone.start_date, milestone.end_date, action.completed_count
+            )
+            assert info["completed_count"] == counts.get(action.id, 0)
+            percents.append(info["current_percent"])
+        # Веха считается по счётчикам действий — тот же результат, что по агрегации логов
+        assert calculate_milestone_progress(milestone)["progress"] == round(sum(percents) / 2, 1)
+
+
+class TestGoalEndpointsDoNotLoadLogs:
+    @pytest.mark.parametrize(
+        "url", ["/api/v2/goals/", "/api/v2/goals/{goal_id}", "/api/v2/goals/{goal_id}/progress"]
+    )
+    def test_logs_not_read(self, auth_client, session, url):
+        client, user = auth_client
+        goal, milestone = _create_goal_with_milestone(session, user)
+        for _ in range(3):
+            _add_logs(session, _add_action(session, milestone), range(-10, 0))
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if "recurring_action_logs" in statement:
+                statements.append(statement)
+
+        engine = session.get_bind()
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.get(url.format(goal_id=goal.id))
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        assert response.status_code == 200
+        assert statements == []
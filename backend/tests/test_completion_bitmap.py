@@ -0,0 +1,205 @@
+"""
+Битовые карты выполнений (app/completion_bitmap.py): кодирование месяцев,
+поддержка карт при записи логов (сервис и ORM) в режиме bitmap, чтение календаря,
+проверка счётчиков по логам.
+"""
+from datetime import date, timedelta
+
+import pytest
+from hypothesis import given, strategies as st
+
+from app import action_logs, completion_bitmap, models
+from app.counters import check_action_counters, load_completed_counts
+
+
+@pytest.fixture
+def bitmap_store(monkeypatch):
+    monkeypatch.setattr(completion_bitmap, "COMPLETION_STORE", "bitmap")
+
+
+def _create_daily_action(session, user):
+    """Ежедневное действие в вехе [-40; +40] дней от сегодня (захватывает 3+ месяца)."""
+    today = date.today()
+    goal = models.Goal(title="Goal", user_id=user.id)
+    session.add(goal)
+    session.flush()
+    milestone = models.Milestone(
+        goal_id=goal.id,
+        title="Milestone",
+        start_date=today - timedelta(days=40),
+        end_date=today + timedelta(days=40),
+    )
+    session.add(milestone)
+    session.flush()
+    action = models.RecurringAction(
+        milestone_id=milestone.id, title="Daily", weekdays=[1, 2, 3, 4, 5, 6, 7]
+    )
+    session.add(action)
+    session.commit()
+    session.refresh(action)
+    return action
+
+
+def _completed_log_dates(session, action_id):
+    return sorted(
+        log_date for log_date, in session.query(models.RecurringActionLog.date).filter(
+            models.RecurringActionLog.recurring_action_id == action_id,
+            models.RecurringActionLog.completed == True,
+        )
+    )
+
+
+def _assert_bitmap_matches_logs(session, action_id):
+    session.expire_all()
+    months = completion_bitmap.load_months(session, [action_id]).get(action_id, {})
+    assert months == completion_bitmap.encode(_completed_log_dates(session, action_id))
+
+
+dates = st.dates(min_value=date(2000, 1, 1), max_value=date(2100, 12, 31))
+
+
+@given(days=st.sets(dates, max_size=50), start=dates, span=st.integers(min_value=-5, max_value=800))
+def test_decode_and_count_match_filter(days, start, span):
+    end = start + timedelta(days=span)
+    months = completion_bitmap.encode(days)
+    expected = sorted(d for d in days if start <= d <= end)
+
+    assert completion_bitmap.decode(months, start, end) == expected
+    assert completion_bitmap.count(months, start, end) == len(expected)
+
+
+class TestBitmapWrites:
+    def test_service_writes_keep_bitmap_in_sync(self, bitmap_store, session, test_user):
+        action = _create_daily_action(session, test_user)
+        today = date.today()
+
+        action_logs.upsert_logs(session, {action.id: action}, [
+            (action.id, today - timedelta(days=d), True) for d in range(35)
+        ])
+        action_logs.upsert_log(session, action, today - timedelta(days=3), False)
+        log = action_logs.upsert_log(session, action, today - timedelta(days=5), True)
+        action_logs.set_log_completed(session, action, log["id"], False)
+        action_logs.move_log(session, action, today + timedelta(days=2), old_date=today - timedelta(days=10))
+        session.commit()
+
+        _assert_bitmap_matches_logs(session, action.id)
+
+    def test_orm_writes_keep_bitmap_in_sync(self, bitmap_store, session, test_user):
+        action = _create_daily_action(session, test_user)
+        today = date.today()
+        logs = [
+            models.RecurringActionLog(recurring_action_id=action.id, date=today - timedelta(days=d), completed=True)
+            for d in range(5)
+        ]
+        session.add_all(logs)
+        session.commit()
+
+        logs[0].completed = False
+        logs[1].date = today + timedelta(days=1)
+        session.delete(logs[2])
+        session.commit()
+
+        _assert_bitmap_matches_logs(session, action.id)
+
+    def test_log_of_new_action_in_same_flush(self, bitmap_store, session, test_user):
+        action = _create_daily_action(session, test_user)
+        today = date.today()
+        new_action = models.RecurringAction(
+            milestone_id=action.milestone_id, title="New", weekdays=[1, 2, 3, 4, 5, 6, 7]
+        )
+        new_action.logs.append(models.RecurringActionLog(date=today, completed=True))
+        session.add(new_action)
+        session.commit()
+
+        assert new_action.completed_count == 1
+        _assert_bitmap_matches_logs(session, new_action.id)
+        assert completion_bitmap.load_completed_dates(session, [new_action.id], today, today) == {
+            new_action.id: {today}
+        }
+
+    def test_deleting_action_drops_bitmap(self, bitmap_store, session, test_user):
+        action = _create_daily_action(session, test_user)
+        action_logs.upsert_log(session, action, date.today(), True)
+        session.commit()
+        action_id = action.id
+
+        session.delete(action)
+        session.commit()
+
+        assert completion_bitmap.load_months(session, [action_id]) == {}
+
+    def test_rows_mode_does_not_write(self, session, test_user):
+        action = _create_daily_action(session, test_user)
+        today = date.today()
+
+        action_logs.upsert_logs(session, {action.id: action}, [
+            (action.id, today - timedelta(days=d), True) for d in range(10)
+        ])
+        session.add(models.RecurringActionLog(recurring_action_id=action.id, date=today + timedelta(days=1), completed=True))
+        session.commit()
+
+        assert completion_bitmap.load_months(session, [action.id]) == {}
+
+    def test_rebuild_from_logs(self, bitmap_store, session, test_user):
+        action = _create_daily_action(session, test_user)
+        today = date.today()
+        # Логи, записанные в режиме rows или мимо ORM и сервиса: карт для них нет
+        session.add_all(
+            models.RecurringActionLog(recurring_action_id=action.id, date=today - timedelta(days=d), completed=d % 2 == 0)
+            for d in range(30)
+        )
+        session.flush()
+        session.query(models.RecurringActionMonth).delete()
+        session.commit()
+
+        written = completion_bitmap.rebuild(session)
+
+        assert written >= 1
+        _assert_bitmap_matches_logs(session, action.id)
+
+
+class TestBitmapReads:
+    def test_counts_match_row_store(self, bitmap_store, session, test_user):
+        action = _create_daily_action(session, test_user)
+        today = date.today()
+        action_logs.upsert_logs(session, {action.id: action}, [
+            (action.id, today + timedelta(days=d), d % 3 != 0) for d in range(-60, 60)
+        ])
+        session.commit()
+        session.refresh(action)
+
+        assert completion_bitmap.load_completed_counts(session, [action.id]) == {action.id: action.completed_count}
+        assert load_completed_counts(session, [action.id]) == {action.id: action.completed_count}
+        assert check_action_counters(session) == []
+
+    def test_counter_check_reads_logs(self, bitmap_store, session, test_user):
+        action = _create_daily_action(session, test_user)
+        action_logs.upsert_log(session, action, date.today(), True)
+        session.query(models.RecurringActionMonth).delete()
+        session.commit()
+
+        # Счётчик сверяется с логами, а не с картами — repair не зацикливается
+        assert check_action_counters(session) == []
+
+        action.completed_count = 0
+        session.commit()
+        assert len(check_action_counters(session, repair=True)) == 1
+        assert check_action_counters(session) == []
+
+    def test_calendar_month_matches_row_store(self, auth_client, session, monkeypatch):
+        client, user = auth_client
+        action = _create_daily_action(session, user)
+        today = date.today()
+        monkeypatch.setattr(completion_bitmap, "COMPLETION_STORE", "bitmap")
+        action_logs.upsert_logs(session, {action.id: action}, [
+            (action.id, today - timedelta(days=d), d % 2 == 0) for d in range(20)
+        ])
+        session.commit()
+        url = f"/api/calendar/month?year={today.year}&month={today.month}"
+
+        from_bitmap = client.get(url)
+        monkeypatch.setattr(completion_bitmap, "COMPLETION_STORE", "rows")
+        from_rows = client.get(url, headers={"Cache-Control": "no-cache"})
+
+        assert from_bitmap.status_code == 200
+        assert from_bitmap.json() == from_rows.json()
@@ -0,0 +1,171 @@
+"""
+Сжатие ответов (app/compression.py): выбор кодировки по Accept-Encoding,
+порог размера и типы содержимого, пропуск 304 и потоковых ответов, метрики.
+"""
+import sys
+from datetime import date, timedelta
+
+import pytest
+from fastapi.responses import JSONResponse, Response
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app import compression, models
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def _create_goal_tree(session, user, milestones=10):
+    """Цель с вехами и ежедневными действиями — ответ /api/v2/goals/ в несколько КБ."""
+    today = date.today()
+    goal = models.Goal(
+        title="Goal", user_id=user.id,
+        start_date=today - timedelta(days=10), end_date=today + timedelta(days=10),
+    )
+    session.add(goal)
+    session.flush()
+    for i in range(milestones):
+        milestone = models.Milestone(
+            goal_id=goal.id, title=f"Milestone {i}",
+            start_date=today - timedelta(days=10), end_date=today + timedelta(days=10),
+        )
+        session.add(milestone)
+        session.flush()
+        session.add(models.RecurringAction(
+            milestone_id=milestone.id, title=f"Daily {i}", weekdays=[1, 2, 3, 4, 5, 6, 7]
+        ))
+    session.commit()
+    return goal
+
+
+class TestChooseEncoding:
+    @pytest.mark.parametrize("accept,expected", [
+        ("gzip, deflate, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "br"),
+        ("*;q=0.1, br;q=0", "gzip"),
+        ("identity", None),
+        ("", None),
+    ])
+    def test_q_values_and_server_preference(self, accept, expected):
+        assert compression.choose_encoding(accept, ("br", "gzip")) == expected
+
+    def test_brotli_requires_package(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, "brotli", None)
+
+        with pytest.raises(RuntimeError, match="brotli"):
+            compression.create_encoders("br")
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            compression.create_encoders("zstd")
+
+
+class TestCompressionMiddleware:
+    def test_large_json_is_gzipped(self, auth_client, session):
+        client, user = auth_client
+        _create_goal_tree(session, user)
+        plain = client.get("/api/v2/goals/", headers={"Accept-Encoding": "identity"})
+
+        response = client.get("/api/v2/goals/", headers=GZIP)
+
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.headers["etag"].startswith('W/"')
+        assert response.num_bytes_downloaded < len(plain.content)
+        assert response.json() == plain.json()
+        assert "content-encoding" not in plain.headers
+        assert "Accept-Encoding" in plain.headers["vary"]
+
+    def test_small_response_is_not_compressed(self, client):
+        response = client.get("/", headers=GZIP)
+
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert "Accept-Encoding" in response.headers["vary"]
+
+    @pytest.mark.parametrize("accept", ["gzip", "identity"])
+    def test_vary_merged_with_existing(self, accept):
+        payload = [{"goal_title": "Goal", "day": i} for i in range(200)]
+        app = compression.CompressionMiddleware(
+            JSONResponse(payload, headers={"Vary": "Origin"}), encoders=compression.create_encoders("gzip")
+        )
+
+        response = TestClient(app).get("/", headers={"Accept-Encoding": accept})
+
+        assert response.headers["vary"] == "Origin, Accept-Encoding"
+        assert response.json() == payload
+
+    def test_non_compressible_type_has_no_vary(self):
+        app = compression.CompressionMiddleware(
+            Response(b"x" * 4096, media_type="image/png"), encoders=compression.create_encoders("gzip")
+        )
+
+        response = TestClient(app).get("/", headers=GZIP)
+
+        assert "content-encoding" not in response.headers
+        assert "vary" not in response.headers
+
+    def test_not_modified_is_not_compressed(self, auth_client, session):
+        client, user = auth_client
+        _create_goal_tree(session, user)
+        etag = client.get("/api/v2/goals/", headers=GZIP).headers["etag"]
+
+        response = client.get("/api/v2/goals/", headers={**GZIP, "If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert "content-encoding" not in response.headers
+        assert response.content == b""
+
+    def test_stream_is_not_compressed(self, auth_client, session):
+        client, user = auth_client
+        _create_goal_tree(session, user)
+        today = date.today()
+
+        response = client.get(
+            f"/api/tasks/range/stream?start_date={today - timedelta(days=10)}"
+            f"&end_date={today + timedelta(days=10)}",
+            headers=GZIP,
+        )
+
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert len(response.text.splitlines()) == 10 * 21
+
+    def test_records_ratio_and_cpu_time(self, auth_client, session):
+        client, user = auth_client
+        _create_goal_tree(session, user)
+        before_count = _sample("http_response_compression_ratio_count", encoding="gzip")
+        before_in = _sample("http_response_compression_bytes_total", encoding="gzip", stage="uncompressed")
+        before_out = _sample("http_response_compression_bytes_total", encoding="gzip", stage="compressed")
+
+        response = client.get("/api/v2/goals/", headers=GZIP)
+
+        assert _sample("http_response_compression_ratio_count", encoding="gzip") == before_count + 1
+        assert _sample("http_response_compression_seconds_count", encoding="gzip") >= 1
+        uncompressed = _sample("http_response_compression_bytes_total", encoding="gzip", stage="uncompressed")
+        compressed = _sample("http_response_compression_bytes_total", encoding="gzip", stage="compressed")
+        assert uncompressed - before_in == len(response.content)
+        assert compressed - before_out == response.num_bytes_downloaded
+
+    def test_brotli_preferred_when_enabled(self):
+        pytest.importorskip("brotli")
+        payload = [{"goal_title": "Goal", "milestone_title": "Milestone", "day": i} for i in range(200)]
+        app = compression.CompressionMiddleware(
+            JSONResponse(payload), encoders=compression.create_encoders("br")
+        )
+        client = TestClient(app)
+
+        br = client.get("/", headers={"Accept-Encoding": "gzip, br"})
+        fallback = client.get("/", headers=GZIP)
+
+        assert br.headers["content-encoding"] == "br"
+        assert fallback.headers["content-encoding"] == "gzip"
+        assert br.json() == fallback.json() == payload
@@ -0,0 +1,167 @@
+"""
+Тесты условных GET-запросов (app/data_version.py): User.data_version растёт
+при записи, слабый ETag, If-None-Match -> 304 до загрузки данных.
+"""
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import event, text
+from app import models
+from app.counters import check_action_counters
+
+
+def _create_goal_with_action(session, user):
+    today = date.today()
+    goal = models.Goal(
+        title="Goal",
+        user_id=user.id,
+        start_date=today - timedelta(days=10),
+        end_date=today + timedelta(days=10),
+    )
+    session.add(goal)
+    session.flush()
+    milestone = models.Milestone(
+        goal_id=goal.id,
+        title="Milestone",
+        start_date=today - timedelta(days=10),
+        end_date=today + timedelta(days=10),
+    )
+    session.add(milestone)
+    session.flush()
+    action = models.RecurringAction(
+        milestone_id=milestone.id, title="Daily", weekdays=[1, 2, 3, 4, 5, 6, 7]
+    )
+    session.add(action)
+    session.commit()
+    return goal, action
+
+
+def _data_version(session, user):
+    return session.execute(
+        text("SELECT data_version FROM users WHERE id = :id"), {"id": user.id}
+    ).scalar_one()
+
+
+READ_URLS = [
+    "/api/v2/goals/",
+    "/api/tasks/range?start_date={today}&end_date={today}",
+    "/api/calendar/month?year={year}&month={month}",
+    "/api/calendar/day/{today}",
+    "/api/calendar/timeline?year={year}&month={month}",
+    "/todos/",
+    "/auth/me",
+]
+
+
+def _url(template):
+    today = date.today()
+    return template.format(today=today.isoformat(), year=today.year, month=today.month)
+
+
+class TestDataVersion:
+    def test_bumped_in_write_transaction(self, auth_client, session):
+        client, user = auth_client
+        goal, action = _create_goal_with_action(session, user)
+        client.get("/api/v2/goals/")  # проставляет пользователя сессии
+        before = _data_version(session, user)
+
+        response = client.post(
+            f"/api/v2/goals/recurring-actions/{action.id}/log",
+            json={"date": str(date.today()), "completed": True},
+        )
+        assert response.status_code == 201
+        after_log = _data_version(session, user)
+        assert after_log > before
+
+        client.put(f"/api/v2/goals/{goal.id}", json={"title": "Renamed"})
+        assert _data_version(session, user) > after_log
+
+    def test_reads_do_not_bump(self, auth_client, session):
+        client, user = auth_client
+        _create_goal_with_action(session, user)
+        client.get("/api/v2/goals/")
+        before = _data_version(session, user)
+
+        for template in READ_URLS:
+            client.get(_url(template))
+
+        assert _data_version(session, user) == before
+
+    def test_counter_repair_bumps_owner(self, session, test_user):
+        _, action = _create_goal_with_action(session, test_user)
+        before = _data_version(session, test_user)
+        session.execute(
+            text("UPDATE recurring_actions SET completed_count = 5 WHERE id = :id"),
+            {"id": action.id},
+        )
+        session.commit()
+
+        check_action_counters(session, repair=True)
+
+        assert _data_version(session, test_user) == before + 1
+
+
+class TestConditionalGet:
+    @pytest.mark.parametrize("template", READ_URLS)
+    def test_weak_etag_and_304(self, auth_client, session, template):
+        client, user = auth_client
+        _create_goal_with_action(session, user)
+
+        response = client.get(_url(template))
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert etag.startswith('W/"')
+        assert "no-cache" in response.headers["cache-control"]
+
+        not_modified = client.get(_url(template), headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+
+    def test_304_skips_data_loading(self, auth_client, session):
+        client, user = auth_client
+        _create_goal_with_action(session, user)
+        etag = client.get("/api/v2/goals/").headers["etag"]
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = session.get_bind()
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.get("/api/v2/goals/", headers={"If-None-Match": etag})
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        assert response.status_code == 304
+        assert not any("goals" in s and "users" not in s for s in statements)
+
+    def test_write_changes_etag(self, auth_client, session):
+        client, user = auth_client
+        _, action = _create_goal_with_action(session, user)
+        etag = client.get("/api/calendar/month?year=2026&month=3").headers["etag"]
+
+        client.put(
+            f"/api/tasks/{action.id}/complete",
+            json={"type": "recurring", "date": str(date.today()), "completed": True},
+        )
+
+        response = client.get(
+            "/api/calendar/month?year=2026&month=3", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    def test_if_none_match_list_and_strong_form(self, auth_client):
+        client, _ = auth_client
+        etag = client.get("/todos/").headers["etag"]
+        strong = etag.removeprefix("W/")
+
+        response = client.get("/todos/", headers={"If-None-Match": f'"other", {strong}'})
+        assert response.status_code == 304
+
+    def test_writes_have_no_etag(self, auth_client):
+        client, _ = auth_client
+        response = client.post("/todos/", json={"title": "Todo"})
+        assert "etag" not in response.headers
@@ -0,0 +1,181 @@
+"""
+Тесты плана загрузки дерева цели (goal_tree_options):
+число SQL-запросов не растёт вместе с количеством целей, вех и действий;
+прогресс каждого действия и вехи считается за запрос один раз (ProgressContext).
+"""
+import pytest
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, timedelta
+from sqlalchemy import event
+from app import models
+from app.routers import goals_v2
+
+
+@contextmanager
+def _count_queries(session):
+    """Подсчитать SELECT-запросы, выполненные через движок сессии."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _create_goal_tree(session, user, milestones=1, actions=1, logs=1):
+    """Создать цель с вехами, регулярными/однократными действиями и логами."""
+    today = date.today()
+    goal = models.Goal(
+        title="Tree goal",
+        user_id=user.id,
+        start_date=today - timedelta(days=30),
+        end_date=today + timedelta(days=60),
+    )
+    session.add(goal)
+    session.flush()
+    for m in range(milestones):
+        milestone = models.Milestone(
+            goal_id=goal.id,
+            title=f"Milestone {m}",
+            start_date=today - timedelta(days=20),
+            end_date=today + timedelta(days=20),
+        )
+        session.add(milestone)
+        session.flush()
+        for a in range(actions):
+            action = models.RecurringAction(
+                milestone_id=milestone.id,
+                title=f"Action {a}",
+                weekdays=[1, 2, 3, 4, 5, 6, 7],
+            )
+            session.add(action)
+            session.flush()
+            for i in range(logs):
+                session.add(
+                    models.RecurringActionLog(
+                        recurring_action_id=action.id,
+                        date=today - timedelta(days=i + 1),
+                        completed=True,
+                    )
+                )
+            session.add(
+                models.OneTimeAction(
+                    milestone_id=milestone.id,
+                    title=f"One-time {a}",
+                    deadline=today + timedelta(days=5),
+                )
+            )
+    session.commit()
+    return goal
+
+
+class TestGoalTreeQueryCount:
+    @pytest.mark.parametrize(
+        "url",
+        ["/api/v2/goals/", "/api/v2/goals/{goal_id}", "/api/v2/goals/{goal_id}/milestones",
+         "/api/v2/goals/{goal_id}/progress"],
+    )
+    def test_query_count_constant_as_tree_grows(self, auth_client, session, url):
+        client, user = auth_client
+        client.get("/auth/me")  # снимок пользователя кэшируется (app/auth.py)
+        goal = _create_goal_tree(session, user)
+
+        with _count_queries(session) as small:
+            assert client.get(url.format(goal_id=goal.id)).status_code == 200
+
+        # Дерево растёт во всех измерениях
+        goal = _create_goal_tree(session, user, milestones=3, actions=4, logs=5)
+        _create_goal_tree(session, user, milestones=2, actions=3, logs=2)
+
+        with _count_queries(session) as large:
+            assert client.get(url.format(goal_id=goal.id)).status_code == 200
+
+        assert len(large) == len(small)
+
+
+class TestGoalTreeFiltering:
+    def test_archived_and_deleted_filtered(self, auth_client, session):
+        client, user = auth_client
+        goal = _create_goal_tree(session, user, milestones=2, actions=2)
+        archived_ms = goal.milestones[0]
+        archived_ms.is_archived = True
+        active_ms = goal.milestones[1]
+        active_ms.recurring_actions[0].is_deleted = True
+        active_ms.one_time_actions[0].is_deleted = True
+        session.commit()
+
+        response = client.get(f"/api/v2/goals/{goal.id}")
+        assert response.status_code == 200
+        milestones = response.json()["milestones"]
+        assert [ms["id"] for ms in milestones] == [active_ms.id]
+        assert len(milestones[0]["recurring_actions"]) == 1
+        assert len(milestones[0]["one_time_actions"]) == 1
+
+    def test_list_milestones_keeps_archived(self, auth_client, session):
+        client, user = auth_client
+        goal = _create_goal_tree(session, user, milestones=2)
+        goal.milestones[0].is_archived = True
+        session.commit()
+
+        response = client.get(f"/api/v2/goals/{goal.id}/milestones")
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+
+class TestProgressComputedOnce:
+    @pytest.fixture
+    def calls(self, monkeypatch):
+        """Счётчик вызовов расчёта прогресса действий и вех по id."""
+        calls = {"action": Counter(), "milestone": Counter()}
+        action_progress = goals_v2.calculate_recurring_action_progress
+        milestone_progress = goals_v2.calculate_milestone_progress
+
+        def count_action(action, *args, **kwargs):
+            calls["action"][action.id] += 1
+            return action_progress(action, *args, **kwargs)
+
+        def count_milestone(milestone, *args, **kwargs):
+            calls["milestone"][milestone.id] += 1
+            return milestone_progress(milestone, *args, **kwargs)
+
+        monkeypatch.setattr(goals_v2, "calculate_recurring_action_progress", count_action)
+        monkeypatch.setattr(goals_v2, "calculate_milestone_progress", count_milestone)
+        return calls
+
+    @pytest.mark.parametrize(
+        "url",
+        ["/api/v2/goals/", "/api/v2/goals/{goal_id}", "/api/v2/goals/{goal_id}/progress",
+         "/api/calendar/timeline?year={year}&month={month}"],
+    )
+    def test_each_action_and_milestone_once(self, auth_client, session, calls, url):
+        client, user = auth_client
+        goal = _create_goal_tree(session, user, milestones=2, actions=3)
+        today = date.today()
+
+        response = client.get(url.format(goal_id=goal.id, year=today.year, month=today.month))
+
+        assert response.status_code == 200
+        assert len(calls["milestone"]) == 2
+        assert set(calls["milestone"].values()) == {1}
+        assert len(calls["action"]) == 6
+        assert set(calls["action"].values()) == {1}
+
+    def test_complete_task_reuses_recalculated_progress(self, auth_client, session, calls):
+        client, user = auth_client
+        goal = _create_goal_tree(session, user, milestones=1, actions=2)
+        action_id = goal.milestones[0].recurring_actions[0].id
+
+        response = client.put(
+            f"/api/tasks/{action_id}/complete",
+            json={"type": "recurring", "date": str(date.today()), "completed": True},
+        )
+
+        assert response.status_code == 200
+        assert calls["action"][action_id] == 1
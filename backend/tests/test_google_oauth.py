@@ -1,8 +1,14 @@
 """Тесты Этап 8: Google OAuth callback, профиль /auth/me, полный flow."""
 
+import asyncio
+import time
+import httpx
 import pytest
 from unittest.mock import AsyncMock, patch
-from app import models, auth
+from app import models, auth, oauth
+from app.database import get_db
+from app.main import app
+from tests.conftest import TestingSessionLocal
 
 
 MOCK_GOOGLE_USERINFO = {
@@ -144,6 +150,54 @@ class TestGoogleCallbackNoUserInfo:
         assert "Failed to get user info" in r.json()["detail"]
 
 
+class TestGoogleCallbackConcurrency:
+    """Работа callback с БД не блокирует event loop: другие запросы обслуживаются."""
+
+    SLOW_SECONDS = 0.5
+
+    @patch("app.routers.auth.oauth.google.authorize_access_token", new_callable=AsyncMock)
+    def test_other_requests_served_during_slow_callback(self, mock_token, test_user, auth_headers):
+        mock_token.return_value = {"userinfo": MOCK_GOOGLE_USERINFO}
+
+        def slow_login(db, user_info):
+            time.sleep(self.SLOW_SECONDS)  # медленная БД
+            return oauth.login_google_user(db, user_info)
+
+        def override_get_db():
+            # Свой Session на запрос: запросы выполняются параллельно
+            session = TestingSessionLocal()
+            try:
+                yield session
+            finally:
+                session.close()
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                started = time.perf_counter()
+                callback = asyncio.create_task(client.get("/auth/google/callback"))
+                await asyncio.sleep(0.05)  # callback уже ждёт БД
+                fast = await asyncio.gather(*(
+                    client.get("/auth/me", headers=auth_headers) for _ in range(5)
+                ))
+                fast_elapsed = time.perf_counter() - started
+                callback_done = callback.done()
+                slow = await callback
+            return fast, fast_elapsed, callback_done, slow
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            with patch("app.routers.auth.login_google_user", slow_login):
+                fast, fast_elapsed, callback_done, slow = asyncio.run(scenario())
+        finally:
+            app.dependency_overrides.clear()
+
+        assert all(r.status_code == 200 for r in fast)
+        assert not callback_done
+        assert fast_elapsed < self.SLOW_SECONDS
+        assert slow.status_code == 307
+
+
 class TestGetMe:
     """GET /auth/me возвращает профиль."""
 
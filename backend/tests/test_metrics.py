@@ -0,0 +1,114 @@
+"""
+Метрики Prometheus (app/metrics.py): /metrics, гистограммы по шаблону
+маршрута, метрики пулов, кэша и расчёта прогресса.
+"""
+import time
+from datetime import date
+
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app import database, metrics
+from app.routers import goals_v2
+from tests.conftest import SQLALCHEMY_DATABASE_URL
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetricsEndpoint:
+    def test_exposition_format(self, client):
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        for name in (
+            "# TYPE http_request_duration_seconds histogram",
+            "http_requests_in_progress",
+            "threadpool_threads_total",
+            "threadpool_threads_busy",
+            "password_hash_in_flight",
+            "response_cache_entries",
+        ):
+            assert name in body
+
+    def test_latency_by_route_template(self, client, auth_headers, sample_goal):
+        labels = {"method": "GET", "route": "/api/v2/goals/{goal_id}", "status": "200"}
+        before = _sample("http_request_duration_seconds_count", **labels)
+        queries_before = _sample("http_request_db_queries_count", route="/api/v2/goals/{goal_id}")
+
+        client.get(f"/api/v2/goals/{sample_goal.id}", headers=auth_headers)
+        client.get(f"/api/v2/goals/{sample_goal.id}", headers=auth_headers)
+
+        assert _sample("http_request_duration_seconds_count", **labels) == before + 2
+        assert _sample("http_request_db_queries_count", route="/api/v2/goals/{goal_id}") == queries_before + 2
+        assert f'route="/api/v2/goals/{sample_goal.id}"' not in client.get("/metrics").text
+
+    def test_unmatched_paths_share_label(self, client):
+        labels = {"method": "GET", "route": "unmatched", "status": "404"}
+        before = _sample("http_request_duration_seconds_count", **labels)
+
+        client.get("/no-such-path/1")
+        client.get("/no-such-path/2")
+
+        assert _sample("http_request_duration_seconds_count", **labels) == before + 2
+
+    def test_token_required_when_configured(self, client, monkeypatch):
+        monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-secret")
+
+        assert client.get("/metrics").status_code == 401
+        response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+        assert response.status_code == 200
+
+
+class TestRuntimeMetrics:
+    def test_progress_and_cache(self, client, auth_headers, sample_goal):
+        today = date.today()
+        progress_before = _sample("progress_compute_seconds_count", level="goal")
+        url = f"/api/calendar/month?year={today.year}&month={today.month}"
+
+        client.get(f"/api/v2/goals/{sample_goal.id}/progress", headers=auth_headers)
+        client.get(url, headers=auth_headers)
+        client.get(url, headers=auth_headers)
+
+        assert _sample("progress_compute_seconds_count", level="goal") > progress_before
+        assert _sample("response_cache_hits_total", namespace="calendar-month") >= 1
+        assert _sample("response_cache_hit_ratio", namespace="calendar-month") > 0
+
+    def test_goal_progress_excludes_milestone_time(self, client, auth_headers, sample_milestone, monkeypatch):
+        original = goals_v2.calculate_milestone_progress
+
+        def slow_milestone(*args, **kwargs):
+            time.sleep(0.05)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(goals_v2, "calculate_milestone_progress", slow_milestone)
+        goal_before = _sample("progress_compute_seconds_sum", level="goal")
+        count_before = _sample("progress_compute_seconds_count", level="goal")
+
+        response = client.get(f"/api/v2/goals/{sample_milestone.goal_id}/progress", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert _sample("progress_compute_seconds_count", level="goal") == count_before + 1
+        assert _sample("progress_compute_seconds_sum", level="goal") - goal_before < 0.05
+
+    def test_pool_wait_and_checkout(self):
+        engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=database.TimedQueuePool, pool_size=1)
+        before = _sample("db_pool_wait_seconds_count")
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                assert engine.pool.checkedout() == 1
+        finally:
+            engine.dispose()
+
+        assert _sample("db_pool_wait_seconds_count") == before + 1
+
+    def test_engine_options(self):
+        assert database._engine_options("sqlite://") == {}
+        options = database._engine_options("postgresql://u:p@db/app")
+        assert options["poolclass"] is database.TimedQueuePool
+        assert options["pool_size"] == database.DB_POOL_SIZE
+        assert database._engine_options("postgresql+asyncpg://u:p@db/app")["poolclass"] is database.TimedAsyncQueuePool
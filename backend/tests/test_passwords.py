@@ -0,0 +1,126 @@
+"""
+Хэширование паролей в ограниченном пуле (app/passwords.py):
+быстрый отказ при заполненной очереди, пересчёт хэша при смене стоимости.
+"""
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from app import models, auth, passwords
+
+
+def _context(rounds):
+    return CryptContext(
+        schemes=["bcrypt"],
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+class TestPasswordHasher:
+    def test_rejects_when_queue_full(self):
+        hasher = passwords.PasswordHasher(workers=1, max_queue=1, processes=False)
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.ensure_future(hasher.run(release.wait))
+            queued = asyncio.ensure_future(hasher.run(release.wait))
+            await asyncio.sleep(0.05)
+            assert hasher.stats()["queued"] == 1
+            with pytest.raises(passwords.PasswordQueueFull):
+                await hasher.run(release.wait)
+            release.set()
+            await asyncio.gather(running, queued)
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            release.set()
+            hasher.shutdown()
+
+        stats = hasher.stats()
+        assert stats["rejected"] == 1
+        assert stats["completed"] == 2
+        assert stats["peak_queued"] == 1
+        assert stats["in_flight"] == 0
+
+    def test_failed_job_is_not_completed(self):
+        hasher = passwords.PasswordHasher(workers=1, max_queue=1, processes=False)
+
+        def broken():
+            raise ValueError("bad hash")
+
+        try:
+            with pytest.raises(ValueError):
+                asyncio.run(hasher.run(broken))
+            asyncio.run(hasher.run(passwords.hash_password, "secret"))
+        finally:
+            hasher.shutdown()
+
+        stats = hasher.stats()
+        assert stats["failed"] == 1
+        assert stats["completed"] == 1
+        assert stats["in_flight"] == 0
+
+    def test_process_pool(self):
+        hasher = passwords.PasswordHasher(workers=1, max_queue=1, processes=True)
+        try:
+            hashed = asyncio.run(hasher.run(passwords.hash_password, "secret"))
+            valid, new_hash = asyncio.run(hasher.run(passwords.verify_and_update, "secret", hashed))
+        finally:
+            hasher.shutdown()
+
+        assert valid is True
+        assert new_hash is None
+        assert hasher.stats()["mode"] == "process"
+
+
+class TestLoginPasswords:
+    def test_login_rehashes_on_cost_change(self, client, db, monkeypatch):
+        user = models.User(email="cost@test.com", hashed_password=_context(4).hash("pass123"))
+        db.add(user)
+        db.commit()
+        monkeypatch.setattr(passwords, "pwd_context", _context(5))
+
+        response = client.post("/auth/login", data={"username": "cost@test.com", "password": "pass123"})
+
+        assert response.status_code == 200
+        db.refresh(user)
+        assert user.hashed_password.startswith("$2b$05$")
+        assert passwords.pwd_context.verify("pass123", user.hashed_password)
+
+    def test_wrong_password_keeps_hash(self, client, db, monkeypatch):
+        old_hash = _context(4).hash("pass123")
+        user = models.User(email="cost@test.com", hashed_password=old_hash)
+        db.add(user)
+        db.commit()
+        monkeypatch.setattr(passwords, "pwd_context", _context(5))
+
+        response = client.post("/auth/login", data={"username": "cost@test.com", "password": "wrong"})
+
+        assert response.status_code == 401
+        db.refresh(user)
+        assert user.hashed_password == old_hash
+
+    def test_full_queue_returns_503(self, client, test_user, monkeypatch):
+        monkeypatch.setattr(passwords, "hasher", passwords.PasswordHasher(workers=0, max_queue=0))
+
+        login = client.post("/auth/login", data={"username": test_user.email, "password": "password123"})
+        register = client.post("/auth/register", json={"email": "new@test.com", "password": "pass123"})
+
+        assert login.status_code == 503
+        assert login.headers["retry-after"] == "1"
+        assert register.status_code == 503
+
+    def test_stats_endpoint(self, client, db, test_user, auth_headers):
+        test_user.role = "admin"
+        db.commit()
+        auth.invalidate_user(test_user.email)
+
+        response = client.get("/api/admin/password-hash-stats", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert {"in_flight", "queued", "rejected", "completed", "failed"} <= response.json().keys()
@@ -228,3 +228,20 @@ def test_progress_rounding(auth_client, session):
     data = response.json()
     # Проверяем что прогресс около 33.33%
     assert 33.0 <= data[0]["progress"] <= 34.0
+
+def test_goal_progress_response_shape(client, auth_headers, sample_goal, recurring_action, onetime_action):
+    """GET /api/v2/goals/{id}/progress сериализуется по GoalProgressResponse"""
+    response = client.get(f"/api/v2/goals/{sample_goal.id}/progress", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["goal_id"] == sample_goal.id
+    assert data["overall_progress"] == 0.0
+    milestone = data["milestones"][0]
+    assert milestone["recurring_actions"][0]["id"] == recurring_action.id
+    assert milestone["recurring_actions"][0]["target_percent"] == 80
+    assert milestone["one_time_actions"] == [{
+        "id": onetime_action.id,
+        "title": "Купить кроссовки",
+        "completed": False,
+        "deadline": onetime_action.deadline.isoformat(),
+    }]
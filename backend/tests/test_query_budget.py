@@ -0,0 +1,89 @@
+"""
+Счётчик запросов к БД (app/instrumentation.py): потолки числа SQL-запросов
+на горячих эндпоинтах, заголовок Server-Timing, лог превышения бюджета.
+"""
+import logging
+import re
+from datetime import date
+
+import pytest
+
+from app import auth, instrumentation
+from benchmarks.seed import seed_user
+from benchmarks.suite import build_cases
+
+# Потолки с запасом в 1–2 запроса: рост сверх них — N+1 или лишняя загрузка
+QUERY_CEILINGS = {
+    "list_goals": 5,
+    "get_goal_progress": 5,
+    "calendar_month": 7,
+    "calendar_day": 7,
+    "calendar_timeline": 6,
+    "upcoming_deadlines": 5,
+    "tasks_range": 5,
+}
+
+SERVER_TIMING = re.compile(r'^db;dur=[\d.]+, app;dur=[\d.]+, queries;desc="(\d+)"$')
+
+
+@pytest.fixture
+def heavy_client(client, db):
+    """Клиент пользователя с деревом целей и историей логов; кэш пользователя прогрет."""
+    user = seed_user(db, "heavy@example.com", hashed_password="x",
+                     goals=3, milestones=2, recurring=3, onetime=2, years=1)
+    client.headers["Authorization"] = f"Bearer {auth.create_access_token(data=auth.token_claims(user))}"
+    assert client.get("/auth/me").status_code == 200
+    return client, build_cases(user.goals[0].id, date.today())
+
+
+class TestQueryCeilings:
+    @pytest.mark.parametrize("case", sorted(QUERY_CEILINGS))
+    def test_endpoint_within_ceiling(self, heavy_client, query_counter, case):
+        client, cases = heavy_client
+
+        with query_counter() as queries:
+            response = client.get(cases[case])
+
+        assert response.status_code == 200
+        assert 0 < queries.count <= QUERY_CEILINGS[case]
+
+
+class TestServerTiming:
+    def test_header_matches_counter(self, heavy_client, query_counter):
+        client, cases = heavy_client
+
+        with query_counter() as queries:
+            response = client.get(cases["list_goals"])
+
+        match = SERVER_TIMING.match(response.headers["server-timing"])
+        assert match
+        assert int(match.group(1)) == queries.count
+
+    def test_nested_counters(self, heavy_client, query_counter):
+        client, cases = heavy_client
+
+        with query_counter() as outer:
+            with query_counter() as inner:
+                client.get(cases["list_goals"])
+            client.get(cases["tasks_range"])
+
+        assert 0 < inner.count < outer.count
+
+    def test_over_budget_is_logged(self, heavy_client, monkeypatch, caplog):
+        client, cases = heavy_client
+        monkeypatch.setattr(instrumentation, "REQUEST_QUERY_BUDGET", 1)
+
+        with caplog.at_level(logging.WARNING, logger="app.instrumentation"):
+            client.get(cases["list_goals"])
+
+        assert len(caplog.records) == 1
+        assert "GET /api/v2/goals/" in caplog.records[0].getMessage()
+        assert "queries" in caplog.records[0].getMessage()
+
+    def test_within_budget_not_logged(self, heavy_client, caplog):
+        client, cases = heavy_client
+
+        with caplog.at_level(logging.WARNING, logger="app.instrumentation"):
+            client.get(cases["tasks_range"])
+
+        assert caplog.records == []
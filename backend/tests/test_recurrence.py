@@ -0,0 +1,145 @@
+"""
+Тесты арифметики повторений (app/recurrence.py).
+Property-based: сравнение с наивным перебором по дням.
+"""
+import json
+from datetime import date, timedelta
+
+from hypothesis import given, strategies as st
+
+from app import models
+from app.recurrence import (
+    count_weekday_occurrences,
+    iter_weekday_occurrences,
+    mask_to_weekdays,
+    range_weekday_mask,
+    weekdays_to_mask,
+)
+
+
+def _naive_dates(start_date, end_date, weekdays):
+    """Эталон: прежний цикл по каждому дню диапазона."""
+    result = []
+    current = start_date
+    while current <= end_date:
+        if (current.weekday() + 1) in weekdays:
+            result.append(current)
+        current += timedelta(days=1)
+    return result
+
+
+dates = st.dates(min_value=date(2000, 1, 1), max_value=date(2100, 12, 31))
+weekday_lists = st.lists(st.integers(min_value=1, max_value=7), max_size=10)
+spans = st.integers(min_value=-10, max_value=3 * 366)
+
+
+@given(start=dates, span=spans, weekdays=weekday_lists)
+def test_count_matches_naive_loop(start, span, weekdays):
+    end = start + timedelta(days=span)
+    assert count_weekday_occurrences(start, end, weekdays) == len(
+        _naive_dates(start, end, weekdays)
+    )
+
+
+@given(start=dates, span=spans)
+def test_range_mask_matches_naive_loop(start, span):
+    end = start + timedelta(days=span)
+    assert range_weekday_mask(start, end) == weekdays_to_mask(
+        d.isoweekday() for d in _naive_dates(start, end, range(1, 8))
+    )
+
+
+@given(start=dates, span=spans, weekdays=weekday_lists)
+def test_iter_matches_naive_loop(start, span, weekdays):
+    end = start + timedelta(days=span)
+    assert list(iter_weekday_occurrences(start, end, weekdays)) == _naive_dates(
+        start, end, weekdays
+    )
+
+
+class TestCountWeekdayOccurrences:
+    def test_single_day(self):
+        monday = date(2026, 2, 16)
+        assert count_weekday_occurrences(monday, monday, [1]) == 1
+        assert count_weekday_occurrences(monday, monday, [2]) == 0
+
+    def test_end_before_start(self):
+        assert count_weekday_occurrences(date(2026, 2, 16), date(2026, 2, 15), [1, 2]) == 0
+
+    def test_empty_weekdays(self):
+        assert count_weekday_occurrences(date(2026, 1, 1), date(2026, 12, 31), []) == 0
+
+    def test_full_year_every_day(self):
+        assert count_weekday_occurrences(
+            date(2024, 1, 1), date(2024, 12, 31), [1, 2, 3, 4, 5, 6, 7]
+        ) == 366
+
+    def test_duplicates_counted_once(self):
+        monday = date(2026, 2, 16)
+        assert count_weekday_occurrences(monday, monday + timedelta(days=13), [1, 1, 3]) == 4
+
+
+def test_weekdays_to_mask():
+    assert weekdays_to_mask([]) == 0
+    assert weekdays_to_mask([1]) == 0b1
+    assert weekdays_to_mask([1, 3, 5]) == 0b10101
+    assert weekdays_to_mask([7]) == 0b1000000
+
+
+def test_mask_to_weekdays():
+    assert mask_to_weekdays(0) == []
+    assert mask_to_weekdays(0b10101) == [1, 3, 5]
+    assert mask_to_weekdays(0b1000001) == [1, 7]
+    for mask in range(128):
+        assert weekdays_to_mask(mask_to_weekdays(mask)) == mask
+
+
+class TestWeekdayMaskColumn:
+    def _create_actions(self, session, user):
+        goal = models.Goal(user_id=user.id, title="Goal")
+        session.add(goal)
+        session.flush()
+        milestone = models.Milestone(
+            goal_id=goal.id, title="Milestone",
+            start_date=date(2026, 3, 1), end_date=date(2026, 3, 31),
+        )
+        session.add(milestone)
+        session.flush()
+        actions = {
+            weekdays: models.RecurringAction(milestone_id=milestone.id, title=str(weekdays), weekdays=list(weekdays))
+            for weekdays in [(1, 3, 5), (6, 7), (2,)]
+        }
+        session.add_all(actions.values())
+        session.commit()
+        return actions
+
+    def test_round_trip(self, auth_client, session):
+        _, user = auth_client
+        actions = self._create_actions(session, user)
+        session.expire_all()
+
+        action = session.get(models.RecurringAction, actions[(1, 3, 5)].id)
+
+        assert type(action.weekdays) is list
+        assert action.weekdays == [1, 3, 5]
+        assert json.dumps(action.weekdays) == "[1, 3, 5]"
+
+    def test_assignment_is_normalized(self, auth_client, session):
+        _, user = auth_client
+        action = self._create_actions(session, user)[(2,)]
+
+        action.weekdays = [5, 1, 3, 3]
+
+        assert action.weekdays == [1, 3, 5]
+
+    def test_active_on_filters_in_sql(self, auth_client, session):
+        _, user = auth_client
+        self._create_actions(session, user)
+
+        def titles(mask):
+            rows = session.query(models.RecurringAction.title).filter(models.RecurringAction.active_on(mask))
+            return sorted(title for title, in rows)
+
+        assert titles(weekdays_to_mask([3])) == ["(1, 3, 5)"]
+        assert titles(weekdays_to_mask([6, 2])) == ["(2,)", "(6, 7)"]
+        assert titles(weekdays_to_mask([4])) == []
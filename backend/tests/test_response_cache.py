@@ -0,0 +1,151 @@
+"""
+Тесты кэша ответов календаря (app/cache.py): попадания, инвалидация по
+User.data_version при записи, изоляция пользователей, LRU-бэкенд.
+"""
+import pytest
+from datetime import date, timedelta
+from app import models, auth, cache
+
+
+MONTH_URL = "/api/calendar/month?year={year}&month={month}"
+
+
+def _create_goal_with_action(session, user):
+    """Цель с вехой [-10; +10] дней и ежедневным действием."""
+    today = date.today()
+    goal = models.Goal(
+        title="Goal",
+        user_id=user.id,
+        start_date=today - timedelta(days=10),
+        end_date=today + timedelta(days=10),
+    )
+    session.add(goal)
+    session.flush()
+    milestone = models.Milestone(
+        goal_id=goal.id,
+        title="Milestone",
+        start_date=today - timedelta(days=10),
+        end_date=today + timedelta(days=10),
+    )
+    session.add(milestone)
+    session.flush()
+    action = models.RecurringAction(
+        milestone_id=milestone.id, title="Daily", weekdays=[1, 2, 3, 4, 5, 6, 7]
+    )
+    session.add(action)
+    session.commit()
+    return goal, milestone, action
+
+
+def _today_brief(client):
+    today = date.today()
+    days = client.get(MONTH_URL.format(year=today.year, month=today.month)).json()["days"]
+    return next(d for d in days if d["date"] == today.isoformat())
+
+
+def _month_stats():
+    return cache.stats()["namespaces"]["calendar-month"]
+
+
+class TestCalendarCache:
+    def test_repeated_request_is_hit(self, auth_client, session):
+        client, user = auth_client
+        _create_goal_with_action(session, user)
+
+        first = _today_brief(client)
+        second = _today_brief(client)
+
+        assert first == second
+        assert _month_stats()["misses"] == 1
+        assert _month_stats()["hits"] == 1
+
+    def test_params_are_part_of_key(self, auth_client, session):
+        client, user = auth_client
+        goal, _, _ = _create_goal_with_action(session, user)
+
+        client.get(f"/api/calendar/month?year=2026&month=3&goal_ids={goal.id},999")
+        client.get(f"/api/calendar/month?year=2026&month=3&goal_ids=999,{goal.id}")
+        client.get("/api/calendar/month?year=2026&month=3&include_archived=true")
+        client.get("/api/calendar/month?year=2026&month=4")
+
+        assert _month_stats() == {"hits": 1, "misses": 3, "hit_ratio": 0.25}
+
+    @pytest.mark.parametrize("via", ["goals_v2", "tasks"])
+    def test_write_invalidates(self, auth_client, session, via):
+        client, user = auth_client
+        _, _, action = _create_goal_with_action(session, user)
+        today = date.today()
+        assert _today_brief(client)["tasks_completed"] == 0
+
+        if via == "goals_v2":
+            response = client.post(
+                f"/api/v2/goals/recurring-actions/{action.id}/log",
+                json={"date": str(today), "completed": True},
+            )
+        else:
+            response = client.put(
+                f"/api/tasks/{action.id}/complete",
+                json={"type": "recurring", "date": str(today), "completed": True},
+            )
+        assert response.status_code in (200, 201)
+
+        assert _today_brief(client)["tasks_completed"] == 1
+        assert _month_stats()["hits"] == 0
+
+    def test_timeline_invalidated_by_goal_update(self, auth_client, session):
+        client, user = auth_client
+        goal, _, _ = _create_goal_with_action(session, user)
+        today = date.today()
+        url = f"/api/calendar/timeline?year={today.year}&month={today.month}"
+        assert client.get(url).json()["goals"][0]["title"] == "Goal"
+
+        client.put(f"/api/v2/goals/{goal.id}", json={"title": "Renamed"})
+
+        assert client.get(url).json()["goals"][0]["title"] == "Renamed"
+
+    def test_users_isolated(self, auth_client, client, session):
+        _, user = auth_client
+        _create_goal_with_action(session, user)
+        assert _today_brief(client)["tasks_total"] == 1
+
+        other = models.User(email="other@example.com", hashed_password=auth.get_password_hash("x"))
+        session.add(other)
+        session.commit()
+        token = auth.create_access_token(data={"sub": other.email})
+        client.headers.update({"Authorization": f"Bearer {token}"})
+
+        assert _today_brief(client)["tasks_total"] == 0
+
+
+class TestCacheStatsEndpoint:
+    def test_admin_only(self, auth_client, session):
+        client, user = auth_client
+        assert client.get("/api/admin/cache-stats").status_code == 403
+
+        user.role = "admin"
+        session.commit()
+        auth.invalidate_user(user.email)  # роль — в кэшированном снимке пользователя
+        response = client.get("/api/admin/cache-stats")
+        assert response.status_code == 200
+        assert response.json()["backend"] == "memory"
+
+
+class TestLRUBackend:
+    def test_evicts_least_recently_used(self):
+        backend = cache.LRUBackend(max_entries=2, ttl=60)
+        backend.set("a", "1")
+        backend.set("b", "2")
+        assert backend.get("a") == "1"
+        backend.set("c", "3")
+
+        assert backend.get("b") is None
+        assert backend.get("a") == "1"
+        assert backend.get("c") == "3"
+
+    def test_expired_entry_is_miss(self):
+        backend = cache.LRUBackend(max_entries=2, ttl=-1)
+        backend.set("a", "1")
+
+        assert backend.get("a") is None
+        assert backend.size() == 0
+
@@ -0,0 +1,103 @@
+"""
+Тесты фоновой финализации действий с истёкшим периодом (app/sweeper.py).
+"""
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import event
+from app import models, auth
+from app.sweeper import finalize_expired_actions
+
+
+def _create_action(session, user, days_ago_end=1, logs=10, target_percent=80, is_deleted=False):
+    """Действие на каждый день в вехе [end-9; end], где end = today - days_ago_end."""
+    today = date.today()
+    end = today - timedelta(days=days_ago_end)
+    start = end - timedelta(days=9)
+    goal = models.Goal(title="Goal", user_id=user.id, start_date=start, end_date=end)
+    session.add(goal)
+    session.flush()
+    milestone = models.Milestone(goal_id=goal.id, title="MS", start_date=start, end_date=end)
+    session.add(milestone)
+    session.flush()
+    action = models.RecurringAction(
+        milestone_id=milestone.id,
+        title="Daily",
+        weekdays=[1, 2, 3, 4, 5, 6, 7],
+        target_percent=target_percent,
+        is_deleted=is_deleted,
+    )
+    session.add(action)
+    session.flush()
+    for i in range(logs):
+        session.add(models.RecurringActionLog(
+            recurring_action_id=action.id, date=start + timedelta(days=i), completed=True,
+        ))
+    session.commit()
+    return goal, action
+
+
+def _other_user(session):
+    user = models.User(email="other@example.com", hashed_password=auth.get_password_hash("x"))
+    session.add(user)
+    session.commit()
+    return user
+
+
+class TestFinalizeExpiredActions:
+    def test_finalizes_across_users_in_batches(self, session, test_user):
+        other = _other_user(session)
+        actions = [_create_action(session, user)[1] for user in (test_user, other, test_user)]
+
+        assert finalize_expired_actions(session, batch_size=2) == 3
+        for action in actions:
+            session.refresh(action)
+            assert action.is_completed is True
+        # Повторный запуск ничего не меняет
+        assert finalize_expired_actions(session) == 0
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"days_ago_end": -1},  # период ещё идёт
+            {"logs": 7},  # 70% < 80%
+            {"is_deleted": True},
+        ],
+    )
+    def test_skips_not_eligible(self, session, test_user, kwargs):
+        _, action = _create_action(session, test_user, **kwargs)
+
+        assert finalize_expired_actions(session) == 0
+        session.refresh(action)
+        assert action.is_completed is False
+
+    def test_period_ending_today_is_final(self, session, test_user):
+        _, action = _create_action(session, test_user, days_ago_end=0)
+
+        assert finalize_expired_actions(session) == 1
+
+
+class TestGoalReadsArePure:
+    @pytest.mark.parametrize(
+        "url",
+        ["/api/v2/goals/", "/api/v2/goals/{goal_id}", "/api/v2/goals/{goal_id}/milestones",
+         "/api/v2/goals/{goal_id}/progress"],
+    )
+    def test_get_does_not_write(self, auth_client, session, url):
+        client, user = auth_client
+        goal, _ = _create_action(session, user)
+
+        writes = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if not statement.lstrip().upper().startswith("SELECT"):
+                writes.append(statement)
+
+        engine = session.get_bind()
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.get(url.format(goal_id=goal.id))
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        assert response.status_code == 200
+        assert writes == []
@@ -1,6 +1,7 @@
 """
 Тесты для API задач (/api/tasks/) — страница "Ближайшие дни".
 """
+import json
 import pytest
 from datetime import date, timedelta
 from app import models
@@ -150,6 +151,103 @@ class TestGetTasksRange:
             assert tasks[0]["milestone_title"] == "Test Milestone"
             assert tasks[0]["milestone_id"] == milestone.id
 
+    def test_sorted_by_date_type_title(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        _create_recurring_action(session, milestone, title="B daily", weekdays=[1, 2, 3, 4, 5, 6, 7])
+        _create_recurring_action(session, milestone, title="A daily", weekdays=[1, 2, 3, 4, 5, 6, 7])
+        _create_onetime_action(session, milestone, title="Z once", deadline=date.today() + timedelta(days=1))
+        _create_onetime_action(session, milestone, title="C once", deadline=date.today() + timedelta(days=1))
+
+        response = client.get(
+            f"/api/tasks/range?start_date={date.today()}&end_date={date.today() + timedelta(days=6)}"
+        )
+        tasks = response.json()["tasks"]
+
+        keys = [(t["date"], t["type"], t["title"]) for t in tasks]
+        assert keys == sorted(keys)
+        assert len(tasks) == 7 * 2 + 2
+
+
+# ============================================
+# GET /api/tasks/range/stream
+# ============================================
+
+
+def _stream(client, start_date, end_date):
+    response = client.get(f"/api/tasks/range/stream?start_date={start_date}&end_date={end_date}")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class TestStreamTasksRange:
+    def test_matches_range_endpoint(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        action = _create_recurring_action(session, milestone, weekdays=[1, 2, 3, 4, 5, 6, 7])
+        _create_onetime_action(session, milestone)
+        today = date.today()
+        client.put(
+            f"/api/tasks/{action.id}/complete",
+            json={"type": "recurring", "date": str(today), "completed": True},
+        )
+        start, end = today - timedelta(days=10), today + timedelta(days=20)
+
+        streamed = _stream(client, start, end)
+        listed = client.get(f"/api/tasks/range?start_date={start}&end_date={end}").json()["tasks"]
+
+        assert streamed == listed
+        assert any(t["completed"] for t in streamed)
+
+    def test_year_range_in_date_order(self, auth_client, session):
+        client, user = auth_client
+        today = date.today()
+        _, milestone = _create_goal_with_milestone(
+            session, user, milestone_start=today, milestone_end=today + timedelta(days=365)
+        )
+        _create_recurring_action(session, milestone, weekdays=[1, 2, 3, 4, 5, 6, 7])
+        for offset in (5, 40, 200, 364):
+            _create_onetime_action(session, milestone, title=f"Once {offset}", deadline=today + timedelta(days=offset))
+
+        tasks = _stream(client, today, today + timedelta(days=365))
+
+        assert len(tasks) == 366 + 4
+        keys = [(t["date"], t["type"], t["title"], t["id"]) for t in tasks]
+        assert keys == sorted(keys)
+        assert len({t["id"] for t in tasks}) == len(tasks)
+
+    def test_range_limit(self, auth_client):
+        client, _ = auth_client
+        today = date.today()
+
+        too_large = client.get(
+            f"/api/tasks/range/stream?start_date={today}&end_date={today + timedelta(days=367)}"
+        )
+        reversed_range = client.get(
+            f"/api/tasks/range/stream?start_date={today}&end_date={today - timedelta(days=1)}"
+        )
+
+        assert too_large.status_code == 400
+        assert reversed_range.status_code == 400
+
+    def test_logs_loaded_per_window(self, auth_client, session, query_counter):
+        client, user = auth_client
+        today = date.today()
+        _, milestone = _create_goal_with_milestone(
+            session, user, milestone_start=today, milestone_end=today + timedelta(days=365)
+        )
+        _create_recurring_action(session, milestone)
+        client.get("/auth/me")
+
+        with query_counter() as month:
+            _stream(client, today, today + timedelta(days=30))
+        with query_counter() as year:
+            _stream(client, today, today + timedelta(days=365))
+
+        # Окно (31 день) = запрос логов + запрос однократных задач
+        assert year.count - month.count == 2 * 11
+
 
 # ============================================
 # PUT /api/tasks/{id}/complete
@@ -243,6 +341,93 @@ class TestCompleteTask:
         assert response.status_code == 404
 
 
+# ============================================
+# POST /api/tasks/complete-batch
+# ============================================
+
+
+class TestCompleteBatch:
+    def test_marks_week_of_habits(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        action = _create_recurring_action(session, milestone, weekdays=[1, 2, 3, 4, 5, 6, 7])
+        onetime = _create_onetime_action(session, milestone)
+        today = date.today()
+
+        items = [
+            {"type": "recurring", "id": action.id, "date": str(today - timedelta(days=d)), "completed": True}
+            for d in range(7)
+        ]
+        items.append({"type": "one-time", "id": onetime.id, "date": str(today), "completed": True})
+        response = client.post("/api/tasks/complete-batch", json={"items": items})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is True
+        assert data["actions"][0]["id"] == action.id
+        assert data["actions"][0]["completed_count"] == 7
+        [ms] = data["milestones"]
+        assert ms["milestone_id"] == milestone.id
+        assert ms["progress_before"] == 0.0
+        assert ms["delta"] == ms["progress"] > 0
+
+        session.refresh(onetime)
+        assert onetime.completed is True
+        logs = (
+            session.query(models.RecurringActionLog)
+            .filter(models.RecurringActionLog.recurring_action_id == action.id)
+            .all()
+        )
+        assert len(logs) == 7
+
+    def test_matches_single_completions(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        batch_action = _create_recurring_action(session, milestone, weekdays=[1, 2, 3, 4, 5, 6, 7])
+        single_action = _create_recurring_action(session, milestone, weekdays=[1, 2, 3, 4, 5, 6, 7])
+        today = date.today()
+        marks = [(today, True), (today - timedelta(days=1), True), (today, False)]
+
+        response = client.post("/api/tasks/complete-batch", json={"items": [
+            {"type": "recurring", "id": batch_action.id, "date": str(d), "completed": c} for d, c in marks
+        ]})
+        assert response.status_code == 200
+        for d, c in marks:
+            single = client.put(
+                f"/api/tasks/{single_action.id}/complete",
+                json={"type": "recurring", "date": str(d), "completed": c},
+            )
+
+        # Повтор одной даты в пачке — побеждает последняя отметка
+        assert response.json()["actions"][0]["completed_count"] == single.json()["completed_count"] == 1
+
+    def test_foreign_task_rejected_without_writes(self, auth_client, session):
+        client, user = auth_client
+        _, milestone = _create_goal_with_milestone(session, user)
+        action = _create_recurring_action(session, milestone)
+        other = models.User(email="other@example.com", hashed_password="x")
+        session.add(other)
+        session.commit()
+        _, foreign_milestone = _create_goal_with_milestone(session, other)
+        foreign = _create_onetime_action(session, foreign_milestone)
+        today = date.today()
+
+        response = client.post("/api/tasks/complete-batch", json={"items": [
+            {"type": "recurring", "id": action.id, "date": str(today), "completed": True},
+            {"type": "one-time", "id": foreign.id, "date": str(today), "completed": True},
+        ]})
+
+        assert response.status_code == 404
+        assert session.query(models.RecurringActionLog).count() == 0
+        session.refresh(foreign)
+        assert foreign.completed is False
+
+    def test_empty_batch_rejected(self, auth_client):
+        client, _ = auth_client
+        response = client.post("/api/tasks/complete-batch", json={"items": []})
+        assert response.status_code == 422
+
+
 # ============================================
 # PUT /api/tasks/{id}/reschedule
 # ============================================
@@ -0,0 +1,79 @@
+"""
+Кэш аутентифицированных пользователей (app/auth.py): повторные запросы
+обходятся без SELECT по users, uid в токене, сброс после изменений.
+"""
+from jose import jwt
+from sqlalchemy import event
+
+from app import models, auth
+
+
+def _user_selects(session, client, url):
+    """SELECT строки пользователя (версия данных для ETag читается отдельно и не в счёт)."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "users.email" in statement:
+            statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200, response.text
+    return statements
+
+
+class TestUserCache:
+    def test_second_request_skips_user_query(self, client, db, auth_headers):
+        client.headers.update(auth_headers)
+
+        assert len(_user_selects(db, client, "/todos/")) == 1
+        assert _user_selects(db, client, "/todos/") == []
+
+    def test_login_token_contains_uid(self, client, test_user):
+        response = client.post(
+            "/auth/login", data={"username": test_user.email, "password": "password123"}
+        )
+        assert response.status_code == 200
+        token = response.json()["access_token"]
+
+        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        assert payload["sub"] == test_user.email
+        assert payload["uid"] == test_user.id
+
+        me = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert me.status_code == 200
+        assert me.json()["id"] == test_user.id
+
+    def test_token_without_uid_still_accepted(self, client, test_user):
+        token = auth.create_access_token(data={"sub": test_user.email})
+        response = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json()["email"] == test_user.email
+
+    def test_uid_mismatch_rejected(self, client, test_user):
+        token = auth.create_access_token(data={"sub": test_user.email, "uid": test_user.id + 100})
+        response = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
+
+    def test_profile_update_invalidates(self, client, db, auth_headers):
+        client.headers.update(auth_headers)
+        client.get("/auth/me")
+
+        response = client.put("/auth/me", json={"display_name": "New name"})
+        assert response.status_code == 200
+
+        assert len(_user_selects(db, client, "/todos/")) == 1
+
+    def test_deleted_user_rejected_after_invalidate(self, client, db, test_user, auth_headers):
+        client.headers.update(auth_headers)
+        assert client.get("/todos/").status_code == 200
+
+        db.delete(db.get(models.User, test_user.id))
+        db.commit()
+        auth.invalidate_user(test_user.email)
+
+        assert client.get("/todos/").status_code == 401